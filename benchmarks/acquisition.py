@@ -0,0 +1,385 @@
+"""Benchmark suite measuring latency, query counts and peak memory of batch
+acquisition against large synthetic meta and inventory tables.
+
+Synthetic tables are generated once per size and seed into file-based SQLite
+databases which are reused by subsequent runs. Other local engines may be
+used by providing connection strings.
+
+Usage::
+
+    python -m benchmarks.acquisition --meta-rows 1000000 --inventory-rows 100000
+
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Callable, Any
+
+import sqlalchemy as sa
+
+from pybatchintory import configure, sql
+from pybatchintory.logging import logger
+from pybatchintory.main import acquire_batch
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql import crud
+from pybatchintory.sql.testing import recreate_inventory_table, \
+    recreate_meta_table, recreate_watermark_table
+
+META_TABLE_NAME = "bench_meta"
+INVENTORY_TABLE_NAME = "bench_inventory"
+WATERMARK_TABLE_NAME = "bench_watermark"
+JOB = "bench_incremental"
+NOISE_JOBS = 10
+INSERT_CHUNK_SIZE = 50000
+
+
+def _insert_in_chunks(engine: sa.engine.Engine,
+                      table: sa.Table,
+                      rows: Callable[[int, int], List[Dict]],
+                      total: int):
+    """Insert `total` rows generated by `rows(start, stop)` in chunks to keep
+    memory consumption constant.
+
+    """
+
+    for start in range(0, total, INSERT_CHUNK_SIZE):
+        stop = min(start + INSERT_CHUNK_SIZE, total)
+        with engine.begin() as conn:
+            conn.execute(sa.insert(table), rows(start, stop))
+
+
+def generate_meta_table(engine: sa.engine.Engine, rows: int, seed: int):
+    """Generate meta table with `rows` data items and random weights.
+
+    """
+
+    table = recreate_meta_table(engine=engine,
+                                name=META_TABLE_NAME,
+                                schema=None)
+    rng = random.Random(seed)
+
+    def generate(start: int, stop: int) -> List[Dict]:
+        return [{"uid": uid,
+                 "item": f"/data/file_{uid}.parquet",
+                 "weight": rng.uniform(0, 10)}
+                for uid in range(start, stop)]
+
+    _insert_in_chunks(engine, table, generate, rows)
+
+
+def generate_inventory_table(engine: sa.engine.Engine,
+                             rows: int,
+                             meta_rows: int):
+    """Generate inventory table with `rows` succeeded batches. Half of them
+    belong to the benchmarked job covering the first half of the meta table
+    while the other half is spread among noise jobs.
+
+    """
+
+    table = recreate_inventory_table(engine=engine,
+                                     name=INVENTORY_TABLE_NAME,
+                                     schema=None)
+    watermark = recreate_watermark_table(engine=engine,
+                                         name=WATERMARK_TABLE_NAME,
+                                         schema=None)
+
+    job_rows = max(rows // 2, 1)
+    span = max(meta_rows // 2 // job_rows, 1)
+
+    def generate(start: int, stop: int) -> List[Dict]:
+        values = []
+        for row in range(start, stop):
+            if row < job_rows:
+                job, position = JOB, row
+            else:
+                job = f"bench_noise_{row % NOISE_JOBS}"
+                position = (row - job_rows) // NOISE_JOBS
+
+            values.append({"meta_table": META_TABLE_NAME,
+                           "job": job,
+                           "batch_id_start": position * span,
+                           "batch_id_end": position * span + span - 1,
+                           "batch_count": span,
+                           "attempt": 1,
+                           "status": "succeeded",
+                           "config": {}})
+        return values
+
+    _insert_in_chunks(engine, table, generate, rows)
+
+    with engine.begin() as conn:
+        conn.execute(sa.insert(watermark),
+                     {"meta_table": META_TABLE_NAME,
+                      "job": JOB,
+                      "batch_id_end": job_rows * span - 1})
+
+
+def prepare_sqlite(directory: str,
+                   meta_rows: int,
+                   inventory_rows: int,
+                   seed: int,
+                   regenerate: bool = False) -> Dict[str, str]:
+    """Provide connection strings of file-based SQLite databases for given
+    sizes while generating them only if they do not exist yet.
+
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    name = f"meta_{meta_rows}_{seed}.db"
+    path_meta = os.path.join(directory, name)
+    if regenerate or not os.path.exists(path_meta):
+        generate_meta_table(sa.create_engine(f"sqlite:///{path_meta}"),
+                            rows=meta_rows,
+                            seed=seed)
+
+    # inventory is modified by benchmarks and hence always regenerated
+    path_inventory = os.path.join(directory, f"inventory_{inventory_rows}.db")
+    generate_inventory_table(sa.create_engine(f"sqlite:///{path_inventory}"),
+                             rows=inventory_rows,
+                             meta_rows=meta_rows)
+
+    return {"inventory": f"sqlite:///{path_inventory}",
+            "meta": f"sqlite:///{path_meta}"}
+
+
+class QueryCounter:
+    """Count statements executed via the given engines.
+
+    """
+
+    def __init__(self, *engines: sa.engine.Engine):
+        self.count = 0
+        for engine in set(engines):
+            sa.event.listen(engine, "before_cursor_execute", self._increment)
+
+    def _increment(self, *args, **kwargs):
+        self.count += 1
+
+
+def measure(func: Callable[[], Any],
+            counter: QueryCounter,
+            repeat: int) -> Dict[str, float]:
+    """Measure latency, query count and peak memory of `func` over `repeat`
+    invocations after a single warm up invocation which excludes one-off
+    costs such as reflection and connection setup.
+
+    """
+
+    func()
+
+    latencies = []
+    queries = []
+    peaks = []
+
+    for _ in range(repeat):
+        counter.count = 0
+        tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        queries.append(counter.count)
+
+    latencies.sort()
+    return {"latency_median_ms": latencies[len(latencies) // 2] * 1000,
+            "latency_max_ms": latencies[-1] * 1000,
+            "queries": max(queries),
+            "peak_memory_kib": max(peaks) / 1024}
+
+
+def build_scenarios(meta_rows: int,
+                    batch_count: int,
+                    batch_weight: float) -> Dict[str, Callable[[], Any]]:
+    """Build benchmark scenarios for individual acquisition steps and entire
+    acquisitions.
+
+    """
+
+    spec = MetaTableSpec(name=META_TABLE_NAME)
+    id_min = meta_rows // 2
+    backfill_min = meta_rows // 4
+
+    def acquire_and_release(**kwargs):
+        batch = acquire_batch(meta_table_name=META_TABLE_NAME, **kwargs)
+        if batch:
+            batch.succeeded()
+
+    def read_items():
+        crud.read_items_via_id_range_from_meta(meta_table=spec,
+                                               id_min=id_min,
+                                               id_max=id_min + batch_count - 1)
+
+    backfill = {"batch_id_min": backfill_min,
+                "batch_id_max": backfill_min + meta_rows // 10}
+
+    return {
+        "read_max_meta_id_from_inventory": lambda: (
+            crud.read_max_meta_id_from_inventory(meta_table=spec, job=JOB)),
+        "read_meta_id_range_from_meta[count]": lambda: (
+            crud.read_meta_id_range_from_meta(meta_table=spec,
+                                              id_min=id_min,
+                                              count=batch_count)),
+        "read_meta_id_range_from_meta[weight]": lambda: (
+            crud.read_meta_id_range_from_meta(meta_table=spec,
+                                              id_min=id_min,
+                                              weight=batch_weight)),
+        "read_items_via_id_range_from_meta": read_items,
+        "acquire_batch[incremental,count]": lambda: acquire_and_release(
+            job=JOB, batch_count=batch_count),
+        "acquire_batch[incremental,weight]": lambda: acquire_and_release(
+            job=JOB, batch_weight=batch_weight),
+        "acquire_batch[backfill,count]": lambda: acquire_and_release(
+            job="bench_backfill_count", batch_count=batch_count, **backfill),
+        "acquire_batch[backfill,weight]": lambda: acquire_and_release(
+            job="bench_backfill_weight", batch_weight=batch_weight,
+            **backfill),
+    }
+
+
+def run(meta_rows: int,
+        inventory_rows: int,
+        batch_count: int = 1000,
+        batch_weight: Optional[float] = None,
+        repeat: int = 5,
+        seed: int = 0,
+        directory: Optional[str] = None,
+        inventory_url: Optional[str] = None,
+        meta_url: Optional[str] = None,
+        regenerate: bool = False) -> Dict[str, Dict[str, float]]:
+    """Run all benchmark scenarios and return their measurements keyed by
+    scenario name.
+
+    Parameters
+    ----------
+    meta_rows: int
+        Number of rows of the synthetic meta table.
+    inventory_rows: int
+        Number of rows of the synthetic inventory table.
+    batch_count: int, optional
+        Number of items of count bounded batches.
+    batch_weight: float, optional
+        Weight of weight bounded batches. Defaults to the expected weight of
+        `batch_count` items.
+    repeat: int, optional
+        Number of measured invocations per scenario.
+    seed: int, optional
+        Seed of the random weights of the meta table.
+    directory: str, optional
+        Directory of generated SQLite databases. Defaults to a directory in
+        the temporary directory of the system.
+    inventory_url: str, optional
+        Connection string of another local database for the inventory tables.
+        Requires `meta_url` to be set, too.
+    meta_url: str, optional
+        Connection string of another local database for the meta table. The
+        synthetic tables are generated if `regenerate` is set.
+    regenerate: bool, optional
+        Generate synthetic tables even if they exist.
+
+    Returns
+    -------
+    results: dict
+
+    """
+
+    batch_weight = batch_weight or batch_count * 5
+
+    if inventory_url and meta_url:
+        urls = {"inventory": inventory_url, "meta": meta_url}
+        if regenerate:
+            generate_meta_table(sa.create_engine(meta_url), meta_rows, seed)
+        generate_inventory_table(sa.create_engine(inventory_url),
+                                 rows=inventory_rows,
+                                 meta_rows=meta_rows)
+    else:
+        directory = directory or os.path.join(tempfile.gettempdir(),
+                                              "pybatchintory_benchmarks")
+        urls = prepare_sqlite(directory=directory,
+                              meta_rows=meta_rows,
+                              inventory_rows=inventory_rows,
+                              seed=seed,
+                              regenerate=regenerate)
+
+    configure(settings=dict(INVENTORY_CONN=urls["inventory"],
+                            META_CONN=urls["meta"],
+                            INVENTORY_TABLE_NAME=INVENTORY_TABLE_NAME,
+                            WATERMARK_TABLE_NAME=WATERMARK_TABLE_NAME))
+
+    counter = QueryCounter(sql.db.engine_inventory, sql.db.engine_meta)
+    scenarios = build_scenarios(meta_rows=meta_rows,
+                                batch_count=batch_count,
+                                batch_weight=batch_weight)
+
+    return {name: measure(func, counter=counter, repeat=repeat)
+            for name, func in scenarios.items()}
+
+
+def format_results(results: Dict[str, Dict[str, float]]) -> str:
+    header = ["scenario", "median [ms]", "max [ms]", "queries",
+              "peak [KiB]"]
+    width = max(len(name) for name in [*results, header[0]])
+
+    lines = [f"{header[0]:<{width}}  " +
+             "  ".join(f"{col:>12}" for col in header[1:])]
+    for name, values in results.items():
+        lines.append(f"{name:<{width}}  "
+                     f"{values['latency_median_ms']:>12.2f}  "
+                     f"{values['latency_max_ms']:>12.2f}  "
+                     f"{values['queries']:>12}  "
+                     f"{values['peak_memory_kib']:>12.1f}")
+
+    return "\n".join(lines)
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--meta-rows", type=int, default=100000,
+                        help="rows of the synthetic meta table")
+    parser.add_argument("--inventory-rows", type=int, default=10000,
+                        help="rows of the synthetic inventory table")
+    parser.add_argument("--batch-count", type=int, default=1000)
+    parser.add_argument("--batch-weight", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directory", default=None,
+                        help="directory of generated sqlite databases")
+    parser.add_argument("--inventory-url", default=None)
+    parser.add_argument("--meta-url", default=None)
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--json", default=None,
+                        help="write results to given json file")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show log output of pybatchintory")
+    parsed = parser.parse_args(args)
+
+    if not parsed.verbose:
+        logger.setLevel(logging.WARNING)
+
+    results = run(meta_rows=parsed.meta_rows,
+                  inventory_rows=parsed.inventory_rows,
+                  batch_count=parsed.batch_count,
+                  batch_weight=parsed.batch_weight,
+                  repeat=parsed.repeat,
+                  seed=parsed.seed,
+                  directory=parsed.directory,
+                  inventory_url=parsed.inventory_url,
+                  meta_url=parsed.meta_url,
+                  regenerate=parsed.regenerate)
+
+    print(format_results(results))
+
+    if parsed.json:
+        with open(parsed.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
 from pybatchintory.config.main import configure
-from pybatchintory.main import acquire_batch
-
-configure()
\ No newline at end of file
+from pybatchintory.main import acquire_batch, acquire_batches, \
+    read_uncovered_ranges, compact_inventory, plan_backfill, \
+    acquire_planned_batch, read_plan_progress
@@ -0,0 +1,268 @@
+"""This module contains the asyncio API which is backed by SQLAlchemy async
+engines. Requires `greenlet` and async database drivers such as `asyncpg` or
+`aiosqlite` to be installed.
+
+"""
+
+import asyncio
+from typing import Optional, Dict, Callable, Any, List, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from pybatchintory.batch import Batch, _get_async_engine
+from pybatchintory.main import _retry_on_concurrent_change, \
+    _build_batch_config, _build_meta_table_spec, _reject_upstream_job
+from pybatchintory.models import BatchConfig, MetaTableSpec
+from pybatchintory.sql import crud
+from pybatchintory.sql.reflection import load_meta_table
+
+
+async def _run_sync(conn: AsyncConnection, func: Callable, **kwargs) -> Any:
+    """Run synchronous `func` on the synchronous facade of the given async
+    connection which is passed as keyword argument `conn`.
+
+    """
+
+    return await conn.run_sync(lambda sync_conn: func(conn=sync_conn,
+                                                      **kwargs))
+
+
+async def _read_next_batch_async(meta_table: MetaTableSpec,
+                                 job: str,
+                                 job_identifier: Optional[str],
+                                 batch_id_min: Optional[int],
+                                 batch_id_max: Optional[int],
+                                 batch_weight: Optional[float],
+                                 batch_count: Optional[int],
+                                 lease_ttl: Optional[float],
+                                 conn_inventory: AsyncConnection,
+                                 conn_meta: AsyncConnection
+                                 ) -> Optional[Batch]:
+    """Determine the next batch above the job's watermark while running the
+    independent lookups of the inventory and meta table concurrently. The
+    returned batch is not acquired yet.
+
+    """
+
+    id_inventory_max, id_meta_max = await asyncio.gather(
+        _run_sync(conn_inventory,
+                  crud.read_max_meta_id_from_inventory,
+                  meta_table=meta_table,
+                  job=job),
+        _run_sync(conn_meta,
+                  crud.read_max_meta_id_from_meta,
+                  meta_table=meta_table)
+    )
+
+    prepared = _build_batch_config(meta_table=meta_table,
+                                   job=job,
+                                   job_identifier=job_identifier,
+                                   batch_id_min=batch_id_min,
+                                   batch_id_max=batch_id_max,
+                                   batch_weight=batch_weight,
+                                   batch_count=batch_count,
+                                   columns=None,
+                                   lease_ttl=lease_ttl,
+                                   id_inventory_max=id_inventory_max,
+                                   id_meta_max=id_meta_max)
+    if not prepared:
+        return
+
+    batch_cfg, checked_id_min = prepared
+
+    batch_id_range = await _run_sync(conn_meta,
+                                     crud.read_meta_id_range_from_meta,
+                                     meta_table=meta_table,
+                                     id_min=checked_id_min,
+                                     id_max=batch_id_max,
+                                     count=batch_count,
+                                     weight=batch_weight)
+    if not batch_id_range:
+        return
+
+    return Batch(id_range=batch_id_range, batch_cfg=batch_cfg)
+
+
+async def _read_gap_batch_async(meta_table: MetaTableSpec,
+                                job: str,
+                                job_identifier: Optional[str],
+                                batch_id_min: Optional[int],
+                                batch_id_max: Optional[int],
+                                batch_weight: Optional[float],
+                                batch_count: Optional[int],
+                                lease_ttl: Optional[float],
+                                conn_inventory: AsyncConnection,
+                                conn_meta: AsyncConnection
+                                ) -> Optional[Batch]:
+    """Determine a batch within the first uncovered range of meta ids below
+    the job's watermark. The returned batch is not acquired yet while the
+    overlap check is repeated within the acquiring transaction.
+
+    """
+
+    await _run_sync(conn_inventory,
+                    _reject_upstream_job,
+                    meta_table=meta_table,
+                    job=job,
+                    action="`fill_gaps`")
+
+    id_inventory_max, id_meta_min = await asyncio.gather(
+        _run_sync(conn_inventory,
+                  crud.read_max_meta_id_from_inventory,
+                  meta_table=meta_table,
+                  job=job),
+        _run_sync(conn_meta,
+                  crud.read_min_meta_id_from_meta,
+                  meta_table=meta_table)
+    )
+
+    if batch_id_min is None:
+        batch_id_min = id_meta_min
+    if batch_id_max is None or batch_id_max > id_inventory_max:
+        batch_id_max = id_inventory_max
+
+    if batch_id_min > batch_id_max:
+        return
+
+    gaps = await _run_sync(conn_inventory,
+                           crud.read_uncovered_ranges_from_inventory,
+                           meta_table=meta_table,
+                           job=job,
+                           id_min=batch_id_min,
+                           id_max=batch_id_max)
+
+    for gap_min, gap_max in gaps:
+        batch_id_range = await _run_sync(conn_meta,
+                                         crud.read_meta_id_range_from_meta,
+                                         meta_table=meta_table,
+                                         id_min=gap_min,
+                                         id_max=gap_max,
+                                         count=batch_count,
+                                         weight=batch_weight)
+
+        # uncovered range does not contain any meta ids
+        if not batch_id_range:
+            continue
+
+        batch_cfg = BatchConfig(meta_table=meta_table,
+                                job=job,
+                                job_identifier=job_identifier,
+                                batch_weight=batch_weight,
+                                batch_count=batch_count,
+                                lease_ttl=lease_ttl,
+                                fill_gaps=True,
+                                id_inventory_max=id_inventory_max)
+
+        return Batch(id_range=batch_id_range, batch_cfg=batch_cfg)
+
+
+@_retry_on_concurrent_change
+async def acquire_batch_async(job: str,
+                              meta_table_name: str,
+                              meta_table_cols: Optional[Dict[str, str]] = None,
+                              job_identifier: Optional[str] = None,
+                              batch_id_min: Optional[int] = None,
+                              batch_id_max: Optional[int] = None,
+                              batch_weight: Optional[float] = None,
+                              batch_count: Optional[int] = None,
+                              lazy: bool = False,
+                              lease_ttl: Optional[float] = None,
+                              fill_gaps: bool = False,
+                              meta_table_col_types: Optional[
+                                  Dict[str, str]] = None,
+                              meta_table_filters: Optional[
+                                  List[Tuple[str, str, Any]]] = None,
+                              upstream_job: Optional[str] = None,
+                              meta_table_partitions: Optional[
+                                  List[Union[str, Dict[str, Any]]]] = None
+                              ) -> Optional[Batch]:
+    """Asyncio counterpart of `acquire_batch` which does not block the event
+    loop while waiting on the database. Independent lookups of the inventory
+    and meta table are run concurrently.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job that operates on a given `meta_table_name`.
+    meta_table_name:
+        Name of the meta data table containing information about the actual
+        data items.
+    meta_table_cols: dict, optional
+        Specify the relevant columns `uid`, `item` and `weight` of the
+        meta data table.
+    job_identifier: str, optional
+        Unique job id which even separates among tasks of the same job.
+    batch_id_min: int, optional
+        Define the lower batch boundary by providing the minimum valid id of
+        the meta data table.
+    batch_id_max: int, optional
+        Define the upper batch boundary by providing the maximum valid id of
+        the meta data table.
+    batch_weight: float, optional
+        Define the maximum weight allowed to be included in a batch.
+    batch_count: int, optional
+        Define the maximum number of items to be included in a batch.
+    lazy: bool, optional
+        Only register the batch range in the inventory table without loading
+        its items. Items may be loaded via `Batch.load_items_async`.
+    lease_ttl: float, optional
+        Lease the batch for given number of seconds. The lease is extended by
+        a background heartbeat until the batch is released.
+    fill_gaps: bool, optional
+        Only acquire meta ids below the job's watermark which are not covered
+        by succeeded or running batches of the same job. Returns `None` if
+        there are no uncovered meta ids left.
+    meta_table_col_types: dict, optional
+        Declare the types of all used meta data table columns as names of
+        SqlAlchemy types to avoid reflecting the meta data table.
+    meta_table_filters: list, optional
+        Filter conditions on the meta data table as `(column, operator,
+        value)` triples which are applied to all meta data table queries.
+    upstream_job: str, optional
+        Process the succeeded batches of given upstream job on
+        `meta_table_name` via the inventory table as meta data source.
+    meta_table_partitions: list, optional
+        Names of the physical tables or partitions of `meta_table_name` in
+        ascending uid order which share one logical uid space.
+
+    Returns
+    -------
+    acquired_batch: Batch
+
+    """
+
+    meta_table = _build_meta_table_spec(meta_table_name=meta_table_name,
+                                        meta_table_cols=meta_table_cols,
+                                        upstream_job=upstream_job,
+                                        col_types=meta_table_col_types,
+                                        filters=meta_table_filters or [],
+                                        partitions=meta_table_partitions or [])
+
+    # inventory sources live in the inventory database
+    engine_inventory = _get_async_engine("inventory")
+    engine_meta = engine_inventory if meta_table.inventory_source \
+        else _get_async_engine("meta")
+
+    async with engine_inventory.connect() as conn_inventory, \
+            engine_meta.connect() as conn_meta:
+
+        await _run_sync(conn_meta, load_meta_table, meta_table=meta_table)
+
+        read_batch = _read_gap_batch_async if fill_gaps \
+            else _read_next_batch_async
+        batch = await read_batch(meta_table=meta_table,
+                                 job=job,
+                                 job_identifier=job_identifier,
+                                 batch_id_min=batch_id_min,
+                                 batch_id_max=batch_id_max,
+                                 batch_weight=batch_weight,
+                                 batch_count=batch_count,
+                                 lease_ttl=lease_ttl,
+                                 conn_inventory=conn_inventory,
+                                 conn_meta=conn_meta)
+
+    if not batch:
+        return
+
+    await batch.acquire_async(lazy=lazy)
+    return batch
@@ -1,9 +1,59 @@
-from typing import Dict, Optional, List
+import asyncio
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Optional, List, Iterator, Callable, Any, Tuple, \
+    TYPE_CHECKING
 
-from pybatchintory import models, sql, config as cfg
-from pybatchintory.sql import crud
-from sqlalchemy.engine.base import Connection
+from pybatchintory import models, sql, config as cfg, instrumentation
+from pybatchintory.exceptions import ConcurrentChangeError, LeaseLostError
+from pybatchintory.heartbeat import Heartbeat
+from pybatchintory.sql import crud, helper
 import sqlalchemy as sa
+from sqlalchemy.engine.base import Connection
+
+if TYPE_CHECKING:
+    import numpy as np
+
+EXECUTORS = {"thread": ThreadPoolExecutor,
+             "process": ProcessPoolExecutor}
+
+
+def _balance_shards(weights: "np.ndarray",
+                    shards: int) -> List["np.ndarray"]:
+    """Partition item positions into `shards` shards with balanced total
+    weight via longest-processing-time-first scheduling. Positions within each
+    shard remain in ascending order.
+
+    """
+
+    import numpy as np
+
+    heap = [(0.0, shard) for shard in range(shards)]
+    assignment = [[] for _ in range(shards)]
+
+    for position in np.argsort(-weights, kind="stable"):
+        total, shard = heapq.heappop(heap)
+        assignment[shard].append(position)
+        heapq.heappush(heap, (total + weights[position], shard))
+
+    return [np.sort(np.array(positions, dtype=int))
+            for positions in assignment if positions]
+
+
+def _get_async_engine(kind: str):
+    """Provide async engine of given kind which is either `inventory` or
+    `meta`. Raises `ValueError` if it has not been configured.
+
+    """
+
+    engine = getattr(sql.db, f"engine_{kind}_async")
+    if engine is None:
+        raise ValueError(f"The asyncio API requires an async connection "
+                         f"string for the {kind} database. Please provide "
+                         f"`INVENTORY_ASYNC_CONN` or `META_ASYNC_CONN`.")
+
+    return engine
 
 
 class Batch:
@@ -15,72 +65,585 @@ class Batch:
         self.id_range = id_range
 
         self.pk: Optional[int] = None
-        self.items: Optional[List[str]] = None
+        self.attempt: int = 1
         self.success: Optional[bool] = None
 
+        self._heartbeat: Optional[Heartbeat] = None
+
+        self._acquired: Optional[float] = None
+        self.items_per_second: Optional[float] = None
+
+        self._items: Optional[List[str]] = None
+        self._columns: Optional[Dict[str, "np.ndarray"]] = None
+
+    @property
+    def items(self) -> Optional[List[str]]:
+        """Data items of the acquired batch which are loaded from the meta
+        table on first access.
+
+        """
+
+        if self._items is None and self._columns is not None:
+            item_col = self.batch_cfg.meta_table.cols.item
+            self._items = self._columns[item_col].tolist()
+
+        if self._items is None and self.pk is not None:
+            self._load_items()
+
+        return self._items
+
+    @property
+    def columns(self) -> Optional[Dict[str, "np.ndarray"]]:
+        """Item column and additionally projected `columns` of the acquired
+        batch as NumPy arrays keyed by column name. Loaded from the meta table
+        on first access.
+
+        """
+
+        if self._columns is None and self.pk is not None:
+            self._load_columns()
+
+        return self._columns
+
+    def to_arrow(self):
+        """Provide item column and additionally projected `columns` of the
+        acquired batch as a `pyarrow.Table`. Requires `pyarrow` to be
+        installed.
+
+        """
+
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("Converting a batch to an arrow table requires "
+                              "`pyarrow` to be installed.") from e
+
+        return pa.table(self.columns)
+
+    def _read_item_weights(self) -> Tuple[List[str], "np.ndarray"]:
+        """Provide items and their weights. Items without weight column or
+        null weights are weighted equally. Items are identical to `items`
+        which are reused if already loaded.
+
+        """
+
+        import numpy as np
+
+        weight_col = self.batch_cfg.meta_table.cols.weight
+        if not weight_col:
+            items = self.items
+            return items, np.ones(len(items))
+
+        columns = self._columns
+        if columns is None or weight_col not in columns:
+            columns = crud.read_columns_via_id_range_from_meta(
+                meta_table=self.batch_cfg.meta_table,
+                id_min=self.id_range.id_min,
+                id_max=self.id_range.id_max,
+                columns=[weight_col])
+
+        items = self._items if self._items is not None \
+            else columns[self.batch_cfg.meta_table.cols.item].tolist()
+        weights = np.array([1.0 if weight is None else weight
+                            for weight in columns[weight_col]], dtype=float)
+        return items, weights
+
+    def _load_columns(self):
+        self._columns = crud.read_columns_via_id_range_from_meta(
+            meta_table=self.batch_cfg.meta_table,
+            id_min=self.id_range.id_min,
+            id_max=self.id_range.id_max,
+            columns=self.batch_cfg.columns or [])
+
+    def _load_items(self):
+        self._items = crud.read_items_via_id_range_from_meta(
+            meta_table=self.batch_cfg.meta_table,
+            id_min=self.id_range.id_min,
+            id_max=self.id_range.id_max)
+
     def _is_acquirable(self):
         if self.pk is not None:
             raise ValueError("Batch has already been acquired.")
 
+    def _is_acquired(self):
+        if self.pk is None:
+            raise ValueError("Batch has not been acquired yet.")
+
     def _is_releasable(self):
         if self.success is not None:
             raise ValueError("Batch has already been released.")
 
-    def _check_concurrent_change(self, conn: Connection):
-        id_inventory_max = crud.read_max_meta_id_from_inventory(
-            meta_table=self.batch_cfg.meta_table,
-            job=self.batch_cfg.job,
-            conn=conn
-        )
+    def _build_acquire_values(self) -> Dict:
+        values = {"job": self.batch_cfg.job,
+                  "job_identifier": self.batch_cfg.job_identifier,
+                  "meta_table": self.batch_cfg.meta_table.name,
+                  "batch_id_start": self.id_range.id_min,
+                  "batch_id_end": self.id_range.id_max,
+                  "batch_count": self.id_range.count,
+                  "batch_weight": self.id_range.weight,
+                  "config": self.batch_cfg.dict()}
 
-        if id_inventory_max != self.batch_cfg.id_inventory_max:
-            raise NotImplementedError("Concurrent changes are not supported")
+        # inventory tables without lease column remain usable without leases
+        if self.batch_cfg.lease_ttl:
+            values["lease_expires"] = crud.lease_expiry(
+                self.batch_cfg.lease_ttl
+            )
+
+        return values
+
+    def _start_heartbeat(self):
+        if not self.batch_cfg.lease_ttl:
+            return
+
+        self._heartbeat = Heartbeat(primary_key=self.pk,
+                                    attempt=self.attempt,
+                                    lease_ttl=self.batch_cfg.lease_ttl)
+        self._heartbeat.start()
+
+    def _stop_heartbeat(self):
+        if self._heartbeat:
+            self._heartbeat.stop()
+
+    @staticmethod
+    def _insert_batches_in_inventory(batches: List["Batch"],
+                                     conn: Connection) -> List[int]:
+        """Insert rows of consecutive batches of the same job into the
+        inventory table while advancing the job's watermark via
+        compare-and-swap unless gaps are filled or batches are planned.
+        Returns the resulting primary keys.
+
+        Batches filling gaps below the watermark lock the watermark row
+        instead which serializes gap fills of the same job. Hence, overlaps
+        with concurrently acquired batches are detected before insertion and
+        raise `ConcurrentChangeError`.
+
+        """
+
+        first, last = batches[0], batches[-1]
+        values = [batch._build_acquire_values() for batch in batches]
+
+        if first.batch_cfg.fill_gaps:
+            crud.lock_watermark_in_inventory(
+                meta_table=first.batch_cfg.meta_table,
+                job=first.batch_cfg.job,
+                id_current=first.batch_cfg.id_inventory_max,
+                conn=conn)
+
+            overlapping = crud.read_overlapping_ids_from_inventory(
+                meta_table=first.batch_cfg.meta_table,
+                job=first.batch_cfg.job,
+                id_min=first.id_range.id_min,
+                id_max=last.id_range.id_max,
+                statuses=("succeeded", "running"),
+                conn=conn)
+
+            if overlapping:
+                raise ConcurrentChangeError(
+                    f"Concurrently acquired overlapping batches in inventory "
+                    f"table: {overlapping}")
+
+        if len(values) == 1:
+            pks = [crud.create_row_in_inventory(conn=conn, values=values[0])]
+        else:
+            pks = crud.create_rows_in_inventory(conn=conn, values=values)
+
+        if not (first.batch_cfg.fill_gaps or first.batch_cfg.planned):
+            crud.update_watermark_in_inventory(
+                meta_table=first.batch_cfg.meta_table,
+                job=first.batch_cfg.job,
+                id_expected=first.batch_cfg.id_inventory_max,
+                id_new=last.id_range.id_max,
+                conn=conn)
+
+        return pks
+
+    @staticmethod
+    def _assign_primary_keys(batches: List["Batch"], pks: List[int]):
+        for batch, pk in zip(batches, pks):
+            batch.pk = pk
+            batch._acquired = time.perf_counter()
+            batch._start_heartbeat()
+
+    @staticmethod
+    def _acquire_batches_in_inventory(batches: List["Batch"],
+                                      conn: Optional[Connection] = None):
+        """Register consecutive batches of the same job in the inventory
+        table while advancing the job's watermark via compare-and-swap in the
+        same transaction. Raises `ConcurrentChangeError` if a concurrent
+        worker of the same job advanced the watermark in the meantime. An
+        ongoing transaction may be joined via `conn`.
+
+        """
+
+        with helper.begin(sql.db.engine_inventory, conn) as conn:
+            pks = Batch._insert_batches_in_inventory(batches, conn=conn)
+
+        Batch._assign_primary_keys(batches, pks)
+
+    def acquire(self,
+                lazy: bool = False,
+                items: Optional[List[str]] = None,
+                conn: Optional[Connection] = None):
+        """Register the batch in the inventory table and load its items.
+
+        Parameters
+        ----------
+        lazy: bool, optional
+            Only register the batch range without loading items. Items are
+            fetched on demand via `items` or `iter_items`.
+        items: list, optional
+            Items which have already been read along with the batch range and
+            hence are not loaded again.
+        conn: Connection, optional
+            Register the batch as part of the given ongoing transaction of the
+            inventory database.
+
+        """
 
-    def _build_acquire_values(self) -> Dict:
-        return {"job": self.batch_cfg.job,
-                "job_identifier": self.batch_cfg.job_identifier,
-                "meta_table": self.batch_cfg.meta_table.name,
-                "batch_id_start": self.id_range.id_min,
-                "batch_id_end": self.id_range.id_max,
-                "batch_count": self.id_range.count,
-                "batch_weight": self.id_range.weight,
-                "config": self.batch_cfg.dict()}
-
-    def _acquire_batch_in_inventory(self, conn: Connection):
-        values = self._build_acquire_values()
-        self.pk = crud.create_row_in_inventory(conn=conn, values=values)
-
-    def acquire(self):
         self._is_acquirable()
+        self._acquire_batches_in_inventory([self], conn=conn)
+
+        if items is not None:
+            self._items = items
+        else:
+            self._load_payload(lazy=lazy)
+
+    async def acquire_async(self, lazy: bool = False):
+        """Asyncio counterpart of `acquire` which registers the batch and
+        loads its items via the async engines.
+
+        Parameters
+        ----------
+        lazy: bool, optional
+            Only register the batch range without loading items. Items may be
+            loaded via `load_items_async`.
+
+        """
+
+        self._is_acquirable()
+
+        async with _get_async_engine("inventory").begin() as conn:
+            pks = await conn.run_sync(
+                lambda sync_conn: self._insert_batches_in_inventory(
+                    [self], conn=sync_conn))
+
+        self._assign_primary_keys([self], pks)
+
+        if not lazy:
+            await self.load_items_async()
+
+    async def load_items_async(self) -> List[str]:
+        """Load items of the acquired batch via the async meta engine.
+
+        """
+
+        self._is_acquired()
+
+        async with _get_async_engine("meta").connect() as conn:
+            self._items = await conn.run_sync(
+                lambda sync_conn: crud.read_items_via_id_range_from_meta(
+                    meta_table=self.batch_cfg.meta_table,
+                    id_min=self.id_range.id_min,
+                    id_max=self.id_range.id_max,
+                    conn=sync_conn))
+
+        return self._items
+
+    @classmethod
+    def reclaim(cls,
+                batch_cfg: models.BatchConfig,
+                max_attempts: Optional[int] = None,
+                lazy: bool = False) -> Optional["Batch"]:
+        """Reclaim an existing batch of the same job. Running batches whose
+        lease has expired are reclaimed first if `lease_ttl` is configured.
+        Afterwards, failed batches with fewer than `max_attempts` attempts are
+        reclaimed if given. The existing inventory row is reused while its
+        attempt is incremented.
+
+        """
+
+        row = None
+        meta_table = batch_cfg.meta_table
+        lease_ttl = batch_cfg.lease_ttl
+
+        if lease_ttl:
+            row = crud.claim_expired_row_in_inventory(
+                meta_table=meta_table,
+                job=batch_cfg.job,
+                lease_ttl=lease_ttl,
+                max_attempts=max_attempts)
+
+        if not row and max_attempts:
+            row = crud.claim_failed_row_in_inventory(
+                meta_table=meta_table,
+                job=batch_cfg.job,
+                max_attempts=max_attempts,
+                lease_ttl=lease_ttl)
+
+        if not row:
+            return
+
+        id_range = models.BatchIdRange(id_min=row["batch_id_start"],
+                                       id_max=row["batch_id_end"],
+                                       count=row["batch_count"],
+                                       weight=row["batch_weight"])
+
+        batch = cls(batch_cfg=batch_cfg, id_range=id_range)
+        batch.pk = row["id"]
+        batch.attempt = row["attempt"]
+        batch._acquired = time.perf_counter()
+        batch._start_heartbeat()
+        batch._load_payload(lazy=lazy)
+        return batch
+
+    @classmethod
+    def claim_planned(cls,
+                      batch_cfg: models.BatchConfig,
+                      lazy: bool = False) -> Optional["Batch"]:
+        """Claim the pending planned batch range of the same job with the
+        lowest ids from the plan table while registering it in the inventory
+        table within the same transaction. Planned batches do not advance the
+        job's watermark. Raises `ConcurrentChangeError` if the range has been
+        claimed concurrently.
+
+        """
 
         with sql.db.engine_inventory.begin() as conn:
-            self._check_concurrent_change(conn)
-            self._acquire_batch_in_inventory(conn)
+            row = crud.read_next_row_from_plan(
+                meta_table=batch_cfg.meta_table,
+                job=batch_cfg.job,
+                conn=conn)
+            if not row:
+                return
+
+            id_range = models.BatchIdRange(id_min=row["batch_id_start"],
+                                           id_max=row["batch_id_end"],
+                                           count=row["batch_count"],
+                                           weight=row["batch_weight"])
+
+            batch = cls(batch_cfg=batch_cfg, id_range=id_range)
+            pks = cls._insert_batches_in_inventory([batch], conn=conn)
+            crud.claim_row_in_plan(primary_key=row["id"],
+                                   inventory_id=pks[0],
+                                   conn=conn)
+
+        cls._assign_primary_keys([batch], pks)
+        batch._load_payload(lazy=lazy)
+        return batch
 
-        self.items = crud.read_items_via_id_range_from_meta(
+    def _load_payload(self, lazy: bool):
+        if lazy:
+            return
+
+        if self.batch_cfg.columns:
+            self._load_columns()
+        else:
+            self._load_items()
+
+    def iter_items(self, chunk_size: int = 10000) -> Iterator[str]:
+        """Stream items of the acquired batch while fetching `chunk_size` items
+        at a time from the meta table. Unlike `items`, streamed items are not
+        kept in memory.
+
+        """
+
+        self._is_acquired()
+
+        if self._items is not None:
+            yield from self._items
+            return
+
+        yield from crud.iter_items_via_id_range_from_meta(
             meta_table=self.batch_cfg.meta_table,
             id_min=self.id_range.id_min,
-            id_max=self.id_range.id_max)
+            id_max=self.id_range.id_max,
+            chunk_size=chunk_size)
+
+    @staticmethod
+    def acquire_all(batches: List["Batch"]):
+        """Acquire multiple consecutive batches of the same job at once via a
+        single transaction and bulk insert. Items are loaded lazily.
+
+        """
+
+        for batch in batches:
+            batch._is_acquirable()
+
+        Batch._acquire_batches_in_inventory(batches)
 
     def release(self,
                 success: bool,
                 result: Optional[Dict] = None,
                 logging: Optional[str] = None):
         self._is_releasable()
+        self._stop_heartbeat()
+
+        self.success = success
+        values = self._build_release_values(success=success,
+                                            result=result,
+                                            logging=logging)
+
+        updated = crud.update_row_in_inventory(primary_key=self.pk,
+                                               values=values,
+                                               attempt=self.attempt)
+        self._check_released(updated)
+
+    async def release_async(self,
+                            success: bool,
+                            result: Optional[Dict] = None,
+                            logging: Optional[str] = None):
+        """Asyncio counterpart of `release` using the async inventory engine.
+
+        """
+
+        self._is_releasable()
+        await asyncio.get_running_loop().run_in_executor(None,
+                                                         self._stop_heartbeat)
 
         self.success = success
+        values = self._build_release_values(success=success,
+                                            result=result,
+                                            logging=logging)
 
+        async with _get_async_engine("inventory").begin() as conn:
+            updated = await conn.run_sync(
+                lambda sync_conn: crud.update_row_in_inventory(
+                    primary_key=self.pk,
+                    values=values,
+                    attempt=self.attempt,
+                    conn=sync_conn))
+
+        self._check_released(updated)
+
+    def _build_release_values(self,
+                              success: bool,
+                              result: Optional[Dict],
+                              logging: Optional[str]) -> Dict:
         values = {"status": "succeeded" if success else "failed",
                   "job_result_item": result,
                   "logging": logging,
                   "processing_end": sa.func.current_timestamp()}
 
-        crud.update_row_in_inventory(primary_key=self.pk, values=values)
+        # released rows must not be reclaimed as expired later on
+        if self.batch_cfg.lease_ttl:
+            values["lease_expires"] = None
+
+        return values
+
+    def _check_released(self, updated: bool):
+        if not updated:
+            raise LeaseLostError(
+                f"Batch {self.pk} has been reclaimed by another worker.")
+
+        self._record_release()
+
+    def _record_release(self):
+        """Record processing duration and throughput from acquisition until
+        release.
+
+        """
+
+        duration = time.perf_counter() - self._acquired
+        count = self.id_range.count
+        self.items_per_second = count / duration if duration > 0 else None
+
+        attributes = {"job": self.batch_cfg.job,
+                      "success": self.success}
+        if self.items_per_second is not None:
+            attributes["items_per_second"] = self.items_per_second
+
+        instrumentation.metrics.record(instrumentation.Measurement(
+            name="batch",
+            start=time.time() - duration,
+            duration=duration,
+            rows=count,
+            attributes=attributes
+        ))
+
+    def process(self,
+                func: Callable,
+                args: Tuple = (),
+                kwargs: Optional[Dict] = None,
+                shards: Optional[int] = None,
+                executor: str = "thread",
+                max_workers: Optional[int] = None) -> List[Any]:
+        """Process the items of the acquired batch while automatically
+        releasing the batch as succeeded or failed.
+
+        Items are split into `shards` sub-shards with balanced total weight
+        which are processed in parallel. Each shard invokes
+        `func(items, *args, **kwargs)`. The results of all shards are stored
+        as `job_result_item` and returned in order of shards.
+
+        Parameters
+        ----------
+        func: callable
+            Function receiving a list of items as first argument. Its result
+            needs to be JSON serializable.
+        args: tuple, optional
+            Additional positional arguments passed to `func`.
+        kwargs: dict, optional
+            Additional keyword arguments passed to `func`.
+        shards: int, optional
+            Number of weight balanced sub-shards. If not given, all items are
+            processed by a single invocation in the current thread.
+        executor: str, optional
+            Either `thread` or `process` to choose the type of pool. Process
+            pools require `func` to be picklable.
+        max_workers: int, optional
+            Maximum size of the pool. Defaults to the number of shards.
+
+        Returns
+        -------
+        results: list
+
+        """
+
+        self._is_acquired()
+
+        if executor not in EXECUTORS:
+            raise ValueError(f"Executor '{executor}' is not supported. "
+                             f"Choose one of {list(EXECUTORS)}.")
+
+        kwargs = kwargs or {}
+
+        try:
+            if not shards or shards == 1:
+                results = [func(self.items, *args, **kwargs)]
+            else:
+                items, weights = self._read_item_weights()
+                positions = _balance_shards(weights=weights, shards=shards)
+                sharded = [[items[position] for position in shard]
+                           for shard in positions]
+
+                pool = EXECUTORS[executor](max_workers=max_workers or shards)
+                with pool:
+                    futures = [pool.submit(func, shard, *args, **kwargs)
+                               for shard in sharded]
+                    results = [future.result() for future in futures]
+
+        except Exception as e:
+            self.failed(error=e)
+            raise
+
+        self.succeeded(result={"results": results})
+        return results
 
     def succeeded(self, **kwargs):
         self.release(success=True, **kwargs)
 
     def failed(self, error: Optional[Exception] = None, **kwargs):
+        self.release(success=False, **self._add_error(error, kwargs))
+
+    async def succeeded_async(self, **kwargs):
+        await self.release_async(success=True, **kwargs)
+
+    async def failed_async(self, error: Optional[Exception] = None, **kwargs):
+        await self.release_async(success=False,
+                                 **self._add_error(error, kwargs))
+
+    @staticmethod
+    def _add_error(error: Optional[Exception], kwargs: Dict) -> Dict:
 
         if error:
             if "logging" in kwargs:
@@ -88,5 +651,5 @@ class Batch:
             else:
                 kwargs["logging"] = str(error)
 
-        self.release(success=False, **kwargs)
+        return kwargs
 
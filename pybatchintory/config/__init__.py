@@ -1,5 +1,29 @@
-from typing import Optional
+import sys
+import threading
 
-from pybatchintory.config.settings import Settings
+from pybatchintory.config import _settings
+from pybatchintory.config._settings import Settings
 
-settings: Optional[Settings] = None
\ No newline at end of file
+_LOCK = threading.RLock()
+
+# retain the former module path `pybatchintory.config.settings` for imports
+# such as `from pybatchintory.config.settings import Settings` while the
+# package attribute `settings` refers to the lazily instantiated settings
+sys.modules.setdefault(f"{__name__}.settings", _settings)
+
+
+def __getattr__(name: str):
+    """Lazily instantiate default settings on first access if `configure` has
+    not been called before. Keeps importing `pybatchintory` side effect free.
+
+    """
+
+    if name != "settings":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with _LOCK:
+        if "settings" not in globals():
+            from pybatchintory.config.main import configure
+            configure()
+
+        return globals()["settings"]
@@ -0,0 +1,121 @@
+from typing import Optional, List
+
+from pydantic import BaseSettings
+from pydantic.main import BaseModel
+from pydantic.types import SecretStr
+
+
+class Settings(BaseSettings):
+    """Defines all package wide configurations.
+
+    """
+
+    INVENTORY_CONN: SecretStr = "sqlite://"
+    """Represents SqlAlchemy connection string for the inventory backend 
+    tables used by `pybatchintory` with read/write access."""
+
+    INVENTORY_CONN_SCHEMA: Optional[str]
+    """Provide schema for backend table."""
+
+    INVENTORY_TABLE_NAME: str = "inventory"
+    """Name of the inventory table."""
+
+    CREATE_BACKEND_TABLES: bool = True
+    """Create missing backend tables, e.g. the watermark table, upon first
+    database access. Disable if the inventory connection lacks privileges to
+    create tables which then need to be created upfront."""
+
+    WATERMARK_TABLE_NAME: str = "inventory_watermark"
+    """Name of the table storing the highest processed meta id per meta table
+    and job."""
+
+    INVENTORY_ARCHIVE_TABLE_NAME: str = "inventory_archive"
+    """Name of the table storing inventory rows which have been merged into
+    summary rows by compaction."""
+
+    PLAN_TABLE_NAME: str = "inventory_plan"
+    """Name of the table storing precomputed batch ranges of backfill plans
+    which are claimed by workers."""
+
+    PLAN_CHUNK_SIZE: int = 1000
+    """Number of planned batch ranges inserted per transaction while planning
+    a backfill."""
+
+    CUMULATIVE_WEIGHT_TABLE_NAME: str = "inventory_cumulative_weight"
+    """Name of the optional side table storing cumulative weight checkpoints of
+    meta tables."""
+
+    CUMULATIVE_WEIGHT_STRIDE: int = 1000
+    """Number of meta rows between two consecutive cumulative weight
+    checkpoints."""
+
+    INVENTORY_STATUS_ENUMS: List[str] = ['running', 'succeeded', 'failed']
+    """Possible states of an inventory row."""
+
+    INVENTORY_SOURCE_MAX_ATTEMPTS: Optional[int] = None
+    """Number of attempts after which failed batches of an upstream job are
+    considered permanently failed. Such batches no longer bound the progress
+    of downstream jobs which skip them with a warning. If not given, failed
+    upstream batches bound downstream progress until they succeed."""
+
+    META_CONN: Optional[SecretStr] = None
+    """Represents SqlAlchemy connection string for the meta tables which
+    are external to `pybatchintory` with read only access. If not given, is 
+    assumes it has the same connection string as `CONN_BACKEND`."""
+
+    INVENTORY_ASYNC_CONN: Optional[SecretStr] = None
+    """Represents SqlAlchemy connection string with an async driver for the
+    inventory backend tables, e.g. `postgresql+asyncpg://...`. Required for
+    the asyncio API only."""
+
+    META_ASYNC_CONN: Optional[SecretStr] = None
+    """Represents SqlAlchemy connection string with an async driver for the
+    meta tables. If not given, it assumes it has the same connection string
+    as `INVENTORY_ASYNC_CONN`."""
+
+    POOL_SIZE: Optional[int] = None
+    """Number of connections kept open per engine. Uses the SqlAlchemy
+    default of the dialect if not given."""
+
+    POOL_MAX_OVERFLOW: Optional[int] = None
+    """Number of connections allowed in addition to `POOL_SIZE`. Uses the
+    SqlAlchemy default of the dialect if not given."""
+
+    POOL_PRE_PING: bool = False
+    """Test connections for liveness upon checkout."""
+
+    POOL_RECYCLE: Optional[int] = None
+    """Number of seconds after which connections are recycled. Uses the
+    SqlAlchemy default if not given."""
+
+    SCHEMA_CACHE_DIR: Optional[str] = None
+    """Directory of the on-disk cache of reflected meta table schemas which
+    avoids catalog introspection in new processes. Schemas are stored as JSON
+    and verified against a fingerprint of the current column names and types
+    before being reused. Disabled if not given."""
+
+    SCHEMA_CACHE_TTL: Optional[float] = None
+    """Number of seconds after which cached meta table schemas are reflected
+    again. Cached schemas never expire if not given."""
+
+    BOUNDARY_SEARCH_CHUNK_SIZE: int = 1000
+    """Number of meta rows read by the first probe when searching for a weight
+    bounded batch boundary. Subsequent probes double in size."""
+
+    CONCURRENT_RETRIES: int = 5
+    """Number of retries to acquire a batch if a concurrent worker of the same
+    job acquired an overlapping batch in the meantime."""
+
+    CONCURRENT_RETRY_BACKOFF: float = 0.05
+    """Base delay in seconds between retries which doubles with each retry
+    and is randomized to avoid lockstep among concurrent workers."""
+
+    DEBUG: bool = False
+    """Enable debug mode to see more information such as generated SQL strings.
+    """
+
+    class Config:
+        case_sensitive = False
+        env_prefix = 'pybatchintory_'
+
+
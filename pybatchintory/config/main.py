@@ -10,6 +10,24 @@ from pybatchintory import sql
 ENV_NAME_CONFIG_FILE = "PYBATCHINTORY_ENV_FILE"
 
 
+def _check_sync_connections(settings: Settings):
+    """Async connection strings require their synchronous counterparts since
+    heartbeats and lazily loaded items or columns of batches acquired via the
+    asyncio API use the synchronous engines. Raises `ValueError` otherwise.
+
+    """
+
+    required = {"INVENTORY_ASYNC_CONN": "INVENTORY_CONN",
+                "META_ASYNC_CONN": "META_CONN"}
+
+    for name_async, name in required.items():
+        if getattr(settings, name_async) and name not in \
+                settings.__fields_set__:
+            raise ValueError(f"`{name_async}` requires `{name}` to be set "
+                             f"which is used by heartbeats and lazy loads of "
+                             f"the asyncio API.")
+
+
 def configure(dot_env: Optional[str] = None,
               settings: Optional[Dict] = None):
     """Globally configure package wide settings which overwrites default
@@ -55,5 +73,9 @@ def configure(dot_env: Optional[str] = None,
     else:
         values = Settings()
 
+    _check_sync_connections(values)
     config.settings = values
-    sql.db = sql.initialize()
+
+    # engines are created lazily on first use
+    sql.reset()
+    sql.dispose_stale_engines()
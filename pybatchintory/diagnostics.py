@@ -0,0 +1,241 @@
+"""This module contains query plan diagnostics for the queries issued while
+acquiring batches. It provides the compiled SQL and the dialect's `EXPLAIN`
+output while detecting missing uid indexes and sequential scans.
+
+"""
+
+from typing import Optional, Dict, List, Any, Tuple, Union
+
+import sqlalchemy as sa
+from pydantic.main import BaseModel
+from sqlalchemy.engine.base import Connection
+from sqlalchemy.sql.selectable import Select
+
+from pybatchintory import sql, config as cfg
+from pybatchintory.logging import logger
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql import crud, helper
+from pybatchintory.sql.reflection import load_meta_table
+
+
+class QueryDiagnostics(BaseModel):
+    """Resembles the compiled SQL and query plan of a single query.
+
+    """
+
+    name: str
+    sql: str
+    plan: List[str]
+    warnings: List[str] = []
+
+
+def _compile(stmt: Select, conn: Connection) -> str:
+    compiled = stmt.compile(dialect=conn.dialect,
+                            compile_kwargs={"literal_binds": True})
+    return str(compiled)
+
+
+def _format_plan_row(dialect: str, row: Any) -> str:
+    if dialect == "sqlite":
+        # columns: id, parent, notused, detail
+        return row[-1]
+    if dialect == "postgresql":
+        return row[0]
+
+    return ", ".join(f"{key}={value}"
+                     for key, value in row._mapping.items())
+
+
+def _is_sequential_scan(dialect: str, row: Any) -> bool:
+    """Check whether a row of the query plan resembles a sequential scan.
+
+    """
+
+    if dialect == "sqlite":
+        detail = row[-1]
+        return detail.startswith("SCAN") and "USING" not in detail and \
+            "CONSTANT ROW" not in detail
+    if dialect == "postgresql":
+        return "Seq Scan" in row[0]
+    if dialect in ("mysql", "mariadb"):
+        return row._mapping.get("type") == "ALL"
+
+    return False
+
+
+def _explain(name: str, stmt: Select, conn: Connection) -> QueryDiagnostics:
+    """Compile given statement and retrieve its query plan via the dialect's
+    `EXPLAIN`.
+
+    """
+
+    dialect = conn.dialect.name
+    compiled = _compile(stmt, conn)
+
+    prefix = "EXPLAIN QUERY PLAN" if dialect == "sqlite" else "EXPLAIN"
+    rows = conn.exec_driver_sql(f"{prefix} {compiled}").fetchall()
+
+    warnings = [f"Sequential scan chosen for query '{name}': "
+                f"{_format_plan_row(dialect, row)}"
+                for row in rows if _is_sequential_scan(dialect, row)]
+
+    return QueryDiagnostics(name=name,
+                            sql=compiled,
+                            plan=[_format_plan_row(dialect, row)
+                                  for row in rows],
+                            warnings=warnings)
+
+
+def has_uid_index(meta_table: MetaTableSpec,
+                  conn: Optional[Connection] = None) -> bool:
+    """Check whether the uid column of the meta table is the leading column
+    of its primary key or of any index. Otherwise, boundary searches and
+    item fetches need to scan the entire meta table. Partitioned meta tables
+    require such an index for each partition.
+
+    """
+
+    uid = meta_table.cols.uid
+    names = [partition.name for partition in meta_table.partitions] or \
+        [meta_table.name]
+
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
+        inspector = sa.inspect(conn)
+        for name in names:
+            spec = meta_table.copy(update={"name": name, "partitions": []})
+            t_meta = load_meta_table(spec, conn=conn)
+            pk = inspector.get_pk_constraint(t_meta.name,
+                                             schema=t_meta.schema)
+            indexes = inspector.get_indexes(t_meta.name,
+                                            schema=t_meta.schema)
+
+            leading = [(pk.get("constrained_columns") or [None])[0]]
+            leading.extend(index["column_names"][0] for index in indexes
+                           if index.get("column_names"))
+
+            if uid not in leading:
+                return False
+
+    return True
+
+
+def explain_batch_queries(job: str,
+                          meta_table_name: str,
+                          meta_table_cols: Optional[Dict[str, str]] = None,
+                          batch_id_min: Optional[int] = None,
+                          batch_id_max: Optional[int] = None,
+                          batch_count: Optional[int] = None,
+                          meta_table_filters: Optional[
+                              List[Tuple[str, str, Any]]] = None,
+                          meta_table_partitions: Optional[
+                              List[Union[str, Dict[str, Any]]]] = None
+                          ) -> Dict[str, QueryDiagnostics]:
+    """Provide compiled SQL and query plans of the queries issued while
+    acquiring the next batch of given job. Warnings are logged and included
+    if the meta table's uid column has no usable index or if a sequential
+    scan is chosen.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job that operates on a given `meta_table_name`.
+    meta_table_name:
+        Name of the meta data table containing information about the actual
+        data items.
+    meta_table_cols: dict, optional
+        Specify the relevant columns `uid`, `item` and `weight` of the
+        meta data table.
+    batch_id_min: int, optional
+        Lower batch boundary as passed to `acquire_batch`.
+    batch_id_max: int, optional
+        Upper batch boundary as passed to `acquire_batch`.
+    batch_count: int, optional
+        Maximum number of items as passed to `acquire_batch`.
+    meta_table_filters: list, optional
+        Filter conditions as passed to `acquire_batch`.
+    meta_table_partitions: list, optional
+        Partitions as passed to `acquire_batch`.
+
+    Returns
+    -------
+    diagnostics: dict
+        Diagnostics of the queries `inventory_max`, `next_batch` and `items`.
+
+    """
+
+    meta_table = MetaTableSpec(name=meta_table_name,
+                               cols=meta_table_cols or {},
+                               filters=meta_table_filters or [],
+                               partitions=meta_table_partitions or [])
+
+    with sql.db.engine_inventory.connect() as conn:
+        stmt = crud._build_max_meta_id_from_inventory_query(
+            meta_table=meta_table,
+            job=job
+        )
+        inventory_max = _explain("inventory_max", stmt, conn)
+        id_inventory_max = conn.execute(stmt).scalar()
+
+    with sql.db.get_engine_meta(meta_table).connect() as conn:
+        # reflect upfront to avoid checking out a second connection
+        load_meta_table(meta_table, conn=conn)
+
+        # mirror the first probe of `read_next_batch_from_meta` where
+        # partitioned meta tables are pruned via the job's processed ids
+        shared = sql.db.is_shared_with(meta_table) and \
+            not meta_table.partitions
+        id_min = batch_id_min
+        if not shared:
+            id_min = max(batch_id_min or 0, id_inventory_max + 1)
+
+        t_meta = load_meta_table(meta_table, id_min=id_min,
+                                 id_max=batch_id_max)
+        c_id = t_meta.c[meta_table.cols.uid]
+
+        columns, where = crud._build_next_batch_columns(
+            meta_table=meta_table,
+            job=job,
+            id_inventory_max=None if shared else id_inventory_max,
+            id_min=id_min,
+            id_max=batch_id_max
+        )
+        chunk_size = cfg.settings.BOUNDARY_SEARCH_CHUNK_SIZE
+        if batch_count:
+            chunk_size = min(chunk_size, batch_count)
+        lower = c_id >= id_min if id_min is not None else sa.true()
+        stmt = crud._build_meta_id_probe_query(meta_table=meta_table,
+                                               lower=lower,
+                                               chunk_size=chunk_size,
+                                               id_max=batch_id_max,
+                                               columns=columns,
+                                               where=where,
+                                               id_min=id_min)
+        next_batch = _explain("next_batch", stmt, conn)
+
+        id_min = max(batch_id_min or 0, id_inventory_max + 1)
+        id_max = batch_id_max or id_min + chunk_size - 1
+        stmt = crud._build_items_via_id_range_query(meta_table=meta_table,
+                                                    id_min=id_min,
+                                                    id_max=id_max,
+                                                    conn=conn)
+        items = _explain("items", stmt, conn)
+
+        indexed = has_uid_index(meta_table, conn=conn)
+
+    if not indexed:
+        warning = (f"Meta table '{meta_table.name}' has no index on uid "
+                   f"column '{meta_table.cols.uid}'. Boundary searches and "
+                   f"item fetches scan the entire table.")
+        next_batch.warnings.insert(0, warning)
+        items.warnings.insert(0, warning)
+
+    diagnostics = {query.name: query
+                   for query in (inventory_max, next_batch, items)}
+
+    for query in diagnostics.values():
+        logger.info(f"{query.name}_sql: {query.sql}")
+        logger.info(f"{query.name}_plan: {query.plan}")
+        for warning in query.warnings:
+            logger.warning(warning)
+
+    return diagnostics
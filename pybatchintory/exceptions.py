@@ -0,0 +1,15 @@
+"""This module contains package specific exceptions."""
+
+
+class ConcurrentChangeError(Exception):
+    """Raised if the inventory has been changed by a concurrent worker of the
+    same job while acquiring a batch.
+
+    """
+
+
+class LeaseLostError(Exception):
+    """Raised if a batch has been reclaimed by another worker, e.g. because
+    its lease expired.
+
+    """
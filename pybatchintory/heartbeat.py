@@ -0,0 +1,52 @@
+"""This module contains the heartbeat facility which keeps the leases of
+running batches alive.
+
+"""
+
+import threading
+
+from pybatchintory.logging import logger
+from pybatchintory.sql import crud
+
+
+class Heartbeat(threading.Thread):
+    """Background thread which periodically extends the lease of a running
+    batch until stopped. Stops on its own once the lease has been lost.
+
+    """
+
+    def __init__(self, primary_key: int, attempt: int, lease_ttl: float):
+        super().__init__(name=f"pybatchintory-heartbeat-{primary_key}",
+                         daemon=True)
+
+        self.primary_key = primary_key
+        self.attempt = attempt
+        self.lease_ttl = lease_ttl
+        self.lost = False
+
+        self._stopped = threading.Event()
+
+    def run(self):
+        interval = self.lease_ttl / 3
+
+        while not self._stopped.wait(interval):
+            try:
+                extended = crud.extend_lease_in_inventory(
+                    primary_key=self.primary_key,
+                    attempt=self.attempt,
+                    lease_ttl=self.lease_ttl)
+            except Exception as e:
+                logger.warning(f"Heartbeat for batch {self.primary_key} "
+                               f"failed: {e}")
+                continue
+
+            if not extended:
+                logger.warning(f"Lease of batch {self.primary_key} has been "
+                               f"lost.")
+                self.lost = True
+                return
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
@@ -0,0 +1,226 @@
+"""This module contains the instrumentation facility which records wall time,
+row counts and query counts of database operations.
+
+Each instrumented operation emits a `Measurement` which is aggregated by the
+global `metrics` registry and passed to all registered callbacks, e.g. an
+`OpenTelemetryEmitter`.
+
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any
+
+import sqlalchemy as sa
+from pydantic.main import BaseModel
+
+from pybatchintory.logging import logger
+from pybatchintory.models import BatchIdRange
+
+_QUERY_COUNTERS: contextvars.ContextVar = contextvars.ContextVar(
+    "pybatchintory_query_counters", default=()
+)
+
+
+class Measurement(BaseModel):
+    """Resembles a single measured operation.
+
+    """
+
+    name: str
+    start: float
+    duration: float
+    rows: Optional[int] = None
+    queries: int = 0
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = {}
+
+
+class OperationStats(BaseModel):
+    """Aggregated measurements of an operation.
+
+    """
+
+    calls: int = 0
+    errors: int = 0
+    duration: float = 0
+    duration_max: float = 0
+    rows: int = 0
+    queries: int = 0
+
+
+class MetricsRegistry:
+    """Aggregates measurements per operation name while dispatching them to
+    registered callbacks.
+
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, OperationStats] = {}
+        self._callbacks: List[Callable[[Measurement], None]] = []
+        self._lock = threading.Lock()
+
+    def register_callback(self, callback: Callable[[Measurement], None]):
+        """Register a callback receiving every `Measurement`.
+
+        """
+
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unregister_callback(self, callback: Callable[[Measurement], None]):
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def record(self, measurement: Measurement):
+        with self._lock:
+            stats = self._stats.setdefault(measurement.name, OperationStats())
+            stats.calls += 1
+            stats.errors += measurement.error is not None
+            stats.duration += measurement.duration
+            stats.duration_max = max(stats.duration_max, measurement.duration)
+            stats.rows += measurement.rows or 0
+            stats.queries += measurement.queries
+            callbacks = list(self._callbacks)
+
+        for callback in callbacks:
+            try:
+                callback(measurement)
+            except Exception as e:
+                logger.warning(f"Instrumentation callback failed: {e}")
+
+    def snapshot(self) -> Dict[str, OperationStats]:
+        """Provide a copy of the aggregated measurements keyed by operation
+        name.
+
+        """
+
+        with self._lock:
+            return {name: stats.copy()
+                    for name, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+metrics = MetricsRegistry()
+"""Global registry of all measurements."""
+
+
+def _count_query(*args, **kwargs):
+    for counter in _QUERY_COUNTERS.get():
+        counter[0] += 1
+
+
+def register_engine(engine):
+    """Count queries executed via given engine towards instrumented operations
+    which are active in the current thread or task.
+
+    """
+
+    # async engines expose events of their synchronous engine
+    engine = getattr(engine, "sync_engine", engine)
+    if not sa.event.contains(engine, "before_cursor_execute", _count_query):
+        sa.event.listen(engine, "before_cursor_execute", _count_query)
+
+
+def _count_rows(result: Any) -> Optional[int]:
+    """Derive the number of rows from the result of an instrumented
+    operation. Returns `None` for scalar results.
+
+    """
+
+    if isinstance(result, bool):
+        return int(result)
+    if isinstance(result, BatchIdRange):
+        return result.count
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    if isinstance(result, dict):
+        if isinstance(result.get("id_range"), BatchIdRange):
+            return result["id_range"].count
+
+        import numpy as np
+
+        # columnar results contain one array per column
+        first = next(iter(result.values()), None)
+        return len(first) if isinstance(first, np.ndarray) else 1
+
+
+def instrument(func: Callable) -> Callable:
+    """Record wall time, row count and query count of every invocation of the
+    decorated function.
+
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        counter = [0]
+        token = _QUERY_COUNTERS.set((*_QUERY_COUNTERS.get(), counter))
+        start = time.time()
+        perf_start = time.perf_counter()
+
+        def record(**values):
+            metrics.record(Measurement(name=func.__name__,
+                                       start=start,
+                                       duration=time.perf_counter() -
+                                       perf_start,
+                                       queries=counter[0],
+                                       **values))
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record(error=repr(e))
+            raise
+        finally:
+            _QUERY_COUNTERS.reset(token)
+
+        record(rows=_count_rows(result))
+        return result
+
+    return wrapper
+
+
+class OpenTelemetryEmitter:
+    """Callback which emits every measurement as an OpenTelemetry span.
+    Requires `opentelemetry-api` to be installed.
+
+    Parameters
+    ----------
+    tracer_provider: TracerProvider, optional
+        Provider of the tracer. Uses the global tracer provider if not given.
+
+    """
+
+    def __init__(self, tracer_provider=None):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("Emitting spans requires `opentelemetry-api` "
+                              "to be installed.") from e
+
+        self._status = trace.Status
+        self._status_code = trace.StatusCode
+        self.tracer = trace.get_tracer("pybatchintory",
+                                       tracer_provider=tracer_provider)
+
+    def __call__(self, measurement: Measurement):
+        start = int(measurement.start * 1e9)
+        end = start + int(measurement.duration * 1e9)
+
+        span = self.tracer.start_span(f"pybatchintory.{measurement.name}",
+                                      start_time=start)
+        span.set_attribute("pybatchintory.queries", measurement.queries)
+        if measurement.rows is not None:
+            span.set_attribute("pybatchintory.rows", measurement.rows)
+        for key, value in measurement.attributes.items():
+            span.set_attribute(f"pybatchintory.{key}", value)
+        if measurement.error:
+            span.set_status(self._status(self._status_code.ERROR,
+                                         measurement.error))
+
+        span.end(end_time=end)
@@ -1,11 +1,65 @@
-from typing import Optional, Dict
+import asyncio
+import datetime
+import functools
+import random
+import time
+from typing import Optional, Dict, List, Tuple, Any, Union
 
+from sqlalchemy.engine.base import Connection
+
+from pybatchintory import config as cfg, sql
 from pybatchintory.batch import Batch
+from pybatchintory.exceptions import ConcurrentChangeError
+from pybatchintory.logging import logger
 from pybatchintory.models import BatchConfig, MetaTableSpec
 from pybatchintory.sql import crud
 from pybatchintory import validate
 
 
+def _retry_on_concurrent_change(func):
+    """Retry batch acquisition with randomized exponential backoff if a
+    concurrent worker of the same job acquired an overlapping batch. Supports
+    coroutine functions which back off without blocking the event loop.
+
+    """
+
+    def _delays():
+        retries = cfg.settings.CONCURRENT_RETRIES
+        backoff = cfg.settings.CONCURRENT_RETRY_BACKOFF
+
+        for retry in range(retries):
+            yield random.uniform(0, backoff * 2 ** retry)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            for delay in _delays():
+                try:
+                    return await func(*args, **kwargs)
+                except ConcurrentChangeError as e:
+                    logger.info(f"Retry acquisition due to concurrent "
+                                f"change: {e}")
+                    await asyncio.sleep(delay)
+
+            return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for delay in _delays():
+            try:
+                return func(*args, **kwargs)
+            except ConcurrentChangeError as e:
+                logger.info(f"Retry acquisition due to concurrent change: {e}")
+                time.sleep(delay)
+
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+@_retry_on_concurrent_change
 def acquire_batch(job: str,
                   meta_table_name: str,
                   meta_table_cols: Optional[Dict[str, str]] = None,
@@ -13,10 +67,30 @@ def acquire_batch(job: str,
                   batch_id_min: Optional[int] = None,
                   batch_id_max: Optional[int] = None,
                   batch_weight: Optional[float] = None,
-                  batch_count: Optional[int] = None) -> Optional[Batch]:
+                  batch_count: Optional[int] = None,
+                  use_cumulative_weight_index: bool = False,
+                  lazy: bool = False,
+                  columns: Optional[List[str]] = None,
+                  max_attempts: Optional[int] = None,
+                  fill_gaps: bool = False,
+                  lease_ttl: Optional[float] = None,
+                  meta_table_col_types: Optional[Dict[str, str]] = None,
+                  meta_table_filters: Optional[
+                      List[Tuple[str, str, Any]]] = None,
+                  upstream_job: Optional[str] = None,
+                  meta_table_partitions: Optional[
+                      List[Union[str, Dict[str, Any]]]] = None,
+                  batch_time_min: Optional[datetime.datetime] = None,
+                  batch_time_max: Optional[datetime.datetime] = None,
+                  batch_interval: Optional[datetime.timedelta] = None
+                  ) -> Optional[Batch]:
     """Factory function to instantiate a `Batch` including validation rules
     to prevent invalid batch configurations.
 
+    Concurrent workers of the same job acquire disjoint consecutive batches.
+    If a concurrent worker acquires an overlapping batch in the meantime, the
+    acquisition is retried up to `CONCURRENT_RETRIES` times.
+
     Parameters
     ----------
     job: str
@@ -45,6 +119,74 @@ def acquire_batch(job: str,
         Define the maximum weight allowed to be included in a batch.
     batch_count: int, optional
         Define the maximum number of items to be included in a batch.
+    use_cumulative_weight_index: bool, optional
+        Maintain and use a cumulative weight index for the meta data table in
+        the inventory database to find weight bounded batch boundaries via
+        index lookups. Requires an append-only meta data table with immutable
+        weights.
+    lazy: bool, optional
+        Only register the batch range in the inventory table without loading
+        its items. Items are fetched on demand via `Batch.items` or streamed
+        via `Batch.iter_items`.
+    columns: list, optional
+        Names of additional meta data table columns to be loaded along with
+        the items. These are provided as NumPy arrays via `Batch.columns` or
+        as an arrow table via `Batch.to_arrow`.
+    max_attempts: int, optional
+        If given, failed batches of the same job with fewer attempts are
+        reclaimed before new data is acquired. A reclaimed batch reuses its
+        inventory row while incrementing its attempt.
+    fill_gaps: bool, optional
+        Only acquire meta ids below the job's watermark which are not covered
+        by succeeded or running batches of the same job, e.g. due to failed
+        batches or deleted inventory rows. Returns `None` if there are no
+        uncovered meta ids left. Raises `ValueError` if the job serves as
+        `upstream_job` of chained jobs.
+    lease_ttl: float, optional
+        Lease the batch for given number of seconds. The lease is extended by
+        a background heartbeat until the batch is released. Running batches of
+        the same job with expired leases, e.g. due to killed workers, are
+        reclaimed before new data is acquired.
+    meta_table_col_types: dict, optional
+        Declare the types of all used meta data table columns as names of
+        SqlAlchemy types, e.g. `{"uid": "BigInteger", "item": "String"}`.
+        This avoids reflecting the meta data table from the database.
+    meta_table_filters: list, optional
+        Filter conditions on the meta data table as `(column, operator,
+        value)` triples, e.g. `[("status", "==", "valid")]`. These are applied
+        to all meta data table queries such that weights, counts and items
+        only cover matching rows. Supported operators are `==`, `!=`, `<`,
+        `<=`, `>`, `>=`, `in`, `not_in`, `like`, `is` and `is_not`.
+    upstream_job: str, optional
+        Process the succeeded batches of given upstream job on
+        `meta_table_name` instead of the meta data table itself. The inventory
+        table serves as meta data source with `id` as uid, `job_result_item`
+        as item and `batch_weight` as weight. Batches are registered for meta
+        table `{meta_table_name}/{upstream_job}` which may serve as
+        `meta_table_name` of further chained jobs. Permanently failed
+        upstream batches are skipped according to
+        `INVENTORY_SOURCE_MAX_ATTEMPTS`.
+    meta_table_partitions: list, optional
+        Names of the physical tables or partitions of `meta_table_name` in
+        ascending uid order, e.g. one table per month, which share one
+        logical uid space. Partitions may also be given as dictionaries with
+        `name` and known uid bounds `id_min` and `id_max`. Queries only cover
+        the partitions overlapping the candidate uid range while uid bounds
+        of complete partitions are cached.
+    batch_time_min: datetime, optional
+        Define the lower batch boundary by providing the minimum timestamp of
+        the meta data table's `timestamp` column which needs to be given via
+        `meta_table_cols`. Time bounds are resolved to uids via index lookups
+        on the timestamp column assuming timestamps to increase along with
+        uids. Resolved uids are cached for repeated planning.
+    batch_time_max: datetime, optional
+        Define the upper batch boundary by providing the exclusive maximum
+        timestamp of the meta data table's `timestamp` column.
+    batch_interval: timedelta, optional
+        Limit batches to a single interval of data, e.g. one batch per hour
+        via `timedelta(hours=1)` which may be further bounded by
+        `batch_weight` and `batch_count`. Intervals are aligned to the unix
+        epoch and only acquired once a later meta id closes them.
 
     Returns
     -------
@@ -52,22 +194,678 @@ def acquire_batch(job: str,
 
     """
 
-    meta_table_cols = meta_table_cols or {}
-    meta_table = MetaTableSpec(name=meta_table_name, cols=meta_table_cols)
-    id_user_min = batch_id_min if batch_id_min is not None else float("-inf")
+    meta_table = _build_meta_table_spec(
+        meta_table_name=meta_table_name,
+        meta_table_cols=meta_table_cols,
+        upstream_job=upstream_job,
+        col_types=meta_table_col_types,
+        cumulative_weight_index=use_cumulative_weight_index,
+        filters=meta_table_filters or [],
+        partitions=meta_table_partitions or []
+    )
 
-    id_inventory_max = crud.read_max_meta_id_from_inventory(
+    if max_attempts or lease_ttl:
+        batch_cfg = BatchConfig(meta_table=meta_table,
+                                job=job,
+                                job_identifier=job_identifier,
+                                batch_weight=batch_weight,
+                                batch_count=batch_count,
+                                columns=columns,
+                                lease_ttl=lease_ttl)
+
+        batch = Batch.reclaim(batch_cfg=batch_cfg,
+                              max_attempts=max_attempts,
+                              lazy=lazy)
+        if batch:
+            return batch
+
+    id_inventory_max = None
+    if batch_time_min or batch_time_max or batch_interval:
+        if fill_gaps and batch_interval:
+            raise ValueError("`batch_interval` is not supported in "
+                             "combination with `fill_gaps`.")
+
+        bounds = _resolve_time_bounds(meta_table=meta_table,
+                                      job=job,
+                                      batch_id_min=batch_id_min,
+                                      batch_id_max=batch_id_max,
+                                      batch_time_min=batch_time_min,
+                                      batch_time_max=batch_time_max,
+                                      batch_interval=batch_interval)
+        if not bounds:
+            return
+
+        batch_id_min, batch_id_max, id_inventory_max = bounds
+
+    if fill_gaps:
+        _reject_upstream_job(meta_table=meta_table,
+                             job=job,
+                             action="`fill_gaps`")
+        acquire = _acquire_gap_batch
+    elif meta_table.cumulative_weight_index:
+        acquire = _acquire_indexed_batch
+    else:
+        acquire = _acquire_next_batch
+
+    batch = acquire(meta_table=meta_table,
+                    job=job,
+                    job_identifier=job_identifier,
+                    batch_id_min=batch_id_min,
+                    batch_id_max=batch_id_max,
+                    batch_weight=batch_weight,
+                    batch_count=batch_count,
+                    columns=columns,
+                    lease_ttl=lease_ttl,
+                    lazy=lazy)
+
+    # interval may have been acquired concurrently after resolving it
+    if not batch and batch_interval:
+        id_current = crud.read_max_meta_id_from_inventory(
+            meta_table=meta_table,
+            job=job
+        )
+        if id_current != id_inventory_max:
+            raise ConcurrentChangeError(
+                f"Watermark of job '{job}' changed concurrently from "
+                f"{id_inventory_max} to {id_current}.")
+
+    return batch
+
+
+@_retry_on_concurrent_change
+def acquire_batches(job: str,
+                    meta_table_name: str,
+                    iterations: int,
+                    meta_table_cols: Optional[Dict[str, str]] = None,
+                    job_identifier: Optional[str] = None,
+                    batch_id_min: Optional[int] = None,
+                    batch_id_max: Optional[int] = None,
+                    batch_weight: Optional[float] = None,
+                    batch_count: Optional[int] = None,
+                    columns: Optional[List[str]] = None,
+                    lease_ttl: Optional[float] = None,
+                    meta_table_col_types: Optional[Dict[str, str]] = None,
+                    meta_table_filters: Optional[
+                        List[Tuple[str, str, Any]]] = None,
+                    upstream_job: Optional[str] = None,
+                    meta_table_partitions: Optional[
+                        List[Union[str, Dict[str, Any]]]] = None
+                    ) -> List[Batch]:
+    """Factory function to instantiate up to `iterations` consecutive
+    `Batch` objects at once. All batch ranges are computed in a single pass
+    over the meta table and registered in the inventory table via a single
+    bulk insert. Items of each batch are loaded lazily on access.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job that operates on a given `meta_table_name`.
+    meta_table_name:
+        Name of the meta data table containing information about the actual
+        data items.
+    iterations: int
+        Define the maximum number of batches to be acquired.
+    meta_table_cols: dict, optional
+        Specify the relevant columns `uid`, `item` and `weight` of the
+        meta data table.
+    job_identifier: str, optional
+        Unique job id which even separates among tasks of the same job.
+    batch_id_min: int, optional
+        Define the lower boundary by providing the minimum valid id of the
+        meta data table.
+    batch_id_max: int, optional
+        Define the upper boundary by providing the maximum valid id of the
+        meta data table.
+    batch_weight: float, optional
+        Define the maximum weight allowed to be included in each batch.
+    batch_count: int, optional
+        Define the maximum number of items to be included in each batch.
+    columns: list, optional
+        Names of additional meta data table columns to be loaded along with
+        the items of each batch.
+    lease_ttl: float, optional
+        Lease each batch for given number of seconds. Leases are extended by
+        background heartbeats until the batches are released.
+    meta_table_col_types: dict, optional
+        Declare the types of all used meta data table columns as names of
+        SqlAlchemy types to avoid reflecting the meta data table.
+    meta_table_filters: list, optional
+        Filter conditions on the meta data table as `(column, operator,
+        value)` triples which are applied to all meta data table queries.
+    upstream_job: str, optional
+        Process the succeeded batches of given upstream job on
+        `meta_table_name` via the inventory table as meta data source.
+    meta_table_partitions: list, optional
+        Names of the physical tables or partitions of `meta_table_name` in
+        ascending uid order which share one logical uid space.
+
+    Returns
+    -------
+    acquired_batches: list
+
+    """
+
+    meta_table = _build_meta_table_spec(meta_table_name=meta_table_name,
+                                        meta_table_cols=meta_table_cols,
+                                        upstream_job=upstream_job,
+                                        col_types=meta_table_col_types,
+                                        filters=meta_table_filters or [],
+                                        partitions=meta_table_partitions or [])
+
+    prepared = _prepare_batch_config(meta_table=meta_table,
+                                     job=job,
+                                     job_identifier=job_identifier,
+                                     batch_id_min=batch_id_min,
+                                     batch_id_max=batch_id_max,
+                                     batch_weight=batch_weight,
+                                     batch_count=batch_count,
+                                     columns=columns,
+                                     lease_ttl=lease_ttl)
+    if not prepared:
+        return []
+
+    batch_cfg, checked_id_min = prepared
+
+    batch_id_ranges = crud.read_meta_id_ranges_from_meta(
         meta_table=meta_table,
-        job=job
+        id_min=checked_id_min,
+        id_max=batch_id_max,
+        count=batch_count,
+        weight=batch_weight,
+        iterations=iterations
     )
-    id_meta_max = crud.read_max_meta_id_from_meta(meta_table=meta_table)
 
-    if validate.acquire_batch_is_invalid(id_user_min=id_user_min,
-                                         id_meta_max=id_meta_max,
-                                         id_inventory_max=id_inventory_max):
+    if not batch_id_ranges:
+        return []
+
+    # each batch config reflects the state of its sequential acquisition
+    batches = []
+    id_inventory_max = batch_cfg.id_inventory_max
+    for batch_id_range in batch_id_ranges:
+        update = {"id_inventory_max": id_inventory_max}
+        batches.append(Batch(id_range=batch_id_range,
+                             batch_cfg=batch_cfg.copy(update=update)))
+        id_inventory_max = batch_id_range.id_max
+
+    Batch.acquire_all(batches)
+    return batches
+
+
+def read_uncovered_ranges(
+        job: str,
+        meta_table_name: str,
+        batch_id_min: Optional[int] = None,
+        batch_id_max: Optional[int] = None,
+        statuses: Tuple[str, ...] = ("succeeded", "running"),
+        meta_table_cols: Optional[Dict[str, str]] = None,
+        meta_table_col_types: Optional[Dict[str, str]] = None,
+        meta_table_filters: Optional[List[Tuple[str, str, Any]]] = None,
+        upstream_job: Optional[str] = None,
+        meta_table_partitions: Optional[
+            List[Union[str, Dict[str, Any]]]] = None
+) -> List[Tuple[int, int]]:
+    """Compute inclusive ranges of meta ids which have not been covered by
+    batches of the given job with given `statuses`.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job that operates on a given `meta_table_name`.
+    meta_table_name:
+        Name of the meta data table containing information about the actual
+        data items.
+    batch_id_min: int, optional
+        Define the lower boundary. Defaults to the lowest id of the meta data
+        table.
+    batch_id_max: int, optional
+        Define the upper boundary. Defaults to the highest id of the meta data
+        table.
+    statuses: tuple, optional
+        Statuses of inventory rows which are considered to cover their ranges.
+    meta_table_cols: dict, optional
+        Specify the relevant columns `uid`, `item` and `weight` of the
+        meta data table.
+    meta_table_col_types: dict, optional
+        Declare the types of all used meta data table columns as names of
+        SqlAlchemy types to avoid reflecting the meta data table.
+    meta_table_filters: list, optional
+        Filter conditions on the meta data table as `(column, operator,
+        value)` triples which are applied to all meta data table queries.
+    upstream_job: str, optional
+        Use the succeeded batches of given upstream job on `meta_table_name`
+        as meta data source.
+    meta_table_partitions: list, optional
+        Names of the physical tables or partitions of `meta_table_name` in
+        ascending uid order which share one logical uid space.
+
+    Returns
+    -------
+    uncovered_ranges: list
+
+    """
+
+    meta_table = _build_meta_table_spec(
+        meta_table_name=meta_table_name,
+        meta_table_cols=meta_table_cols,
+        upstream_job=upstream_job,
+        col_types=meta_table_col_types,
+        filters=meta_table_filters or [],
+        partitions=meta_table_partitions or []
+    )
+
+    if batch_id_min is None:
+        batch_id_min = crud.read_min_meta_id_from_meta(meta_table=meta_table)
+    if batch_id_max is None:
+        batch_id_max = crud.read_max_meta_id_from_meta(meta_table=meta_table)
+
+    return crud.read_uncovered_ranges_from_inventory(meta_table=meta_table,
+                                                     job=job,
+                                                     id_min=batch_id_min,
+                                                     id_max=batch_id_max,
+                                                     statuses=statuses)
+
+
+@_retry_on_concurrent_change
+def compact_inventory(job: str, meta_table_name: str) -> int:
+    """Merge contiguous ranges of succeeded batches of given job into summary
+    rows while moving the merged rows to the inventory archive table. Keeps
+    the watermark and uncovered ranges of the job unchanged and may run while
+    workers are active. Raises `ValueError` for jobs serving as
+    `upstream_job` of chained jobs since summary rows receive new ids.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job that operates on a given `meta_table_name`.
+    meta_table_name:
+        Name of the meta data table containing information about the actual
+        data items.
+
+    Returns
+    -------
+    archived_rows: int
+
+    """
+
+    meta_table = MetaTableSpec(name=meta_table_name)
+    _reject_upstream_job(meta_table=meta_table, job=job, action="Compaction")
+    return crud.compact_rows_in_inventory(meta_table=meta_table, job=job)
+
+
+def plan_backfill(job: str,
+                  meta_table_name: str,
+                  meta_table_cols: Optional[Dict[str, str]] = None,
+                  batch_id_min: Optional[int] = None,
+                  batch_id_max: Optional[int] = None,
+                  batch_weight: Optional[float] = None,
+                  batch_count: Optional[int] = None,
+                  meta_table_col_types: Optional[Dict[str, str]] = None,
+                  meta_table_filters: Optional[
+                      List[Tuple[str, str, Any]]] = None,
+                  meta_table_partitions: Optional[
+                      List[Union[str, Dict[str, Any]]]] = None) -> int:
+    """Precompute all batch ranges of a backfill in a single streaming pass
+    over the meta table and store them as pending rows in the plan table.
+    Workers drain the plan via `acquire_planned_batch`. Ranges are inserted
+    in chunks of `PLAN_CHUNK_SIZE` rows. An interrupted planning continues
+    after the highest planned meta id between `batch_id_min` and
+    `batch_id_max` when invoked again. Ranges planned concurrently by another
+    planner with the same batch bounds are skipped.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job that operates on a given `meta_table_name`.
+    meta_table_name:
+        Name of the meta data table containing information about the actual
+        data items.
+    meta_table_cols: dict, optional
+        Specify the relevant columns `uid`, `item` and `weight` of the
+        meta data table.
+    batch_id_min: int, optional
+        Define the lower boundary of the backfill. Uses the lowest meta id if
+        not given.
+    batch_id_max: int, optional
+        Define the upper boundary of the backfill. Uses the highest meta id
+        at planning time if not given.
+    batch_weight: float, optional
+        Define the maximum weight allowed to be included in each batch.
+    batch_count: int, optional
+        Define the maximum number of items to be included in each batch.
+    meta_table_col_types: dict, optional
+        Declare the types of all used meta data table columns as names of
+        SqlAlchemy types to avoid reflecting the meta data table.
+    meta_table_filters: list, optional
+        Filter conditions on the meta data table as `(column, operator,
+        value)` triples which are applied to all meta data table queries.
+    meta_table_partitions: list, optional
+        Names of the physical tables or partitions of `meta_table_name` in
+        ascending uid order which share one logical uid space.
+
+    Returns
+    -------
+    planned_batches: int
+
+    """
+
+    if not (batch_weight or batch_count):
+        raise ValueError("Planning a backfill requires `batch_weight` or "
+                         "`batch_count`.")
+
+    meta_table = MetaTableSpec(name=meta_table_name,
+                               cols=meta_table_cols or {},
+                               col_types=meta_table_col_types,
+                               filters=meta_table_filters or [],
+                               partitions=meta_table_partitions or [])
+
+    _reject_upstream_job(meta_table=meta_table,
+                         job=job,
+                         action="Planning a backfill")
+
+    if batch_id_min is None:
+        batch_id_min = crud.read_min_meta_id_from_meta(meta_table=meta_table)
+    if batch_id_max is None:
+        batch_id_max = crud.read_max_meta_id_from_meta(meta_table=meta_table)
+
+    id_plan_max = crud.read_max_meta_id_from_plan(meta_table=meta_table,
+                                                  job=job,
+                                                  id_min=batch_id_min,
+                                                  id_max=batch_id_max)
+    if id_plan_max is not None:
+        batch_id_min = max(batch_id_min, id_plan_max + 1)
+
+    ranges = crud.iter_meta_id_ranges_from_meta(meta_table=meta_table,
+                                                id_min=batch_id_min,
+                                                id_max=batch_id_max,
+                                                weight=batch_weight,
+                                                count=batch_count)
+
+    planned = 0
+    values = []
+    for id_range in ranges:
+        values.append({"meta_table": meta_table.name,
+                       "job": job,
+                       "batch_id_start": id_range.id_min,
+                       "batch_id_end": id_range.id_max,
+                       "batch_count": id_range.count,
+                       "batch_weight": id_range.weight})
+
+        if len(values) == cfg.settings.PLAN_CHUNK_SIZE:
+            planned += crud.create_rows_in_plan(values=values)
+            values = []
+
+    planned += crud.create_rows_in_plan(values=values)
+
+    logger.info(f"planned_batches: {planned}")
+    return planned
+
+
+@_retry_on_concurrent_change
+def acquire_planned_batch(job: str,
+                          meta_table_name: str,
+                          meta_table_cols: Optional[Dict[str, str]] = None,
+                          job_identifier: Optional[str] = None,
+                          lazy: bool = False,
+                          columns: Optional[List[str]] = None,
+                          max_attempts: Optional[int] = None,
+                          lease_ttl: Optional[float] = None,
+                          meta_table_col_types: Optional[
+                              Dict[str, str]] = None,
+                          meta_table_filters: Optional[
+                              List[Tuple[str, str, Any]]] = None,
+                          meta_table_partitions: Optional[
+                              List[Union[str, Dict[str, Any]]]] = None
+                          ) -> Optional[Batch]:
+    """Acquire the next pending batch range of a backfill planned via
+    `plan_backfill`. The range is claimed from the plan table via an index
+    lookup and a single update without reading the meta table. Hence, many
+    concurrent workers may drain the same plan. Returns `None` if there are
+    no pending ranges left.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job as passed to `plan_backfill`.
+    meta_table_name:
+        Name of the meta data table as passed to `plan_backfill`.
+    meta_table_cols: dict, optional
+        Specify the relevant columns `uid`, `item` and `weight` of the
+        meta data table.
+    job_identifier: str, optional
+        Unique job id which even separates among tasks of the same job.
+    lazy: bool, optional
+        Only register the batch range in the inventory table without loading
+        its items.
+    columns: list, optional
+        Names of additional meta data table columns to be loaded along with
+        the items.
+    max_attempts: int, optional
+        If given, failed batches of the same job with fewer attempts are
+        reclaimed before pending ranges are claimed.
+    lease_ttl: float, optional
+        Lease the batch for given number of seconds. Running batches of the
+        same job with expired leases are reclaimed before pending ranges are
+        claimed.
+    meta_table_col_types: dict, optional
+        Declare the types of all used meta data table columns as names of
+        SqlAlchemy types to avoid reflecting the meta data table.
+    meta_table_filters: list, optional
+        Filter conditions as passed to `plan_backfill`.
+    meta_table_partitions: list, optional
+        Partitions as passed to `plan_backfill`.
+
+    Returns
+    -------
+    acquired_batch: Batch
+
+    """
+
+    meta_table = MetaTableSpec(name=meta_table_name,
+                               cols=meta_table_cols or {},
+                               col_types=meta_table_col_types,
+                               filters=meta_table_filters or [],
+                               partitions=meta_table_partitions or [])
+
+    batch_cfg = BatchConfig(meta_table=meta_table,
+                            job=job,
+                            job_identifier=job_identifier,
+                            columns=columns,
+                            lease_ttl=lease_ttl,
+                            planned=True)
+
+    if max_attempts or lease_ttl:
+        batch = Batch.reclaim(batch_cfg=batch_cfg,
+                              max_attempts=max_attempts,
+                              lazy=lazy)
+        if batch:
+            return batch
+
+    batch = Batch.claim_planned(batch_cfg=batch_cfg, lazy=lazy)
+    if not batch:
+        logger.info("No planned batches left to be processed.")
+
+    return batch
+
+
+def read_plan_progress(job: str, meta_table_name: str) -> Dict[str, Dict]:
+    """Provide the progress of a backfill planned via `plan_backfill` as
+    number of `batches`, `items` and `weight` per status. Pending ranges are
+    reported as `pending` while claimed ranges report the status of their
+    batches, e.g. `running`, `succeeded` or `failed`.
+
+    Parameters
+    ----------
+    job: str
+        Name of the job as passed to `plan_backfill`.
+    meta_table_name:
+        Name of the meta data table as passed to `plan_backfill`.
+
+    Returns
+    -------
+    progress: dict
+
+    """
+
+    meta_table = MetaTableSpec(name=meta_table_name)
+    return crud.read_progress_from_plan(meta_table=meta_table, job=job)
+
+
+def _build_meta_table_spec(meta_table_name: str,
+                           meta_table_cols: Optional[Dict[str, str]],
+                           upstream_job: Optional[str],
+                           **kwargs) -> MetaTableSpec:
+    """Create meta table specification of either the meta data table or the
+    succeeded batches of an upstream job in the inventory table.
+
+    """
+
+    if upstream_job:
+        meta_table = MetaTableSpec.from_inventory(meta_table=meta_table_name,
+                                                  job=upstream_job,
+                                                  cols=meta_table_cols,
+                                                  **kwargs)
+        _warn_permanently_failed_upstream(meta_table_name, upstream_job)
+        return meta_table
+
+    return MetaTableSpec(name=meta_table_name,
+                         cols=meta_table_cols or {},
+                         **kwargs)
+
+
+def _warn_permanently_failed_upstream(meta_table_name: str,
+                                      upstream_job: str):
+    """Warn about permanently failed batches of given upstream job which are
+    skipped by downstream jobs.
+
+    """
+
+    if not cfg.settings.INVENTORY_SOURCE_MAX_ATTEMPTS:
         return
 
-    checked_id_min = max(id_user_min, id_inventory_max + 1)
+    ids = crud.read_permanently_failed_ids_from_inventory(
+        meta_table=MetaTableSpec(name=meta_table_name),
+        job=upstream_job
+    )
+    if ids:
+        logger.warning(f"Downstream jobs skip permanently failed batches "
+                       f"{ids} of upstream job '{upstream_job}'.")
+
+
+def _reject_upstream_job(meta_table: MetaTableSpec,
+                         job: str,
+                         action: str,
+                         conn: Optional[Connection] = None):
+    """Raise `ValueError` if chained downstream jobs process the succeeded
+    batches of given job. Downstream jobs rely on the job's inventory ids
+    being registered in order and never being replaced.
+
+    """
+
+    if crud.has_downstream_jobs_in_inventory(meta_table=meta_table,
+                                             job=job,
+                                             conn=conn):
+        raise ValueError(f"{action} is not supported for job '{job}' since "
+                         f"it serves as `upstream_job` of chained jobs.")
+
+
+def _acquire_next_batch(meta_table: MetaTableSpec,
+                        job: str,
+                        job_identifier: Optional[str],
+                        batch_id_min: Optional[int],
+                        batch_id_max: Optional[int],
+                        batch_weight: Optional[float],
+                        batch_count: Optional[int],
+                        columns: Optional[List[str]],
+                        lease_ttl: Optional[float],
+                        lazy: bool) -> Optional[Batch]:
+    """Acquire the next batch with minimal round trips. Highest meta id,
+    batch range and items are read via a single meta query. If inventory and
+    meta table share the same database, the job's highest processed id is
+    part of this query while the entire acquisition runs in one transaction.
+
+    """
+
+    with sql.db.begin_shared(meta_table) as conn:
+        # partitioned meta tables are pruned via the job's processed ids
+        if conn is None or meta_table.partitions:
+            id_inventory_max = crud.read_max_meta_id_from_inventory(
+                meta_table=meta_table,
+                job=job,
+                conn=conn
+            )
+        else:
+            id_inventory_max = None
+
+        result = crud.read_next_batch_from_meta(
+            meta_table=meta_table,
+            job=job,
+            id_min=batch_id_min,
+            id_max=batch_id_max,
+            weight=batch_weight,
+            count=batch_count,
+            id_inventory_max=id_inventory_max,
+            with_items=not (lazy or columns),
+            conn=conn
+        )
+
+        if not result:
+            logger.info("No meta ids left to be processed.")
+            return
+
+        prepared = _build_batch_config(
+            meta_table=meta_table,
+            job=job,
+            job_identifier=job_identifier,
+            batch_id_min=batch_id_min,
+            batch_id_max=batch_id_max,
+            batch_weight=batch_weight,
+            batch_count=batch_count,
+            columns=columns,
+            lease_ttl=lease_ttl,
+            id_inventory_max=result["id_inventory_max"],
+            id_meta_max=result["id_meta_max"]
+        )
+        if not prepared:
+            return
+
+        batch_cfg, _ = prepared
+
+        batch = Batch(id_range=result["id_range"], batch_cfg=batch_cfg)
+        batch.acquire(lazy=lazy, items=result["items"], conn=conn)
+        return batch
+
+
+def _acquire_indexed_batch(meta_table: MetaTableSpec,
+                           job: str,
+                           job_identifier: Optional[str],
+                           batch_id_min: Optional[int],
+                           batch_id_max: Optional[int],
+                           batch_weight: Optional[float],
+                           batch_count: Optional[int],
+                           columns: Optional[List[str]],
+                           lease_ttl: Optional[float],
+                           lazy: bool) -> Optional[Batch]:
+    """Acquire the next batch while looking up weight bounded boundaries via
+    the cumulative weight index of the meta table.
+
+    """
+
+    prepared = _prepare_batch_config(meta_table=meta_table,
+                                     job=job,
+                                     job_identifier=job_identifier,
+                                     batch_id_min=batch_id_min,
+                                     batch_id_max=batch_id_max,
+                                     batch_weight=batch_weight,
+                                     batch_count=batch_count,
+                                     columns=columns,
+                                     lease_ttl=lease_ttl)
+    if not prepared:
+        return
+
+    batch_cfg, checked_id_min = prepared
+
+    crud.refresh_cumulative_weight_index(meta_table=meta_table)
+
     batch_id_range = crud.read_meta_id_range_from_meta(
         meta_table=meta_table,
         id_min=checked_id_min,
@@ -75,6 +873,233 @@ def acquire_batch(job: str,
         count=batch_count,
         weight=batch_weight
     )
+    if not batch_id_range:
+        logger.info("No meta ids left to be processed.")
+        return
+
+    batch = Batch(id_range=batch_id_range, batch_cfg=batch_cfg)
+    batch.acquire(lazy=lazy)
+    return batch
+
+
+def _floor_timestamp(timestamp: datetime.datetime,
+                     interval: datetime.timedelta) -> datetime.datetime:
+    """Floor given timestamp to the start of its interval. Intervals are
+    aligned to the unix epoch, e.g. to full hours or days.
+
+    """
+
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=timestamp.tzinfo)
+    return timestamp - (timestamp - epoch) % interval
+
+
+def _resolve_time_bounds(meta_table: MetaTableSpec,
+                         job: str,
+                         batch_id_min: Optional[int],
+                         batch_id_max: Optional[int],
+                         batch_time_min: Optional[datetime.datetime],
+                         batch_time_max: Optional[datetime.datetime],
+                         batch_interval: Optional[datetime.timedelta]
+                         ) -> Optional[Tuple]:
+    """Resolve time bounds to uid bounds which are intersected with the given
+    uid bounds. If `batch_interval` is given, the upper bound is limited to
+    the end of the interval containing the job's next meta id. An interval is
+    only closed once a meta id with a timestamp at or after its end exists.
+    Returns the resolved uid bounds along with the job's highest processed id
+    which is only read for intervals. Returns `None` if no meta ids are left
+    within the time bounds or the next interval is not closed yet.
+
+    """
+
+    if not meta_table.cols.timestamp:
+        raise ValueError("Time bounds require the `timestamp` column of the "
+                         "meta data table to be provided via "
+                         "`meta_table_cols`.")
+
+    def restrict_max(id_end: Optional[int]) -> Optional[int]:
+        if id_end is None:
+            return batch_id_max
+
+        id_max = id_end - 1
+        return id_max if batch_id_max is None else min(batch_id_max, id_max)
+
+    if batch_time_min is not None:
+        id_min = crud.read_first_meta_id_since(meta_table=meta_table,
+                                               timestamp=batch_time_min)
+        if id_min is None:
+            logger.info(f"No meta ids since {batch_time_min}.")
+            return
+
+        batch_id_min = id_min if batch_id_min is None \
+            else max(batch_id_min, id_min)
+
+    if batch_time_max is not None:
+        batch_id_max = restrict_max(crud.read_first_meta_id_since(
+            meta_table=meta_table,
+            timestamp=batch_time_max
+        ))
+
+    id_inventory_max = None
+    if batch_interval:
+        id_inventory_max = crud.read_max_meta_id_from_inventory(
+            meta_table=meta_table,
+            job=job
+        )
+
+        id_next = id_inventory_max + 1
+        if batch_id_min is not None:
+            id_next = max(id_next, batch_id_min)
+
+        row = crud.read_next_meta_id_with_timestamp(meta_table=meta_table,
+                                                    id_min=id_next)
+        if not row:
+            logger.info("No meta ids left to be processed.")
+            return
+
+        _, timestamp = row
+        if timestamp is not None:
+            interval_end = _floor_timestamp(timestamp, batch_interval) + \
+                batch_interval
+            id_end = crud.read_first_meta_id_since(meta_table=meta_table,
+                                                   timestamp=interval_end)
+
+            # interval is still filling until later meta ids arrive
+            if id_end is None:
+                logger.info(f"Interval until {interval_end} is not closed "
+                            f"yet.")
+                return
+
+            batch_id_max = restrict_max(id_end)
+
+    logger.info(f"time_bounds_to_ids: {batch_id_min} - {batch_id_max}")
+    return batch_id_min, batch_id_max, id_inventory_max
+
+
+def _acquire_gap_batch(meta_table: MetaTableSpec,
+                       job: str,
+                       job_identifier: Optional[str],
+                       batch_id_min: Optional[int],
+                       batch_id_max: Optional[int],
+                       batch_weight: Optional[float],
+                       batch_count: Optional[int],
+                       columns: Optional[List[str]],
+                       lease_ttl: Optional[float],
+                       lazy: bool) -> Optional[Batch]:
+    """Acquire a batch within the first uncovered range of meta ids below the
+    job's watermark.
+
+    """
+
+    id_inventory_max = crud.read_max_meta_id_from_inventory(
+        meta_table=meta_table,
+        job=job
+    )
+
+    if batch_id_min is None:
+        batch_id_min = crud.read_min_meta_id_from_meta(meta_table=meta_table)
+    if batch_id_max is None or batch_id_max > id_inventory_max:
+        batch_id_max = id_inventory_max
+
+    if batch_id_min > batch_id_max:
+        return
+
+    gaps = crud.read_uncovered_ranges_from_inventory(meta_table=meta_table,
+                                                     job=job,
+                                                     id_min=batch_id_min,
+                                                     id_max=batch_id_max)
+
+    for gap_min, gap_max in gaps:
+        batch_id_range = crud.read_meta_id_range_from_meta(
+            meta_table=meta_table,
+            id_min=gap_min,
+            id_max=gap_max,
+            count=batch_count,
+            weight=batch_weight
+        )
+
+        # uncovered range does not contain any meta ids
+        if not batch_id_range:
+            continue
+
+        batch_cfg = BatchConfig(meta_table=meta_table,
+                                job=job,
+                                job_identifier=job_identifier,
+                                batch_weight=batch_weight,
+                                batch_count=batch_count,
+                                columns=columns,
+                                lease_ttl=lease_ttl,
+                                fill_gaps=True,
+                                id_inventory_max=id_inventory_max)
+
+        batch = Batch(id_range=batch_id_range, batch_cfg=batch_cfg)
+        batch.acquire(lazy=lazy)
+        return batch
+
+
+def _prepare_batch_config(meta_table: MetaTableSpec,
+                          job: str,
+                          job_identifier: Optional[str],
+                          batch_id_min: Optional[int],
+                          batch_id_max: Optional[int],
+                          batch_weight: Optional[float],
+                          batch_count: Optional[int],
+                          columns: Optional[List[str]] = None,
+                          lease_ttl: Optional[float] = None
+                          ) -> Optional[Tuple[BatchConfig, int]]:
+    """Read the current state of inventory and meta table to build the batch
+    configuration and the minimum meta id of the next batch. Returns `None` if
+    no batch can be acquired.
+
+    """
+
+    # single transaction if inventory and meta table share the same database
+    with sql.db.begin_shared(meta_table) as conn:
+        id_inventory_max = crud.read_max_meta_id_from_inventory(
+            meta_table=meta_table,
+            job=job,
+            conn=conn
+        )
+        id_meta_max = crud.read_max_meta_id_from_meta(meta_table=meta_table,
+                                                      conn=conn)
+
+    return _build_batch_config(meta_table=meta_table,
+                               job=job,
+                               job_identifier=job_identifier,
+                               batch_id_min=batch_id_min,
+                               batch_id_max=batch_id_max,
+                               batch_weight=batch_weight,
+                               batch_count=batch_count,
+                               columns=columns,
+                               lease_ttl=lease_ttl,
+                               id_inventory_max=id_inventory_max,
+                               id_meta_max=id_meta_max)
+
+
+def _build_batch_config(meta_table: MetaTableSpec,
+                        job: str,
+                        job_identifier: Optional[str],
+                        batch_id_min: Optional[int],
+                        batch_id_max: Optional[int],
+                        batch_weight: Optional[float],
+                        batch_count: Optional[int],
+                        columns: Optional[List[str]],
+                        lease_ttl: Optional[float],
+                        id_inventory_max: int,
+                        id_meta_max: int) -> Optional[Tuple[BatchConfig, int]]:
+    """Build the batch configuration and the minimum meta id of the next batch
+    given the current state of inventory and meta table. Returns `None` if no
+    batch can be acquired.
+
+    """
+
+    id_user_min = batch_id_min if batch_id_min is not None else float("-inf")
+
+    if validate.acquire_batch_is_invalid(id_user_min=id_user_min,
+                                         id_meta_max=id_meta_max,
+                                         id_inventory_max=id_inventory_max):
+        return
+
+    checked_id_min = max(id_user_min, id_inventory_max + 1)
 
     batch_cfg = BatchConfig(
         meta_table=meta_table,
@@ -84,10 +1109,10 @@ def acquire_batch(job: str,
         id_max=batch_id_max,
         batch_weight=batch_weight,
         batch_count=batch_count,
+        columns=columns,
+        lease_ttl=lease_ttl,
         id_inventory_max=id_inventory_max,
         id_meta_max=id_meta_max
     )
 
-    batch = Batch(id_range=batch_id_range, batch_cfg=batch_cfg)
-    batch.acquire()
-    return batch
+    return batch_cfg, checked_id_min
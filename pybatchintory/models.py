@@ -1,5 +1,8 @@
-from typing import Optional
+from typing import Optional, List, Dict, Union
 
+import sqlalchemy as sa
+from pydantic import validator, StrictBool, StrictInt, StrictFloat, \
+    StrictStr
 from pydantic.main import BaseModel
 
 
@@ -26,6 +29,55 @@ class MetaTableColumns(BaseModel):
     uid: str = "uid"
     item: str = "item"
     weight: Optional[str] = "weight"
+    timestamp: Optional[str] = None
+
+
+FILTER_OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in", "not_in", "like",
+                    "is", "is_not")
+"""Supported operators of filter conditions on the meta data table."""
+
+FilterScalar = Union[StrictBool, StrictInt, StrictFloat, StrictStr]
+
+
+class MetaTableFilter(BaseModel):
+    """Resembles a filter condition on a column of the meta data table which
+    is applied to all meta data table queries.
+
+    """
+
+    col: str
+    op: str = "=="
+    value: Union[None, FilterScalar, List[FilterScalar]]
+
+    @validator("op")
+    def op_is_supported(cls, value):
+        if value not in FILTER_OPERATORS:
+            raise ValueError(f"Filter operator '{value}' is not supported. "
+                             f"Use one of {FILTER_OPERATORS}.")
+
+        return value
+
+
+class InventorySource(BaseModel):
+    """Resembles the succeeded batches of an upstream job in the inventory
+    table which serve as meta data source of downstream jobs.
+
+    """
+
+    meta_table: str
+    job: str
+
+
+class MetaTablePartition(BaseModel):
+    """Resembles a physical table or partition of a meta data table which is
+    split into several tables sharing one logical uid space. Unknown uid
+    bounds are read from the partition itself.
+
+    """
+
+    name: str
+    id_min: Optional[int] = None
+    id_max: Optional[int] = None
 
 
 class MetaTableSpec(BaseModel):
@@ -35,6 +87,108 @@ class MetaTableSpec(BaseModel):
 
     name: str
     cols: MetaTableColumns = MetaTableColumns()
+    col_types: Optional[Dict[str, str]] = None
+    cumulative_weight_index: bool = False
+    filters: List[MetaTableFilter] = []
+    inventory_source: Optional[InventorySource] = None
+    partitions: List[MetaTablePartition] = []
+
+    @validator("col_types")
+    def col_types_are_sqlalchemy_types(cls, value):
+        """Column types are declared via names of SqlAlchemy types such as
+        `BigInteger`, `String` or `Float`.
+
+        """
+
+        if value:
+            for col, col_type in value.items():
+                if not isinstance(getattr(sa.types, col_type, None), type):
+                    raise ValueError(f"Column type '{col_type}' of column "
+                                     f"'{col}' is not a SqlAlchemy type.")
+
+        return value
+
+    @validator("filters")
+    def filters_exclude_cumulative_weight_index(cls, value, values):
+        """The cumulative weight index covers all rows of the meta data table
+        and hence does not support filters.
+
+        """
+
+        if value and values.get("cumulative_weight_index"):
+            raise ValueError("Filters are not supported in combination with "
+                             "the cumulative weight index.")
+
+        return value
+
+    @validator("inventory_source")
+    def inventory_source_excludes_cumulative_weight_index(cls, value,
+                                                          values):
+        if value and values.get("cumulative_weight_index"):
+            raise ValueError("Inventory sources are not supported in "
+                             "combination with the cumulative weight index.")
+
+        return value
+
+    @validator("filters", pre=True, each_item=True)
+    def filters_from_triples(cls, value):
+        """Filters may be provided as `(column, operator, value)` triples.
+
+        """
+
+        if isinstance(value, (tuple, list)):
+            col, op, value = value
+            return {"col": col, "op": op, "value": value}
+
+        return value
+
+    @validator("partitions", pre=True, each_item=True)
+    def partitions_from_names(cls, value):
+        """Partitions may be provided via their table names only.
+
+        """
+
+        if isinstance(value, str):
+            return {"name": value}
+
+        return value
+
+    @validator("partitions")
+    def partitions_exclude_inventory_source(cls, value, values):
+        """Partitions are given in ascending uid order and are only supported
+        for meta data tables.
+
+        """
+
+        if value and values.get("inventory_source"):
+            raise ValueError("Partitions are not supported in combination "
+                             "with inventory sources.")
+
+        return value
+
+    @classmethod
+    def from_inventory(cls,
+                       meta_table: str,
+                       job: str,
+                       cols: Optional[Dict[str, str]] = None,
+                       **kwargs) -> "MetaTableSpec":
+        """Create meta table specification of the succeeded batches of the
+        upstream `job` on `meta_table`. The inventory table's `id` serves as
+        uid, `job_result_item` as item and `batch_weight` as weight. The
+        resulting name `{meta_table}/{job}` allows chaining further jobs.
+
+        """
+
+        cols = {"uid": "id",
+                "item": "job_result_item",
+                "weight": "batch_weight",
+                **(cols or {})}
+
+        return cls(name=f"{meta_table}/{job}",
+                   cols=cols,
+                   inventory_source=InventorySource(meta_table=meta_table,
+                                                    job=job),
+                   **kwargs)
 
 
 class BatchConfig(BaseModel):
@@ -49,5 +203,9 @@ class BatchConfig(BaseModel):
     batch_id_max: Optional[int] = None
     batch_weight: Optional[float] = None
     batch_count: Optional[int] = None
-    id_inventory_max: int
-    id_meta_max: int
+    columns: Optional[List[str]] = None
+    fill_gaps: bool = False
+    planned: bool = False
+    lease_ttl: Optional[float] = None
+    id_inventory_max: Optional[int] = None
+    id_meta_max: Optional[int] = None
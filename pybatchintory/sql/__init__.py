@@ -1,5 +1,42 @@
-from typing import Optional
+import threading
 
-from pybatchintory.sql.database import DatabaseConfiguration, initialize
+from pybatchintory import config as cfg
+from pybatchintory.sql.database import DatabaseConfiguration, initialize, \
+    dispose_engines, dispose_stale_engines
 
-db: Optional[DatabaseConfiguration] = None
+_LOCK = threading.RLock()
+
+
+def __getattr__(name: str) -> DatabaseConfiguration:
+    """Lazily initialize the database configuration including engines on
+    first access of `db`. Missing backend tables are created unless
+    `CREATE_BACKEND_TABLES` is disabled.
+
+    """
+
+    if name != "db":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with _LOCK:
+        if "db" not in globals():
+            db = initialize()
+            if cfg.settings.CREATE_BACKEND_TABLES:
+                db.initialize_metadata_backend()
+
+            globals()["db"] = db
+
+        return globals()["db"]
+
+
+def reset():
+    """Discard the current database configuration which is initialized again
+    on next access, e.g. after settings have changed. Cached meta ids refer
+    to the previous databases and are discarded as well.
+
+    """
+
+    from pybatchintory.sql import crud
+
+    with _LOCK:
+        globals().pop("db", None)
+        crud.clear_first_meta_ids()
@@ -1,157 +1,1347 @@
-from typing import Optional, Dict, List
+import datetime
+import itertools
+import operator
+from collections import OrderedDict
+from typing import Optional, Dict, List, Iterator, Tuple, Sequence, \
+    TYPE_CHECKING
 
 import sqlalchemy as sa
 from sqlalchemy.engine.base import Connection
-from sqlalchemy.sql.selectable import CTE
+from sqlalchemy import Table
+from sqlalchemy.sql.selectable import Select
 
-from pybatchintory import sql
+from pybatchintory import sql, config as cfg
 from pybatchintory.sql import helper
+from pybatchintory.exceptions import ConcurrentChangeError
+from pybatchintory.instrumentation import instrument
 from pybatchintory.logging import logger
 from pybatchintory.models import BatchIdRange, MetaTableSpec
-from pybatchintory.sql.reflection import autoload_meta_table
+from pybatchintory.sql.reflection import load_meta_table
 
+if TYPE_CHECKING:
+    import numpy as np
 
+MAX_CHUNK_GROWTH = 64
+"""Limits the growth of keyset probes to bound memory consumption."""
+
+FIRST_META_IDS_CACHE_SIZE = 1024
+"""Maximum number of resolved timestamps kept in the least recently used
+cache of `read_first_meta_id_since`."""
+
+_FIRST_META_IDS: "OrderedDict[Tuple, int]" = OrderedDict()
+
+_FILTER_OPERATORS = {"==": operator.eq,
+                     "!=": operator.ne,
+                     "<": operator.lt,
+                     "<=": operator.le,
+                     ">": operator.gt,
+                     ">=": operator.ge,
+                     "in": lambda col, value: col.in_(value),
+                     "not_in": lambda col, value: col.not_in(value),
+                     "like": lambda col, value: col.like(value),
+                     "is": lambda col, value: col.is_(value),
+                     "is_not": lambda col, value: col.is_not(value)}
+
+
+INVENTORY_SOURCE_BLOCKING_STATUSES = ("running", "failed")
+"""Statuses of upstream batches which may still succeed and hence bound the
+progress of downstream jobs of an inventory source."""
+
+
+def _build_permanently_failed_condition(t_inventory: Table):
+    """Build condition matching failed inventory rows which have used up
+    `INVENTORY_SOURCE_MAX_ATTEMPTS`.
+
+    """
+
+    max_attempts = cfg.settings.INVENTORY_SOURCE_MAX_ATTEMPTS
+    if not max_attempts:
+        return sa.false()
+
+    return sa.and_(t_inventory.c.status == "failed",
+                   t_inventory.c.attempt >= max_attempts)
+
+
+def _build_inventory_source_filter(meta_table: MetaTableSpec,
+                                   t_meta: Table) -> List:
+    """Build where conditions selecting the succeeded batches of the upstream
+    job of an inventory source. Only ids below the lowest upstream batch
+    which may still succeed are considered. Otherwise, downstream watermarks
+    would skip upstream batches which succeed later. Permanently failed
+    upstream batches do not bound downstream progress.
+
+    Upstream ids are allocated when inserting an inventory row and not when
+    committing it. Hence, the upstream job must register its batches in id
+    order which is guaranteed by the watermark serialized acquisition but not
+    by `fill_gaps` or planned batches.
+
+    """
+
+    source = meta_table.inventory_source
+    t_blocking = sql.db.table_inventory.alias()
+
+    # lowest upstream id which may still succeed
+    where = sa.and_(
+        t_blocking.c.meta_table == source.meta_table,
+        t_blocking.c.job == source.job,
+        t_blocking.c.status.in_(INVENTORY_SOURCE_BLOCKING_STATUSES),
+        sa.not_(_build_permanently_failed_condition(t_blocking))
+    )
+    id_blocking = sa.select(sa.func.min(t_blocking.c.id)).where(where)
+
+    c_id = t_meta.c.id
+    return [t_meta.c.meta_table == source.meta_table,
+            t_meta.c.job == source.job,
+            t_meta.c.status == "succeeded",
+            sa.or_(id_blocking.scalar_subquery().is_(None),
+                   c_id < id_blocking.scalar_subquery())]
+
+
+def _build_meta_filter(meta_table: MetaTableSpec, t_meta: Table) -> List:
+    """Build where conditions from the filters of the meta table for given
+    meta table or alias thereof. Values are passed as bound parameters.
+
+    """
+
+    where = [_FILTER_OPERATORS[condition.op](t_meta.c[condition.col],
+                                             condition.value)
+             for condition in meta_table.filters]
+
+    if meta_table.inventory_source:
+        where.extend(_build_inventory_source_filter(meta_table, t_meta))
+
+    return where
+
+
+def _build_max_meta_id_from_inventory_query(meta_table: MetaTableSpec,
+                                            job: str) -> Select:
+    """Build query to select the highest item id of given job that has been
+    previously processed. Reads the watermark table via primary key lookup
+    while falling back to aggregating the inventory table for jobs without
+    watermark.
+
+    """
+
+    inventory = sql.db.table_inventory
+    watermark = sql.db.table_watermark
+
+    # watermark
+    where = sa.and_(watermark.c.meta_table == meta_table.name,
+                    watermark.c.job == job)
+    stmt_watermark = sa.select(watermark.c.batch_id_end).where(where)
+
+    # fallback
+    max_val = sa.func.max(inventory.c.batch_id_end)
+    value_or_zero = sa.func.coalesce(max_val, 0)
+    where = sa.and_(inventory.c.meta_table == meta_table.name,
+                    inventory.c.job == job)
+    stmt_fallback = sa.select(value_or_zero).where(where)
+
+    # query
+    return sa.select(sa.func.coalesce(stmt_watermark.scalar_subquery(),
+                                      stmt_fallback.scalar_subquery()))
+
+
+@instrument
 def read_max_meta_id_from_inventory(meta_table: MetaTableSpec,
                                     job: str,
                                     conn: Optional[Connection] = None) -> int:
     """Given a job, retrieve the highest item id that has been previously
     processed.
 
-    """
+    """
+
+    stmt = _build_max_meta_id_from_inventory_query(meta_table=meta_table,
+                                                   job=job)
+
+    # support as part of transaction or separate transaction
+    with helper.begin(sql.db.engine_inventory, conn) as conn:
+        max_meta_id = conn.execute(stmt).scalar()
+
+    logger.info(f"max_meta_id_from_inventory: {max_meta_id}")
+    return max_meta_id
+
+
+@instrument
+def update_watermark_in_inventory(meta_table: MetaTableSpec,
+                                  job: str,
+                                  id_expected: int,
+                                  id_new: int,
+                                  conn: Connection):
+    """Advance the watermark of given job from `id_expected` to `id_new` via
+    compare-and-swap. Raises `ConcurrentChangeError` if the watermark has been
+    changed concurrently. Needs to be executed in the same transaction as the
+    corresponding inventory insert.
+
+    """
+
+    watermark = sql.db.table_watermark
+
+    # where
+    where = sa.and_(watermark.c.meta_table == meta_table.name,
+                    watermark.c.job == job,
+                    watermark.c.batch_id_end == id_expected)
+
+    # query
+    stmt = sa.update(watermark).where(where).values(batch_id_end=id_new)
+    if conn.execute(stmt).rowcount == 1:
+        return
+
+    # create missing watermark which fails if it exists with other value
+    values = {"meta_table": meta_table.name,
+              "job": job,
+              "batch_id_end": id_new}
+    try:
+        conn.execute(sa.insert(watermark).values(values))
+    except sa.exc.IntegrityError as e:
+        raise ConcurrentChangeError(
+            f"Watermark of job '{job}' changed concurrently from expected "
+            f"value {id_expected}.") from e
+
+
+@instrument
+def read_uncovered_ranges_from_inventory(
+        meta_table: MetaTableSpec,
+        job: str,
+        id_min: int,
+        id_max: int,
+        statuses: Tuple[str, ...] = ("succeeded", "running"),
+        conn: Optional[Connection] = None
+) -> List[Tuple[int, int]]:
+    """Retrieve inclusive meta id ranges between `id_min` and `id_max` which
+    are not covered by any inventory row of given job with given `statuses`.
+
+    Uncovered ranges are computed in the database via a window function
+    providing the highest covered id of all preceding rows ordered by
+    `batch_id_start`. Hence, only uncovered ranges are transferred.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+    c_start = t_inventory.c.batch_id_start
+    c_end = t_inventory.c.batch_id_end
+
+    # where
+    where = sa.and_(t_inventory.c.meta_table == meta_table.name,
+                    t_inventory.c.job == job,
+                    t_inventory.c.status.in_(statuses),
+                    c_end >= id_min,
+                    c_start <= id_max)
+
+    # highest covered id of all preceding rows
+    prev_end = sa.func.max(c_end).over(order_by=[c_start, c_end],
+                                       rows=(None, -1))
+    subquery = (sa.select(c_start.label("start"),
+                          prev_end.label("prev_end"))
+                .where(where)
+                .subquery())
+
+    covered_end = sa.func.coalesce(subquery.c.prev_end, id_min - 1)
+    stmt_gaps = (sa.select((covered_end + 1).label("start"),
+                           (subquery.c.start - 1).label("end"))
+                 .where(subquery.c.start > covered_end + 1)
+                 .order_by(subquery.c.start))
+
+    stmt_max = sa.select(sa.func.max(c_end)).where(where)
+
+    with helper.begin(sql.db.engine_inventory, conn) as conn:
+        gaps = [(start, end) for start, end in conn.execute(stmt_gaps)]
+        covered_max = conn.execute(stmt_max).scalar()
+
+    # trailing uncovered range
+    if covered_max is None:
+        gaps.append((id_min, id_max))
+    elif covered_max < id_max:
+        gaps.append((covered_max + 1, id_max))
+
+    logger.info(f"uncovered_ranges_from_inventory: {len(gaps)}")
+    return gaps
+
+
+@instrument
+def lock_watermark_in_inventory(meta_table: MetaTableSpec,
+                                job: str,
+                                id_current: int,
+                                conn: Connection):
+    """Lock the watermark row of given job until the end of the ongoing
+    transaction via a no-op update which serializes acquisitions of the same
+    job. A missing watermark is created with `id_current`. Raises
+    `ConcurrentChangeError` if it has been created concurrently.
+
+    """
+
+    watermark = sql.db.table_watermark
+
+    # where
+    where = sa.and_(watermark.c.meta_table == meta_table.name,
+                    watermark.c.job == job)
+
+    # query
+    stmt = (sa.update(watermark)
+            .where(where)
+            .values(batch_id_end=watermark.c.batch_id_end))
+    if conn.execute(stmt).rowcount == 1:
+        return
+
+    values = {"meta_table": meta_table.name,
+              "job": job,
+              "batch_id_end": id_current}
+    try:
+        conn.execute(sa.insert(watermark).values(values))
+    except sa.exc.IntegrityError as e:
+        raise ConcurrentChangeError(
+            f"Watermark of job '{job}' has been created "
+            f"concurrently.") from e
+
+
+@instrument
+def read_overlapping_ids_from_inventory(meta_table: MetaTableSpec,
+                                        job: str,
+                                        id_min: int,
+                                        id_max: int,
+                                        statuses: Tuple[str, ...],
+                                        conn: Optional[Connection] = None
+                                        ) -> List[int]:
+    """Retrieve primary keys of inventory rows of given job and `statuses`
+    whose id ranges overlap with the given id range.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+
+    # where
+    where = sa.and_(t_inventory.c.meta_table == meta_table.name,
+                    t_inventory.c.job == job,
+                    t_inventory.c.status.in_(statuses),
+                    t_inventory.c.batch_id_start <= id_max,
+                    t_inventory.c.batch_id_end >= id_min)
+
+    # query
+    stmt = sa.select(t_inventory.c.id).where(where)
+
+    with helper.begin(sql.db.engine_inventory, conn) as conn:
+        result = conn.execute(stmt).fetchall()
+        return helper.single_column_result_to_list(result)
+
+
+@instrument
+def read_permanently_failed_ids_from_inventory(meta_table: MetaTableSpec,
+                                               job: str) -> List[int]:
+    """Retrieve primary keys of failed inventory rows of given job which have
+    used up `INVENTORY_SOURCE_MAX_ATTEMPTS`.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+
+    # where
+    where = sa.and_(t_inventory.c.meta_table == meta_table.name,
+                    t_inventory.c.job == job,
+                    _build_permanently_failed_condition(t_inventory))
+
+    # query
+    stmt = sa.select(t_inventory.c.id).where(where).order_by(t_inventory.c.id)
+
+    with sql.db.engine_inventory.begin() as conn:
+        result = conn.execute(stmt).fetchall()
+        return helper.single_column_result_to_list(result)
+
+
+@instrument
+def has_downstream_jobs_in_inventory(meta_table: MetaTableSpec,
+                                     job: str,
+                                     conn: Optional[Connection] = None
+                                     ) -> bool:
+    """Check whether chained downstream jobs have registered batches for the
+    succeeded batches of given job serving as inventory source.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+
+    # where
+    where = t_inventory.c.meta_table == f"{meta_table.name}/{job}"
+
+    # query
+    stmt = sa.select(t_inventory.c.id).where(where).limit(1)
+
+    with helper.begin(sql.db.engine_inventory, conn) as conn:
+        return conn.execute(stmt).first() is not None
+
+
+def _build_compactable_rows_query(meta_table: MetaTableSpec,
+                                  job: str) -> Select:
+    """Build query to select succeeded inventory rows of given job which
+    belong to contiguous ranges of at least two rows. Rows are ordered by
+    their range and labeled with the `group` of their contiguous range.
+
+    Contiguous ranges are identified in the database via a window function
+    which flags every row that does not directly continue its predecessor
+    ordered by `batch_id_start`. The running sum of these flags enumerates
+    the contiguous ranges.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+    c_start = t_inventory.c.batch_id_start
+    c_end = t_inventory.c.batch_id_end
+
+    # where
+    where = sa.and_(t_inventory.c.meta_table == meta_table.name,
+                    t_inventory.c.job == job,
+                    t_inventory.c.status == "succeeded")
+
+    # flag rows starting a new contiguous range
+    prev_end = sa.func.lag(c_end).over(
+        order_by=[c_start, c_end, t_inventory.c.id]
+    )
+    is_new = sa.case((c_start == prev_end + 1, 0), else_=1)
+    flagged = (sa.select(t_inventory.c.id,
+                         c_start.label("start"),
+                         c_end.label("end"),
+                         t_inventory.c.batch_count.label("count"),
+                         t_inventory.c.batch_weight.label("weight"),
+                         t_inventory.c.processing_start,
+                         t_inventory.c.processing_end,
+                         is_new.label("is_new"))
+               .where(where)
+               .subquery())
+
+    # enumerate contiguous ranges while separating duplicates via the id
+    group = sa.func.sum(flagged.c.is_new).over(
+        order_by=[flagged.c.start, flagged.c.end, flagged.c.id],
+        rows=(None, 0)
+    )
+    grouped = sa.select(flagged, group.label("group")).subquery()
+
+    # count rows per contiguous range
+    rows = sa.func.count().over(partition_by=grouped.c.group)
+    counted = sa.select(grouped, rows.label("rows")).subquery()
+
+    # query
+    return (sa.select(counted)
+            .where(counted.c.rows > 1)
+            .order_by(counted.c.start, counted.c.end, counted.c.id))
+
+
+def _aggregate_compactable_rows(rows: List) -> Dict:
+    """Aggregate the rows of a contiguous range into the values of their
+    summary row along with the primary keys of the merged rows.
+
+    """
+
+    def aggregate(func, values):
+        values = [value for value in values if value is not None]
+        return func(values) if values else None
+
+    return {"batch_id_start": rows[0].start,
+            "batch_id_end": max(row.end for row in rows),
+            "batch_count": sum(row.count for row in rows),
+            "batch_weight": aggregate(sum, [row.weight for row in rows]),
+            "processing_start": aggregate(
+                min, [row.processing_start for row in rows]),
+            "processing_end": aggregate(
+                max, [row.processing_end for row in rows]),
+            "primary_keys": [row.id for row in rows]}
+
+
+@instrument
+def compact_rows_in_inventory(meta_table: MetaTableSpec, job: str) -> int:
+    """Merge contiguous ranges of succeeded inventory rows of given job into
+    summary rows while moving the merged rows to the inventory archive table.
+    Returns the number of archived rows.
+
+    Summary rows cover exactly the same meta ids as the merged rows. Hence,
+    watermark, uncovered ranges and gap filling remain unchanged. Succeeded
+    rows are never modified by workers which allows compacting while workers
+    are active. Merged rows are archived and deleted via their primary keys.
+    All changes are applied in a single transaction which is rolled back via
+    `ConcurrentChangeError` if merged rows have been changed concurrently,
+    e.g. by another compaction.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+    t_archive = sql.db.table_inventory_archive
+    stmt = _build_compactable_rows_query(meta_table=meta_table, job=job)
+
+    archived = 0
+    with sql.db.engine_inventory.begin() as conn:
+        rows = conn.execute(stmt).fetchall()
+        groups = itertools.groupby(rows, key=operator.attrgetter("group"))
+
+        for _, group_rows in groups:
+            group = _aggregate_compactable_rows(list(group_rows))
+            primary_keys = group.pop("primary_keys")
+
+            # summary row inherits the config of the latest merged row
+            stmt_config = (sa.select(t_inventory.c.config)
+                           .where(t_inventory.c.id == max(primary_keys)))
+            config = conn.execute(stmt_config).scalar()
+
+            values = {"meta_table": meta_table.name,
+                      "job": job,
+                      **group,
+                      "attempt": 1,
+                      "status": "succeeded",
+                      "config": config,
+                      "logging": f"Compacted {len(primary_keys)} batches."}
+            primary_key = create_row_in_inventory(values=values, conn=conn)
+
+            # where
+            where = sa.and_(t_inventory.c.id.in_(primary_keys),
+                            t_inventory.c.status == "succeeded")
+
+            # archive
+            columns = [c.name for c in t_inventory.columns]
+            select = sa.select(*t_inventory.columns,
+                               sa.literal(primary_key)).where(where)
+            conn.execute(sa.insert(t_archive).from_select(
+                [*columns, "compacted_into"], select
+            ))
+
+            deleted = conn.execute(sa.delete(t_inventory).where(where))
+            if deleted.rowcount != len(primary_keys):
+                raise ConcurrentChangeError(
+                    f"Inventory rows of job '{job}' between "
+                    f"{group['batch_id_start']} and "
+                    f"{group['batch_id_end']} have been changed "
+                    f"concurrently.")
+
+            archived += len(primary_keys)
+
+    logger.info(f"compacted_rows_in_inventory: {archived}")
+    return archived
+
+
+@instrument
+def read_min_meta_id_from_meta(meta_table: MetaTableSpec,
+                               conn: Optional[Connection] = None) -> int:
+    """Retrieve the lowest item id from meta table.
+
+    """
+
+    t_meta = load_meta_table(meta_table, conn=conn)
+    c_id = t_meta.c[meta_table.cols.uid]
+
+    # select
+    min_val = sa.func.min(c_id)
+    value_or_zero = sa.func.coalesce(min_val, 0)
+
+    # where
+    where = _build_meta_filter(meta_table, t_meta)
+
+    # query
+    stmt = sa.select(value_or_zero).where(*where)
+
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
+        min_meta_id = conn.execute(stmt).scalar()
+
+    logger.info(f"min_meta_id_from_meta: {min_meta_id}")
+    return min_meta_id
+
+
+@instrument
+def read_max_meta_id_from_meta(meta_table: MetaTableSpec,
+                               conn: Optional[Connection] = None) -> int:
+    """Retrieve the highest item id from meta table.
+
+    """
+
+    t_meta = load_meta_table(meta_table, conn=conn)
+    c_id = t_meta.c[meta_table.cols.uid]
+
+    # select
+    max_val = sa.func.max(c_id)
+    value_or_zero = sa.func.coalesce(max_val, 0)
+
+    # where
+    where = _build_meta_filter(meta_table, t_meta)
+
+    # query
+    stmt = sa.select(value_or_zero).where(*where)
+
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
+        max_meta_id = conn.execute(stmt).scalar()
+
+    logger.info(f"max_meta_id_from_meta: {max_meta_id}")
+    return max_meta_id
+
+
+@instrument
+def read_first_meta_id_since(meta_table: MetaTableSpec,
+                             timestamp: datetime.datetime,
+                             conn: Optional[Connection] = None
+                             ) -> Optional[int]:
+    """Resolve given timestamp to the lowest uid of the meta table whose
+    timestamp column is greater equals `timestamp`. Uses an index lookup on
+    the timestamp column ordered by timestamp and uid. Assumes timestamps to
+    increase along with uids.
+
+    Resolved uids are cached since they do not change for append-only meta
+    tables. The cache is bounded by `FIRST_META_IDS_CACHE_SIZE` entries and
+    evicts the least recently used ones. Unresolved timestamps are looked up
+    again on the next call. Returns `None` if there is no such uid yet.
+
+    """
+
+    engine = sql.db.get_engine_meta(meta_table)
+    key = (str(engine.url), meta_table.name, meta_table.cols.timestamp,
+           timestamp)
+    if key in _FIRST_META_IDS:
+        _FIRST_META_IDS.move_to_end(key)
+        return _FIRST_META_IDS[key]
+
+    t_meta = load_meta_table(meta_table, conn=conn)
+    c_id = t_meta.c[meta_table.cols.uid]
+    c_ts = t_meta.c[meta_table.cols.timestamp]
+
+    # query
+    stmt = (sa.select(c_id)
+            .where(c_ts >= timestamp)
+            .order_by(c_ts, c_id)
+            .limit(1))
+
+    with helper.begin(engine, conn) as conn:
+        uid = conn.execute(stmt).scalar()
+
+    if uid is not None:
+        _FIRST_META_IDS[key] = uid
+        if len(_FIRST_META_IDS) > FIRST_META_IDS_CACHE_SIZE:
+            _FIRST_META_IDS.popitem(last=False)
+
+    logger.info(f"first_meta_id_since: {timestamp} -> {uid}")
+    return uid
+
+
+def clear_first_meta_ids():
+    """Discard all resolved timestamps cached by `read_first_meta_id_since`.
+
+    """
+
+    _FIRST_META_IDS.clear()
+
+
+@instrument
+def read_next_meta_id_with_timestamp(meta_table: MetaTableSpec,
+                                     id_min: int,
+                                     conn: Optional[Connection] = None
+                                     ) -> Optional[Tuple]:
+    """Retrieve the lowest uid greater equals `id_min` along with its
+    timestamp. Returns `None` if there are no meta ids left.
+
+    """
+
+    t_meta = load_meta_table(meta_table, conn=conn, id_min=id_min)
+    c_id = t_meta.c[meta_table.cols.uid]
+    c_ts = t_meta.c[meta_table.cols.timestamp]
+
+    # where
+    where = [c_id >= id_min, *_build_meta_filter(meta_table, t_meta)]
+
+    # query
+    stmt = (sa.select(c_id, c_ts)
+            .where(sa.and_(*where))
+            .order_by(c_id)
+            .limit(1))
+
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
+        row = conn.execute(stmt).fetchone()
+
+    if row:
+        return tuple(row)
+
+
+def _build_meta_id_probe_query(meta_table: MetaTableSpec,
+                               lower,
+                               chunk_size: int,
+                               id_max: Optional[int] = None,
+                               columns: Sequence = (),
+                               where: Sequence = (),
+                               id_min: Optional[int] = None) -> Select:
+    """Build a single keyset probe which selects `(uid, weight, *columns)`
+    of up to `chunk_size` rows in ascending uid order starting at the `lower`
+    uid condition. Partitioned meta tables only cover the partitions between
+    `id_min` and `id_max`.
+
+    """
+
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
+    c_id = t_meta.c[meta_table.cols.uid]
+    weight_col = meta_table.cols.weight
+
+    # select
+    select = [c_id]
+    if weight_col:
+        select.append(t_meta.c[weight_col])
+    else:
+        select.append(sa.null())
+    select.extend(columns)
+
+    # where
+    conditions = [lower, *where, *_build_meta_filter(meta_table, t_meta)]
+    if id_max is not None:
+        conditions.append(c_id <= id_max)
+
+    # query
+    return (sa.select(*select)
+            .where(sa.and_(*conditions))
+            .order_by(c_id)
+            .limit(chunk_size))
+
+
+def _iter_meta_ids_with_weight(meta_table: MetaTableSpec,
+                               id_min: Optional[int],
+                               conn: Connection,
+                               id_max: Optional[int] = None,
+                               limit: Optional[int] = None,
+                               columns: Sequence = (),
+                               where: Sequence = ()
+                               ) -> Iterator[Tuple]:
+    """Iterate `(uid, weight, *columns)` tuples in ascending uid order via
+    keyset probing. Each probe reads a chunk of rows starting right after the
+    last seen uid while the chunk size grows exponentially. Hence, the number
+    of probes is logarithmic and the number of scanned rows is linear in the
+    number of consumed rows, independent of the size of the remaining table.
+
+    Additional `where` conditions are applied to every probe.
+
+    """
+
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
+    c_id = t_meta.c[meta_table.cols.uid]
+
+    chunk_size = cfg.settings.BOUNDARY_SEARCH_CHUNK_SIZE
+    max_chunk_size = chunk_size * MAX_CHUNK_GROWTH
+    remaining = limit
+    lower = c_id >= id_min if id_min is not None else sa.true()
+
+    while True:
+        if remaining is not None:
+            chunk_size = min(chunk_size, remaining)
+
+        stmt = _build_meta_id_probe_query(meta_table=meta_table,
+                                          lower=lower,
+                                          chunk_size=chunk_size,
+                                          id_max=id_max,
+                                          columns=columns,
+                                          where=where,
+                                          id_min=id_min)
+
+        rows = conn.execute(stmt).fetchall()
+        for row in rows:
+            yield tuple(row)
+
+        if remaining is not None:
+            remaining -= len(rows)
+
+        if len(rows) < chunk_size or remaining == 0:
+            return
+
+        lower = c_id > rows[-1][0]
+        chunk_size = min(chunk_size * 2, max_chunk_size)
+
+
+def _probe_meta_id_range(meta_table: MetaTableSpec,
+                         id_min: int,
+                         weight: float,
+                         conn: Connection,
+                         id_max: Optional[int] = None,
+                         count: Optional[int] = None,
+                         prefix: Optional[BatchIdRange] = None
+                         ) -> Optional[BatchIdRange]:
+    """Find the weight bounded range of meta ids by consuming ids in ascending
+    order until the cumulative weight exceeds the given `weight`. Assumes
+    non-negative weights which makes the cumulative weight monotonic.
+
+    Mirrors the semantics of a cumulative `sum(weight) over (order by uid)`
+    which is filtered via `weight <= max_weight` and `count <= max_count`.
+    Returns `None` if not even the first data item satisfies the weight
+    constraint.
+
+    An already known `prefix` range ending right before `id_min` may be
+    provided to continue its cumulative weight and count.
+
+    """
+
+    bounds = prefix.dict() if prefix else {}
+    cum_count = prefix.count if prefix else 0
+    cum_weight = prefix.weight if prefix else None
+
+    limit = count - cum_count if count else None
+    if limit == 0:
+        return prefix
+
+    rows = _iter_meta_ids_with_weight(meta_table=meta_table,
+                                      id_min=id_min,
+                                      id_max=id_max,
+                                      limit=limit,
+                                      conn=conn)
+
+    for uid, value in rows:
+        cum_count += 1
+        if value is not None:
+            cum_weight = value if cum_weight is None else cum_weight + value
+
+        # null weights do not contribute to a cumulative sum
+        if cum_weight is None:
+            continue
+
+        if cum_weight > weight:
+            break
+
+        bounds.setdefault("id_min", uid)
+        bounds.update(id_max=uid, count=cum_count, weight=cum_weight)
+
+    if bounds:
+        return BatchIdRange(**bounds)
+
+
+def _aggregate_meta_id_range(meta_table: MetaTableSpec,
+                             id_min: int,
+                             conn: Connection,
+                             id_max: Optional[int] = None,
+                             count: Optional[int] = None
+                             ) -> Optional[BatchIdRange]:
+    """Find the count bounded range of meta ids via `ORDER BY uid LIMIT count`
+    which only reads the first `count` rows. Without `count`, the entire
+    range is aggregated. Returns `None` for an empty range.
+
+    """
+
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
+    c_id = t_meta.c[meta_table.cols.uid]
+    weight_col = meta_table.cols.weight
+
+    # subquery
+    select = [c_id.label("id")]
+    if weight_col:
+        select.append(t_meta.c[weight_col].label("weight"))
+
+    where = [c_id >= id_min, *_build_meta_filter(meta_table, t_meta)]
+    if id_max is not None:
+        where.append(c_id <= id_max)
+
+    subquery = sa.select(*select).where(sa.and_(*where)).order_by(c_id)
+    if count:
+        subquery = subquery.limit(count)
+    subquery = subquery.subquery()
+
+    # select
+    select = [sa.func.min(subquery.c.id).label("id_min"),
+              sa.func.max(subquery.c.id).label("id_max"),
+              sa.func.count(subquery.c.id).label("count")]
+    if weight_col:
+        select.append(sa.func.sum(subquery.c.weight).label("weight"))
+    else:
+        select.append(sa.null().label("weight"))
+
+    result = conn.execute(sa.select(*select)).fetchone()
+
+    # check for edge case of empty result set
+    if result.count:
+        return BatchIdRange(**result._asdict())
+
+
+@instrument
+def read_meta_id_range_from_meta(
+        meta_table: MetaTableSpec,
+        id_min: int,
+        id_max: Optional[int] = None,
+        weight: Optional[float] = None,
+        count: Optional[int] = None,
+        conn: Optional[Connection] = None
+) -> Optional[BatchIdRange]:
+    """Retrieve a range of meta ids. Returns `None` if there are no meta ids
+    between `id_min` and `id_max`.
+
+    The cost of the boundary search grows with the size of the batch instead
+    of the size of the remaining meta table. Count bounded ranges are
+    resolved via `ORDER BY uid LIMIT count` while weight bounded ranges are
+    probed in exponentially growing chunks. If the meta table maintains a
+    cumulative weight index, weight bounded ranges are looked up there.
+
+    """
+
+    # reflect upfront to avoid checking out a second connection
+    load_meta_table(meta_table, conn=conn)
+
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
+        if weight and meta_table.cols.weight and \
+                meta_table.cumulative_weight_index:
+            result = _lookup_meta_id_range(meta_table=meta_table,
+                                           id_min=id_min,
+                                           id_max=id_max,
+                                           weight=weight,
+                                           count=count,
+                                           conn=conn)
+        elif weight and meta_table.cols.weight:
+            result = _probe_meta_id_range(meta_table=meta_table,
+                                          id_min=id_min,
+                                          id_max=id_max,
+                                          weight=weight,
+                                          count=count,
+                                          conn=conn)
+        else:
+            result = _aggregate_meta_id_range(meta_table=meta_table,
+                                              id_min=id_min,
+                                              id_max=id_max,
+                                              count=count,
+                                              conn=conn)
+
+        # check for edge case of empty result set
+        if result:
+            return result
+        else:
+            return _read_single_next_id_from_meta(meta_table=meta_table,
+                                                  id_min=id_min,
+                                                  id_max=id_max,
+                                                  conn=conn)
+
+
+def _iter_meta_id_ranges(meta_table: MetaTableSpec,
+                         id_min: int,
+                         conn: Connection,
+                         id_max: Optional[int] = None,
+                         weight: Optional[float] = None,
+                         count: Optional[int] = None,
+                         limit: Optional[int] = None
+                         ) -> Iterator[BatchIdRange]:
+    """Iterate consecutive ranges of meta ids in a single streaming pass over
+    the meta table. Each range is bounded by `weight` and `count` in the same
+    way as `read_meta_id_range_from_meta` while a data item exceeding
+    `weight` on its own constitutes a single item range. At most `limit` meta
+    ids are read.
+
+    """
+
+    weight = weight if meta_table.cols.weight else None
+
+    rows = _iter_meta_ids_with_weight(meta_table=meta_table,
+                                      id_min=id_min,
+                                      id_max=id_max,
+                                      limit=limit,
+                                      conn=conn)
+
+    current = None
+    for uid, value in rows:
+        if current:
+            cum_count = current["count"] + 1
+            cum_weight = current["weight"]
+            if value is not None:
+                cum_weight = value if cum_weight is None \
+                    else cum_weight + value
+
+            exceeds_count = count and cum_count > count
+            exceeds_weight = weight and cum_weight is not None and \
+                cum_weight > weight
+
+            if not (exceeds_count or exceeds_weight):
+                current.update(id_max=uid,
+                               count=cum_count,
+                               weight=cum_weight)
+                continue
+
+            yield BatchIdRange(**current)
+
+        current = {"id_min": uid, "id_max": uid, "count": 1,
+                   "weight": value}
+
+    if current:
+        yield BatchIdRange(**current)
+
+
+@instrument
+def read_meta_id_ranges_from_meta(
+        meta_table: MetaTableSpec,
+        id_min: int,
+        iterations: int,
+        id_max: Optional[int] = None,
+        weight: Optional[float] = None,
+        count: Optional[int] = None
+) -> List[BatchIdRange]:
+    """Retrieve up to `iterations` consecutive ranges of meta ids in a single
+    pass over the meta table. Each range is bounded by `weight` and `count`
+    in the same way as `read_meta_id_range_from_meta` while a data item
+    exceeding `weight` on its own constitutes a single item range.
+
+    """
+
+    limit = count * iterations if count else None
+
+    # reflect upfront to avoid checking out a second connection
+    load_meta_table(meta_table)
+
+    with sql.db.get_engine_meta(meta_table).begin() as conn:
+        ranges = _iter_meta_id_ranges(meta_table=meta_table,
+                                      id_min=id_min,
+                                      id_max=id_max,
+                                      weight=weight,
+                                      count=count,
+                                      limit=limit,
+                                      conn=conn)
+        ranges = list(itertools.islice(ranges, iterations))
+
+    logger.info(f"meta_id_ranges_from_meta: {len(ranges)}")
+    return ranges
+
+
+def iter_meta_id_ranges_from_meta(meta_table: MetaTableSpec,
+                                  id_min: int,
+                                  id_max: Optional[int] = None,
+                                  weight: Optional[float] = None,
+                                  count: Optional[int] = None
+                                  ) -> Iterator[BatchIdRange]:
+    """Stream all consecutive ranges of meta ids between `id_min` and
+    `id_max` in a single pass over the meta table. Only the current range is
+    held in memory.
+
+    """
+
+    # reflect upfront to avoid checking out a second connection
+    load_meta_table(meta_table)
+
+    with sql.db.get_engine_meta(meta_table).connect() as conn:
+        yield from _iter_meta_id_ranges(meta_table=meta_table,
+                                        id_min=id_min,
+                                        id_max=id_max,
+                                        weight=weight,
+                                        count=count,
+                                        conn=conn)
+
+
+def _build_next_batch_columns(meta_table: MetaTableSpec,
+                              job: str,
+                              id_inventory_max: Optional[int] = None,
+                              with_items: bool = True,
+                              id_min: Optional[int] = None,
+                              id_max: Optional[int] = None
+                              ) -> Tuple[List, List]:
+    """Build the additional columns and where conditions of the probes used
+    by `read_next_batch_from_meta` for the uid range between `id_min` and
+    `id_max`.
+
+    """
+
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
+    c_id = t_meta.c[meta_table.cols.uid]
+
+    # uncorrelated scalar subqueries are evaluated once per probe
+    t_meta_max = load_meta_table(meta_table, id_min=id_min).alias()
+    c_meta_max = t_meta_max.c[meta_table.cols.uid]
+    meta_max = sa.select(sa.func.coalesce(sa.func.max(c_meta_max), 0))
+    meta_max = meta_max.where(*_build_meta_filter(meta_table, t_meta_max))
 
-    inventory = sql.db.table_inventory
+    if id_inventory_max is None:
+        inventory_max = _build_max_meta_id_from_inventory_query(
+            meta_table=meta_table,
+            job=job
+        ).scalar_subquery()
+    else:
+        inventory_max = sa.literal(id_inventory_max)
 
     # select
-    max_val = sa.func.max(inventory.c.batch_id_end)
-    value_or_zero = sa.func.coalesce(max_val, 0)
+    columns = [meta_max.scalar_subquery(), inventory_max]
+    if with_items:
+        columns.append(t_meta.c[meta_table.cols.item])
 
-    # where
-    where = sa.and_(inventory.c.meta_table == meta_table.name,
-                    inventory.c.job == job)
+    return columns, [c_id > inventory_max]
 
-    # query
-    stmt = sa.select(value_or_zero).where(where)
 
-    # support as part of transaction or separate transaction
-    if conn:
-        max_meta_id = conn.execute(stmt).scalar()
-    else:
-        with sql.db.engine_inventory.begin() as conn:
-            max_meta_id = conn.execute(stmt).scalar()
+@instrument
+def read_next_batch_from_meta(meta_table: MetaTableSpec,
+                              job: str,
+                              id_min: Optional[int] = None,
+                              id_max: Optional[int] = None,
+                              weight: Optional[float] = None,
+                              count: Optional[int] = None,
+                              id_inventory_max: Optional[int] = None,
+                              with_items: bool = True,
+                              conn: Optional[Connection] = None
+                              ) -> Optional[Dict]:
+    """Retrieve the next batch of given job via a single streaming query on
+    the meta table which provides the highest meta id, the batch range and
+    optionally its items at once. Reading stops as soon as the batch
+    constraints are exceeded.
 
-    logger.info(f"max_meta_id_from_inventory: {max_meta_id}")
-    return max_meta_id
+    Mirrors the semantics of `read_meta_id_range_from_meta` including the
+    single item fallback. If `id_inventory_max` is not given, the job's
+    highest processed id is read via a scalar subquery of the inventory
+    tables. This requires inventory and meta table to share the same
+    database. Returns `None` if there are no meta ids left to process.
 
+    """
 
-def read_max_meta_id_from_meta(meta_table: MetaTableSpec) -> int:
-    """Retrieve the highest item id from meta table.
+    # reflect upfront to avoid checking out a second connection
+    load_meta_table(meta_table, conn=conn)
+
+    # processed ids allow pruning partitions of partitioned meta tables
+    if id_inventory_max is not None:
+        id_min = id_inventory_max + 1 if id_min is None \
+            else max(id_min, id_inventory_max + 1)
+
+    weight = weight if meta_table.cols.weight else None
+    columns, where = _build_next_batch_columns(
+        meta_table=meta_table,
+        job=job,
+        id_inventory_max=id_inventory_max,
+        with_items=with_items,
+        id_min=id_min,
+        id_max=id_max
+    )
+
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
+        rows = _iter_meta_ids_with_weight(meta_table=meta_table,
+                                          id_min=id_min,
+                                          id_max=id_max,
+                                          limit=count,
+                                          columns=columns,
+                                          where=where,
+                                          conn=conn)
+
+        first = None
+        bounds = {}
+        items = []
+        cum_count = 0
+        cum_weight = None
+        id_meta_max = None
+
+        for uid, value, id_meta_max, id_inventory_max, *item in rows:
+            first = first or (uid, value, item)
+            cum_count += 1
+            if value is not None:
+                cum_weight = value if cum_weight is None \
+                    else cum_weight + value
+
+            if weight:
+                # null weights do not contribute to a cumulative sum
+                if cum_weight is None:
+                    continue
+
+                if cum_weight > weight:
+                    break
+
+            bounds.setdefault("id_min", uid)
+            bounds.update(id_max=uid, count=cum_count, weight=cum_weight)
+            items.extend(item)
+
+    if not first:
+        return
+
+    # fallback if weight constraint does not even allow a single data item
+    if not bounds:
+        uid, value, items = first
+        bounds = {"id_min": uid, "id_max": uid, "count": 1, "weight": value}
+
+    logger.info(f"next_batch_from_meta: {bounds}")
+    return {"id_range": BatchIdRange(**bounds),
+            "id_meta_max": id_meta_max,
+            "id_inventory_max": id_inventory_max,
+            "items": items if with_items else None}
+
+
+def _read_checkpoint_from_cumulative_weight(meta_table: MetaTableSpec,
+                                            where: List,
+                                            order_by: List) -> Optional[Dict]:
+    """Read the first checkpoint of the cumulative weight index for given
+    meta table, conditions and ordering.
 
     """
 
-    t_meta = autoload_meta_table(meta_table.name)
-    c_id = t_meta.c[meta_table.cols.uid]
+    t_cum = sql.db.table_cumulative_weight
 
-    # select
-    max_val = sa.func.max(c_id)
-    value_or_zero = sa.func.coalesce(max_val, 0)
+    # where
+    where = [t_cum.c.meta_table == meta_table.name, *where]
 
     # query
-    stmt = sa.select(value_or_zero)
+    stmt = (sa.select(t_cum.c.uid,
+                      t_cum.c.cumulative_weight,
+                      t_cum.c.cumulative_count)
+            .where(sa.and_(*where))
+            .order_by(*order_by)
+            .limit(1))
 
-    with sql.db.engine_meta.begin() as conn:
-        max_meta_id = conn.execute(stmt).scalar()
+    with sql.db.engine_inventory.begin() as conn:
+        result = conn.execute(stmt).fetchone()
 
-    logger.info(f"max_meta_id_from_meta: {max_meta_id}")
-    return max_meta_id
+    if result:
+        return result._asdict()
 
 
-def _build_meta_id_base_cte(meta_table: MetaTableSpec,
-                            id_min: int,
-                            id_max: Optional[int] = None) -> CTE:
-    """Build CTE for meta ia base information regarding rank and cumulative
-    sum for weight.
+def _read_meta_weight_between(meta_table: MetaTableSpec,
+                              id_min: Optional[int],
+                              id_max: int,
+                              conn: Connection) -> Tuple[float, int]:
+    """Aggregate weight and count of meta rows with uids greater than
+    `id_min` and less than `id_max`.
 
     """
-    # get table/column objects for meta table
-    t_meta = autoload_meta_table(meta_table.name)
+
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
     c_id = t_meta.c[meta_table.cols.uid]
-    weight_col = meta_table.cols.weight
+    c_wei = t_meta.c[meta_table.cols.weight]
 
     # select
-    select = [c_id.label("id"),
-              sa.func.rank().over(order_by=c_id).label("count")]
-
-    if weight_col:
-        c_wei = t_meta.c[weight_col]
-        select.append(sa.func.sum(c_wei).over(order_by=c_id).label("weight"))
-    else:
-        select.append(sa.null().label("weight"))
+    select = [sa.func.coalesce(sa.func.sum(c_wei), 0),
+              sa.func.count(c_id)]
 
     # where
-    where = [c_id >= id_min]
-    if id_max:
-        where.append(c_id <= id_max)
+    where = [c_id < id_max]
+    if id_min is not None:
+        where.append(c_id > id_min)
 
-    # common table expression / subquery
-    return sa.select(*select).where(sa.and_(*where)).order_by(c_id).cte("cte")
+    stmt = sa.select(*select).where(sa.and_(*where))
+    weight, count = conn.execute(stmt).fetchone()
+    return weight, count
 
 
-def read_meta_id_range_from_meta(
-        meta_table: MetaTableSpec,
-        id_min: int,
-        id_max: Optional[int] = None,
-        weight: Optional[float] = None,
-        count: Optional[int] = None
-) -> BatchIdRange:
-    """Retrieve a range of meta ids.
+def _lookup_meta_id_range(meta_table: MetaTableSpec,
+                          id_min: int,
+                          weight: float,
+                          conn: Connection,
+                          id_max: Optional[int] = None,
+                          count: Optional[int] = None
+                          ) -> Optional[BatchIdRange]:
+    """Find the weight bounded range of meta ids via the cumulative weight
+    index. The last checkpoint satisfying the weight and count constraints is
+    found with an index lookup. Only the remainder after this checkpoint is
+    probed which is bounded by `CUMULATIVE_WEIGHT_STRIDE` rows. Null weights
+    are treated as zero.
 
     """
 
-    # common table expression / subquery
-    cte = _build_meta_id_base_cte(meta_table=meta_table,
-                                  id_min=id_min,
-                                  id_max=id_max)
+    t_cum = sql.db.table_cumulative_weight
+
+    # cumulative weight and count right before `id_min`
+    base = _read_checkpoint_from_cumulative_weight(
+        meta_table=meta_table,
+        where=[t_cum.c.uid < id_min],
+        order_by=[t_cum.c.uid.desc()]
+    ) or {"uid": None, "cumulative_weight": 0, "cumulative_count": 0}
+
+    base_weight, base_count = _read_meta_weight_between(
+        meta_table=meta_table,
+        id_min=base["uid"],
+        id_max=id_min,
+        conn=conn
+    )
+    base_weight += base["cumulative_weight"]
+    base_count += base["cumulative_count"]
 
-    # cte where
-    cte_where = []
-    if weight and meta_table.cols.weight:
-        cte_where.append(cte.c.weight <= weight)
+    # last checkpoint within batch constraints
+    where = [t_cum.c.uid >= id_min,
+             t_cum.c.cumulative_weight <= base_weight + weight]
+    if id_max is not None:
+        where.append(t_cum.c.uid <= id_max)
     if count:
-        cte_where.append(cte.c.count <= count)
-
-    cte_query = (
-        sa.select(
-            sa.func.min(cte.c.id).label("id_min"),
-            sa.func.max(cte.c.id).label("id_max"),
-            sa.func.max(cte.c.count).label("count"),
-            sa.func.max(cte.c.weight).label("weight")
-        )
-        .where(sa.and_(*cte_where))
-        .select_from(cte)
+        where.append(t_cum.c.cumulative_count <= base_count + count)
+
+    target = _read_checkpoint_from_cumulative_weight(
+        meta_table=meta_table,
+        where=where,
+        order_by=[t_cum.c.cumulative_weight.desc(), t_cum.c.uid.desc()]
     )
 
-    with sql.db.engine_meta.begin() as conn:
-        result = conn.execute(cte_query).fetchone()
+    if not target:
+        return _probe_meta_id_range(meta_table=meta_table,
+                                    id_min=id_min,
+                                    id_max=id_max,
+                                    weight=weight,
+                                    count=count,
+                                    conn=conn)
 
-    # check for edge case of empty result set
-    if any(result):
-        return BatchIdRange(**result._asdict())
-    else:
-        return _read_single_next_id_from_meta(meta_table, id_min)
+    # first uid of batch is only required for non-empty prefix
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
+    c_id = t_meta.c[meta_table.cols.uid]
+    stmt = sa.select(sa.func.min(c_id)).where(c_id >= id_min)
+    first_id = conn.execute(stmt).scalar()
+
+    prefix = BatchIdRange(
+        id_min=first_id,
+        id_max=target["uid"],
+        count=target["cumulative_count"] - base_count,
+        weight=target["cumulative_weight"] - base_weight
+    )
+
+    return _probe_meta_id_range(meta_table=meta_table,
+                                id_min=target["uid"] + 1,
+                                id_max=id_max,
+                                weight=weight,
+                                count=count,
+                                prefix=prefix,
+                                conn=conn)
+
+
+@instrument
+def refresh_cumulative_weight_index(meta_table: MetaTableSpec):
+    """Incrementally extends the cumulative weight index of the given meta
+    table starting from its last checkpoint. Assumes that uids are only
+    appended to the meta table and that weights do not change.
+
+    """
+
+    t_cum = sql.db.table_cumulative_weight
+    stride = cfg.settings.CUMULATIVE_WEIGHT_STRIDE
+
+    last = _read_checkpoint_from_cumulative_weight(
+        meta_table=meta_table,
+        where=[],
+        order_by=[t_cum.c.uid.desc()]
+    ) or {"uid": None, "cumulative_weight": 0, "cumulative_count": 0}
+
+    cum_weight = last["cumulative_weight"]
+    cum_count = last["cumulative_count"]
+    id_min = last["uid"] + 1 if last["uid"] is not None else None
+
+    # reflect upfront to avoid checking out a second connection
+    load_meta_table(meta_table)
+
+    checkpoints = []
+    with sql.db.get_engine_meta(meta_table).begin() as conn:
+        rows = _iter_meta_ids_with_weight(meta_table=meta_table,
+                                          id_min=id_min,
+                                          conn=conn)
+        for uid, value in rows:
+            cum_weight += value or 0
+            cum_count += 1
+            if cum_count % stride == 0:
+                checkpoints.append({"meta_table": meta_table.name,
+                                    "uid": uid,
+                                    "cumulative_weight": cum_weight,
+                                    "cumulative_count": cum_count})
+
+    if not checkpoints:
+        return
+
+    try:
+        with sql.db.engine_inventory.begin() as conn:
+            conn.execute(sa.insert(t_cum), checkpoints)
+    except sa.exc.IntegrityError:
+        logger.info("Cumulative weight index has been extended concurrently.")
+        return
+
+    logger.info(f"cumulative_weight_index_checkpoints: {len(checkpoints)}")
 
 
 def _read_single_next_id_from_meta(meta_table: MetaTableSpec,
-                                   id_min: int) -> BatchIdRange:
+                                   id_min: int,
+                                   conn: Optional[Connection] = None,
+                                   id_max: Optional[int] = None
+                                   ) -> Optional[BatchIdRange]:
     """Fallback if weight constraint does not even allow a single data item
-    to be returned.
+    to be returned. Returns `None` if there are no meta ids between `id_min`
+    and `id_max`.
 
     """
 
-    t_meta = autoload_meta_table(meta_table.name)
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
     c_id = t_meta.c[meta_table.cols.uid]
     weight_col = meta_table.cols.weight
 
-    filter_subquery = sa.select(sa.func.min(c_id)).where(c_id >= id_min)
+    where = [c_id >= id_min, *_build_meta_filter(meta_table, t_meta)]
+    if id_max is not None:
+        where.append(c_id <= id_max)
+    filter_subquery = sa.select(sa.func.min(c_id)).where(sa.and_(*where))
 
     select = [c_id.label("id_min"),
               c_id.label("id_max"),
@@ -162,11 +1352,14 @@ def _read_single_next_id_from_meta(meta_table: MetaTableSpec,
         select.append(sa.null().label("weight"))
 
     query = sa.select(*select).where(c_id.in_(filter_subquery))
-    with sql.db.engine_meta.begin() as conn:
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
         result = conn.execute(query).fetchone()
+
+    if result:
         return BatchIdRange(**result._asdict())
 
 
+@instrument
 def create_row_in_inventory(values: Dict, conn: Connection) -> int:
     """Inserts new row in inventory table while returning the resulting primary
     key.
@@ -178,32 +1371,531 @@ def create_row_in_inventory(values: Dict, conn: Connection) -> int:
     return result.inserted_primary_key[0]
 
 
-def update_row_in_inventory(primary_key: int, values: Dict):
-    """Updates row in inventory table given primary key.
+@instrument
+def create_rows_in_inventory(values: List[Dict],
+                             conn: Connection) -> List[int]:
+    """Inserts multiple rows in inventory table while returning the resulting
+    primary keys in order of given `values`. Uses a single bulk insert with
+    `RETURNING` ordered by parameters if supported by the dialect. Otherwise,
+    rows are inserted one by one.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+
+    # requires sqlalchemy 2.0 and dialect support
+    if not getattr(conn.dialect,
+                   "insert_executemany_returning_sort_by_parameter_order",
+                   False):
+        return [create_row_in_inventory(values=value, conn=conn)
+                for value in values]
+
+    stmt = sa.insert(t_inventory).returning(t_inventory.c.id,
+                                            sort_by_parameter_order=True)
+    result = conn.execute(stmt, values)
+    return helper.single_column_result_to_list(result.fetchall())
+
+
+def _utc_now() -> datetime.datetime:
+    """Naive UTC timestamp used for leases.
+
+    """
+
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def lease_expiry(ttl: float) -> datetime.datetime:
+    """Expiry timestamp of a lease with given time to live in seconds.
+
+    """
+
+    return _utc_now() + datetime.timedelta(seconds=ttl)
+
+
+def _claim_row_in_inventory(meta_table: MetaTableSpec,
+                            job: str,
+                            where: List,
+                            values: Dict) -> Optional[Dict]:
+    """Claim the inventory row of given job with the lowest id range matching
+    the given conditions. The claimed row is set to running while its attempt
+    is incremented in place. Raises `ConcurrentChangeError` if the row has
+    been claimed concurrently.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+    c_id = t_inventory.c.id
+    c_attempt = t_inventory.c.attempt
+    c_status = t_inventory.c.status
+
+    # where
+    where = sa.and_(t_inventory.c.meta_table == meta_table.name,
+                    t_inventory.c.job == job,
+                    *where)
+
+    # query
+    stmt = (sa.select(c_id,
+                      c_attempt,
+                      c_status,
+                      t_inventory.c.batch_id_start,
+                      t_inventory.c.batch_id_end,
+                      t_inventory.c.batch_count,
+                      t_inventory.c.batch_weight)
+            .where(where)
+            .order_by(t_inventory.c.batch_id_start)
+            .limit(1))
+
+    values = {"status": "running",
+              "attempt": c_attempt + 1,
+              "processing_start": sa.func.current_timestamp(),
+              "processing_end": None,
+              **values}
+
+    with sql.db.engine_inventory.begin() as conn:
+        row = conn.execute(stmt).fetchone()
+        if not row:
+            return
+
+        # compare-and-swap guards against concurrent claims
+        where = sa.and_(c_id == row.id,
+                        c_status == row.status,
+                        c_attempt == row.attempt)
+        update = sa.update(t_inventory).where(where).values(values)
+        if conn.execute(update).rowcount != 1:
+            raise ConcurrentChangeError(
+                f"Inventory row {row.id} has been claimed concurrently.")
+
+    logger.info(f"claimed_row_in_inventory: {row.id} ({row.status})")
+    return {**row._asdict(), "attempt": row.attempt + 1}
+
+
+@instrument
+def claim_failed_row_in_inventory(meta_table: MetaTableSpec,
+                                  job: str,
+                                  max_attempts: int,
+                                  lease_ttl: Optional[float] = None
+                                  ) -> Optional[Dict]:
+    """Reclaim the failed inventory row of given job with the lowest id range
+    which has fewer than `max_attempts` attempts.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+
+    where = [t_inventory.c.status == "failed",
+             t_inventory.c.attempt < max_attempts]
+
+    values = {"lease_expires": lease_expiry(lease_ttl)} if lease_ttl else {}
+    return _claim_row_in_inventory(meta_table=meta_table,
+                                   job=job,
+                                   where=where,
+                                   values=values)
+
+
+@instrument
+def claim_expired_row_in_inventory(meta_table: MetaTableSpec,
+                                   job: str,
+                                   lease_ttl: float,
+                                   max_attempts: Optional[int] = None
+                                   ) -> Optional[Dict]:
+    """Reclaim the running inventory row of given job with the lowest id range
+    whose lease has expired, e.g. because its worker has been killed. If
+    given, only rows with fewer than `max_attempts` attempts are reclaimed.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+
+    where = [t_inventory.c.status == "running",
+             t_inventory.c.lease_expires < _utc_now()]
+    if max_attempts:
+        where.append(t_inventory.c.attempt < max_attempts)
+
+    return _claim_row_in_inventory(
+        meta_table=meta_table,
+        job=job,
+        where=where,
+        values={"lease_expires": lease_expiry(lease_ttl)}
+    )
+
+
+@instrument
+def extend_lease_in_inventory(primary_key: int,
+                              attempt: int,
+                              lease_ttl: float) -> bool:
+    """Extends the lease of a running inventory row. Returns `False` if the
+    row is not running anymore or has been reclaimed by another worker in the
+    meantime.
+
+    """
+
+    t_inventory = sql.db.table_inventory
+
+    # where
+    where = sa.and_(t_inventory.c.id == primary_key,
+                    t_inventory.c.attempt == attempt,
+                    t_inventory.c.status == "running")
+
+    # query
+    values = {"lease_expires": lease_expiry(lease_ttl)}
+    stmt = sa.update(t_inventory).where(where).values(values)
+
+    with sql.db.engine_inventory.begin() as conn:
+        return conn.execute(stmt).rowcount == 1
+
+
+@instrument
+def update_row_in_inventory(primary_key: int,
+                            values: Dict,
+                            attempt: Optional[int] = None,
+                            conn: Optional[Connection] = None) -> bool:
+    """Updates row in inventory table given primary key. If `attempt` is
+    given, the row is only updated if it has not been reclaimed in the
+    meantime. Returns `False` if no row has been updated.
 
     """
 
     t_inventory = sql.db.table_inventory
     c_id = t_inventory.c.id
 
-    stmt = sa.update(t_inventory).where(c_id == primary_key).values(values)
+    # where
+    where = [c_id == primary_key]
+    if attempt is not None:
+        where.append(t_inventory.c.attempt == attempt)
+
+    stmt = sa.update(t_inventory).where(sa.and_(*where)).values(values)
+    with helper.begin(sql.db.engine_inventory, conn) as conn:
+        return conn.execute(stmt).rowcount == 1
+
+
+@instrument
+def read_max_meta_id_from_plan(meta_table: MetaTableSpec,
+                               job: str,
+                               id_min: int,
+                               id_max: int) -> Optional[int]:
+    """Retrieve the highest planned meta id of given job among the planned
+    ranges overlapping the meta id range between `id_min` and `id_max`.
+    Returns `None` if nothing has been planned within the range yet.
+
+    """
+
+    t_plan = sql.db.table_plan
+
+    # where
+    where = sa.and_(t_plan.c.meta_table == meta_table.name,
+                    t_plan.c.job == job,
+                    t_plan.c.batch_id_end >= id_min,
+                    t_plan.c.batch_id_start <= id_max)
+
+    # query
+    stmt = sa.select(sa.func.max(t_plan.c.batch_id_end)).where(where)
+
+    with sql.db.engine_inventory.begin() as conn:
+        max_plan_id = conn.execute(stmt).scalar()
+
+    logger.info(f"max_meta_id_from_plan: {max_plan_id}")
+    return max_plan_id
+
+
+@instrument
+def create_rows_in_plan(values: List[Dict]) -> int:
+    """Inserts planned batch ranges of the same job in plan table via a
+    single bulk insert while returning the number of inserted rows. Ranges
+    which have been planned concurrently by another planner are skipped.
+
+    """
+
+    if not values:
+        return 0
+
+    t_plan = sql.db.table_plan
+
+    try:
+        with sql.db.engine_inventory.begin() as conn:
+            conn.execute(sa.insert(t_plan), values)
+        return len(values)
+    except sa.exc.IntegrityError as e:
+        error = e
+
+    # where
+    starts = [value["batch_id_start"] for value in values]
+    where = sa.and_(t_plan.c.meta_table == values[0]["meta_table"],
+                    t_plan.c.job == values[0]["job"],
+                    t_plan.c.batch_id_start.in_(starts))
+
+    # query
+    stmt = sa.select(t_plan.c.batch_id_start).where(where)
+
+    with sql.db.engine_inventory.begin() as conn:
+        result = conn.execute(stmt).fetchall()
+        planned = set(helper.single_column_result_to_list(result))
+
+    # violation unrelated to concurrently planned ranges
+    if not planned:
+        raise error
+
+    logger.info(f"concurrently_planned_rows: {len(planned)}")
+
+    # each retry skips at least one concurrently planned range
+    missing = [value for value in values
+               if value["batch_id_start"] not in planned]
+    return create_rows_in_plan(values=missing)
+
+
+@instrument
+def read_next_row_from_plan(meta_table: MetaTableSpec,
+                            job: str,
+                            conn: Connection) -> Optional[Dict]:
+    """Retrieve the pending planned batch range of given job with the lowest
+    ids via the plan table's status index. Rows locked by concurrent claims
+    are skipped where supported by the dialect, e.g. PostgreSQL and MySQL.
+
+    """
+
+    t_plan = sql.db.table_plan
+
+    # select
+    select = [t_plan.c.id,
+              t_plan.c.batch_id_start,
+              t_plan.c.batch_id_end,
+              t_plan.c.batch_count,
+              t_plan.c.batch_weight]
+
+    # where
+    where = sa.and_(t_plan.c.meta_table == meta_table.name,
+                    t_plan.c.job == job,
+                    t_plan.c.status == "pending")
+
+    # query
+    stmt = (sa.select(*select)
+            .where(where)
+            .order_by(t_plan.c.batch_id_start)
+            .limit(1)
+            .with_for_update(skip_locked=True))
+
+    row = conn.execute(stmt).fetchone()
+    if row:
+        return row._asdict()
+
+
+@instrument
+def claim_row_in_plan(primary_key: int,
+                      inventory_id: int,
+                      conn: Connection):
+    """Claim given pending row of the plan table for the inventory row
+    `inventory_id` via compare-and-swap on its status. Raises
+    `ConcurrentChangeError` if the row has been claimed concurrently.
+
+    """
+
+    t_plan = sql.db.table_plan
+
+    # where
+    where = sa.and_(t_plan.c.id == primary_key,
+                    t_plan.c.status == "pending")
+
+    # query
+    stmt = (sa.update(t_plan)
+            .where(where)
+            .values(status="claimed",
+                    inventory_id=inventory_id,
+                    claimed=sa.func.current_timestamp()))
+
+    if conn.execute(stmt).rowcount != 1:
+        raise ConcurrentChangeError(
+            f"Plan row {primary_key} has been claimed concurrently.")
+
+    logger.info(f"claimed_row_in_plan: {primary_key}")
+
+
+@instrument
+def read_progress_from_plan(meta_table: MetaTableSpec,
+                            job: str) -> Dict[str, Dict]:
+    """Aggregate number of batches, items and weight of the planned batch
+    ranges of given job per status. Claimed ranges report the status of their
+    inventory rows while pending ranges are reported as `pending`.
+
+    """
+
+    t_plan = sql.db.table_plan
+    t_inventory = sql.db.table_inventory
+
+    # compacted inventory rows have been succeeded before being archived
+    status = sa.case(
+        (t_plan.c.status == "pending", "pending"),
+        else_=sa.func.coalesce(sa.cast(t_inventory.c.status, sa.String),
+                               "succeeded")
+    ).label("status")
+
+    # select
+    select = [status,
+              sa.func.count(t_plan.c.id).label("batches"),
+              sa.func.sum(t_plan.c.batch_count).label("items"),
+              sa.func.sum(t_plan.c.batch_weight).label("weight")]
+
+    # where
+    where = sa.and_(t_plan.c.meta_table == meta_table.name,
+                    t_plan.c.job == job)
+
+    # query
+    join = t_plan.outerjoin(t_inventory,
+                            t_plan.c.inventory_id == t_inventory.c.id)
+    stmt = (sa.select(*select)
+            .select_from(join)
+            .where(where)
+            .group_by(status))
+
     with sql.db.engine_inventory.begin() as conn:
-        conn.execute(stmt)
+        rows = conn.execute(stmt).fetchall()
+
+    progress = {row.status: {"batches": row.batches,
+                             "items": row.items,
+                             "weight": row.weight}
+                for row in rows}
+
+    logger.info(f"progress_from_plan: {progress}")
+    return progress
+
+
+def _build_items_via_id_range_query(meta_table: MetaTableSpec,
+                                    id_min: int,
+                                    id_max: int,
+                                    conn: Optional[Connection] = None
+                                    ) -> Select:
+    """Build query to select items from meta table for given id range ordered
+    by uid.
+
+    """
+
+    t_meta = load_meta_table(meta_table, conn=conn, id_min=id_min,
+                             id_max=id_max)
+    c_id = t_meta.c[meta_table.cols.uid]
+    c_item = t_meta.c[meta_table.cols.item]
+
+    where = sa.and_(c_id >= id_min,
+                    c_id <= id_max,
+                    *_build_meta_filter(meta_table, t_meta))
+    return sa.select(c_item).where(where).order_by(c_id)
+
+
+def _get_numpy_dtype(column: sa.Column) -> type:
+    """Map the python type of given column to a NumPy dtype. Non-numeric
+    columns, e.g. strings, and columns of unknown type are represented as
+    object arrays.
 
+    """
+
+    import numpy as np
+
+    dtypes = {bool: np.bool_, int: np.int64, float: np.float64}
+    try:
+        return dtypes.get(column.type.python_type, object)
+    except NotImplementedError:
+        return object
+
+
+def _to_numpy_array(values: Sequence, dtype: type) -> "np.ndarray":
+    """Convert values of a column to a one dimensional array of given dtype.
+    Numeric columns containing nulls fall back to object arrays to retain the
+    nulls.
+
+    """
+
+    import numpy as np
+
+    if dtype is not object and None not in values:
+        return np.array(values, dtype=dtype)
+
+    # avoid interpreting nested values such as lists as further dimensions
+    array = np.empty(len(values), dtype=object)
+    for idx, value in enumerate(values):
+        array[idx] = value
+
+    return array
+
+
+@instrument
+def read_columns_via_id_range_from_meta(meta_table: MetaTableSpec,
+                                        id_min: int,
+                                        id_max: int,
+                                        columns: List[str],
+                                        chunk_size: int = 10000
+                                        ) -> Dict[str, "np.ndarray"]:
+    """Loads item and given `columns` from meta table for given id range as
+    a mapping of column names to NumPy arrays. Rows are streamed in chunks
+    of `chunk_size` rows which are transposed into columns. Values are
+    processed by their column types as for `read_items_via_id_range_from_meta`,
+    e.g. timestamps and JSON items. Arrays are typed according to the column
+    types even if empty while non-numeric columns are provided as object
+    arrays.
+
+    """
+
+    import numpy as np
 
+    t_meta = load_meta_table(meta_table, id_min=id_min, id_max=id_max)
+    c_id = t_meta.c[meta_table.cols.uid]
+
+    names = list(dict.fromkeys([meta_table.cols.item, *columns]))
+
+    where = sa.and_(c_id >= id_min,
+                    c_id <= id_max,
+                    *_build_meta_filter(meta_table, t_meta))
+    select = [t_meta.c[name] for name in names]
+    stmt = sa.select(*select).where(where).order_by(c_id)
+
+    dtypes = {name: _get_numpy_dtype(t_meta.c[name]) for name in names}
+    chunks = {name: [] for name in names}
+    with sql.db.get_engine_meta(meta_table).connect() as conn:
+        conn = conn.execution_options(stream_results=True,
+                                      yield_per=chunk_size)
+        result = conn.execute(stmt)
+        for rows in result.partitions():
+            for name, values in zip(names, zip(*rows)):
+                chunks[name].append(_to_numpy_array(values, dtypes[name]))
+
+    return {name: np.concatenate(values) if values
+            else np.array([], dtype=dtypes[name])
+            for name, values in chunks.items()}
+
+
+@instrument
 def read_items_via_id_range_from_meta(meta_table: MetaTableSpec,
                                       id_min: int,
-                                      id_max: int) -> List[str]:
+                                      id_max: int,
+                                      conn: Optional[Connection] = None
+                                      ) -> List[str]:
     """Loads items from meta table for given id range.
 
     """
 
-    t_meta = autoload_meta_table(meta_table.name)
-    c_id = t_meta.c[meta_table.cols.uid]
-    c_item = t_meta.c[meta_table.cols.item]
+    stmt = _build_items_via_id_range_query(meta_table=meta_table,
+                                           id_min=id_min,
+                                           id_max=id_max,
+                                           conn=conn)
 
-    where = sa.and_(c_id >= id_min, c_id <= id_max)
-    stmt = sa.select(c_item).where(where)
-    with sql.db.engine_meta.begin() as conn:
+    with helper.begin(sql.db.get_engine_meta(meta_table), conn) as conn:
         result = conn.execute(stmt).fetchall()
         return helper.single_column_result_to_list(result)
+
+
+def iter_items_via_id_range_from_meta(meta_table: MetaTableSpec,
+                                      id_min: int,
+                                      id_max: int,
+                                      chunk_size: int) -> Iterator[str]:
+    """Streams items from meta table for given id range. Uses server side
+    cursors where supported by the dialect while fetching `chunk_size` rows
+    at a time. Hence, only a single chunk is held in memory.
+
+    """
+
+    stmt = _build_items_via_id_range_query(meta_table=meta_table,
+                                           id_min=id_min,
+                                           id_max=id_max)
+
+    with sql.db.get_engine_meta(meta_table).connect() as conn:
+        conn = conn.execution_options(stream_results=True,
+                                      yield_per=chunk_size)
+        result = conn.execute(stmt)
+        for partition in result.partitions():
+            yield from helper.single_column_result_to_list(partition)
@@ -1,11 +1,21 @@
-from typing import Optional
+import contextlib
+import threading
+from typing import Optional, Any, Dict, Tuple, Iterator, List
 
 from pydantic.main import BaseModel
-from sqlalchemy.engine.base import Engine
+from sqlalchemy.engine.base import Engine, Connection
 from sqlalchemy import create_engine, MetaData, Table
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 
-from pybatchintory import config as cfg
-from pybatchintory.sql.models import generate_inventory_table
+from pybatchintory import config as cfg, instrumentation
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql.models import generate_inventory_table, \
+    generate_cumulative_weight_table, generate_watermark_table, \
+    generate_inventory_archive_table, generate_plan_table
+
+_ENGINES: Dict[Tuple, Any] = {}
+_ENGINES_LOCK = threading.Lock()
 
 
 class DatabaseConfiguration(BaseModel):
@@ -14,8 +24,68 @@ class DatabaseConfiguration(BaseModel):
     metadata_inventory: MetaData
     metadata_meta: MetaData
     table_inventory: Table
+    table_watermark: Table
+    table_inventory_archive: Table
+    table_plan: Table
+    table_cumulative_weight: Table
+    engine_inventory_async: Optional[Any] = None
+    engine_meta_async: Optional[Any] = None
+
+    @property
+    def is_shared(self) -> bool:
+        """Inventory and meta tables live in the same database and share the
+        same engine.
+
+        """
+
+        return self.engine_inventory is self.engine_meta
+
+    def get_engine_meta(self, meta_table: MetaTableSpec) -> Engine:
+        """Provide the engine of the meta data source of given meta table.
+        Inventory sources live in the inventory database.
+
+        """
+
+        if meta_table.inventory_source:
+            return self.engine_inventory
+
+        return self.engine_meta
+
+    def is_shared_with(self, meta_table: MetaTableSpec) -> bool:
+        """Inventory table and meta data source of given meta table share the
+        same engine.
+
+        """
+
+        return self.engine_inventory is self.get_engine_meta(meta_table)
+
+    @contextlib.contextmanager
+    def begin_shared(self, meta_table: Optional[MetaTableSpec] = None
+                     ) -> Iterator[Optional[Connection]]:
+        """Begin a single transaction to be passed to both inventory and meta
+        operations if both share the same engine. Otherwise, provide `None`
+        to let each operation begin a separate transaction on its own engine.
+        If given, the meta data source of `meta_table` is considered.
+
+        """
+
+        shared = self.is_shared_with(meta_table) if meta_table \
+            else self.is_shared
+
+        if not shared:
+            yield None
+            return
+
+        with self.engine_inventory.begin() as conn:
+            yield conn
 
     def initialize_metadata_backend(self):
+        """Create missing backend tables, namely the inventory, watermark,
+        inventory archive, plan and cumulative weight tables. Existing tables
+        are not altered.
+
+        """
+
         self.metadata_inventory.create_all(bind=self.engine_inventory,
                                            checkfirst=True)
 
@@ -24,12 +94,23 @@ class DatabaseConfiguration(BaseModel):
 
 
 def initialize(engine_inventory: Optional[Engine] = None,
-               engine_meta: Optional[Engine] = None) -> DatabaseConfiguration:
+               engine_meta: Optional[Engine] = None,
+               engine_inventory_async: Optional[Any] = None,
+               engine_meta_async: Optional[Any] = None
+               ) -> DatabaseConfiguration:
     metadata_inventory = MetaData()
     metadata_meta = MetaData()
 
     engine_inventory = engine_inventory or get_engine_inventory()
     engine_meta = engine_meta or get_engine_meta()
+    engine_inventory_async = engine_inventory_async or \
+        get_engine_inventory_async()
+    engine_meta_async = engine_meta_async or get_engine_meta_async()
+
+    for engine in (engine_inventory, engine_meta,
+                   engine_inventory_async, engine_meta_async):
+        if engine is not None:
+            instrumentation.register_engine(engine)
 
     table_inventory = generate_inventory_table(
         name=cfg.settings.INVENTORY_TABLE_NAME,
@@ -37,22 +118,149 @@ def initialize(engine_inventory: Optional[Engine] = None,
         schema=cfg.settings.INVENTORY_CONN_SCHEMA
     )
 
+    table_watermark = generate_watermark_table(
+        name=cfg.settings.WATERMARK_TABLE_NAME,
+        metadata=metadata_inventory,
+        schema=cfg.settings.INVENTORY_CONN_SCHEMA
+    )
+
+    table_inventory_archive = generate_inventory_archive_table(
+        name=cfg.settings.INVENTORY_ARCHIVE_TABLE_NAME,
+        metadata=metadata_inventory,
+        schema=cfg.settings.INVENTORY_CONN_SCHEMA
+    )
+
+    table_plan = generate_plan_table(
+        name=cfg.settings.PLAN_TABLE_NAME,
+        metadata=metadata_inventory,
+        schema=cfg.settings.INVENTORY_CONN_SCHEMA
+    )
+
+    table_cumulative_weight = generate_cumulative_weight_table(
+        name=cfg.settings.CUMULATIVE_WEIGHT_TABLE_NAME,
+        metadata=metadata_inventory,
+        schema=cfg.settings.INVENTORY_CONN_SCHEMA
+    )
+
     return DatabaseConfiguration(
         engine_inventory=engine_inventory,
         engine_meta=engine_meta,
         metadata_inventory=metadata_inventory,
         metadata_meta=metadata_meta,
         table_inventory=table_inventory,
+        table_watermark=table_watermark,
+        table_inventory_archive=table_inventory_archive,
+        table_plan=table_plan,
+        table_cumulative_weight=table_cumulative_weight,
+        engine_inventory_async=engine_inventory_async,
+        engine_meta_async=engine_meta_async
     )
 
 
+def _build_pool_options(url: str) -> Dict[str, Any]:
+    """Collect pool configuration from settings while omitting values which
+    are not set to retain the defaults of the dialect. Pool sizing is only
+    supported by queue based pools and hence omitted for other pools, e.g.
+    the `SingletonThreadPool` of in-memory sqlite databases.
+
+    """
+
+    options = {"pool_size": cfg.settings.POOL_SIZE,
+               "max_overflow": cfg.settings.POOL_MAX_OVERFLOW,
+               "pool_recycle": cfg.settings.POOL_RECYCLE,
+               "pool_pre_ping": cfg.settings.POOL_PRE_PING or None}
+
+    if not issubclass(_get_pool_class(url), QueuePool):
+        options.pop("pool_size")
+        options.pop("max_overflow")
+
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def _get_pool_class(url: str) -> type:
+    """Provide the default pool class of the dialect of given URL.
+
+    """
+
+    url = make_url(url)
+    return url.get_dialect().get_pool_class(url)
+
+
+def _get_engine_key(url: str, is_async: bool = False) -> Tuple:
+    options = _build_pool_options(url)
+    return url, is_async, cfg.settings.DEBUG, tuple(sorted(options.items()))
+
+
+def _get_engine(url: str, is_async: bool = False):
+    """Provide the engine for given URL from the engine registry. Engines are
+    shared among all callers requesting the same URL with the same pool
+    configuration. Hence, identical inventory and meta URLs share a single
+    connection pool.
+
+    """
+
+    key = _get_engine_key(url, is_async=is_async)
+    options = dict(key[-1])
+
+    with _ENGINES_LOCK:
+        if key not in _ENGINES:
+            if is_async:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                factory = create_async_engine
+            else:
+                factory = create_engine
+
+            _ENGINES[key] = factory(url, echo=cfg.settings.DEBUG, **options)
+
+        return _ENGINES[key]
+
+
+def _dispose(engines: List[Any]):
+    for engine in engines:
+        # async engines expose the pool of their synchronous engine
+        getattr(engine, "sync_engine", engine).dispose()
+
+
+def dispose_engines():
+    """Dispose connection pools of all registered engines and clear the
+    engine registry.
+
+    """
+
+    with _ENGINES_LOCK:
+        engines = list(_ENGINES.values())
+        _ENGINES.clear()
+
+    _dispose(engines)
+
+
+def dispose_stale_engines():
+    """Dispose connection pools of registered engines which do not match the
+    current settings anymore, e.g. after `configure` changed connection
+    strings or pool settings, and remove them from the engine registry.
+
+    """
+
+    urls = [(cfg.settings.INVENTORY_CONN, False),
+            (cfg.settings.META_CONN, False),
+            (cfg.settings.INVENTORY_ASYNC_CONN, True),
+            (cfg.settings.META_ASYNC_CONN, True)]
+    keys = {_get_engine_key(url.get_secret_value(), is_async=is_async)
+            for url, is_async in urls if url}
+
+    with _ENGINES_LOCK:
+        stale = [key for key in _ENGINES if key not in keys]
+        engines = [_ENGINES.pop(key) for key in stale]
+
+    _dispose(engines)
+
+
 def get_engine_inventory() -> Engine:
     """Provides SQLAlchemy engine for inventory table.
 
     """
 
-    return create_engine(url=cfg.settings.INVENTORY_CONN.get_secret_value(),
-                         echo=cfg.settings.DEBUG)
+    return _get_engine(cfg.settings.INVENTORY_CONN.get_secret_value())
 
 
 def get_engine_meta() -> Engine:
@@ -62,7 +270,31 @@ def get_engine_meta() -> Engine:
     """
 
     if cfg.settings.META_CONN:
-        return create_engine(url=cfg.settings.META_CONN.get_secret_value(),
-                             echo=cfg.settings.DEBUG)
+        return _get_engine(cfg.settings.META_CONN.get_secret_value())
 
     return get_engine_inventory()
+
+
+def get_engine_inventory_async():
+    """Provides SQLAlchemy async engine for inventory table which requires
+    `greenlet` and an async database driver to be installed. Returns `None`
+    if `INVENTORY_ASYNC_CONN` is not set.
+
+    """
+
+    if cfg.settings.INVENTORY_ASYNC_CONN:
+        url = cfg.settings.INVENTORY_ASYNC_CONN.get_secret_value()
+        return _get_engine(url, is_async=True)
+
+
+def get_engine_meta_async():
+    """Provides SQLAlchemy async engine for meta table.
+
+    Uses async inventory engine as fallback if `META_ASYNC_CONN` is not set.
+    """
+
+    if cfg.settings.META_ASYNC_CONN:
+        url = cfg.settings.META_ASYNC_CONN.get_secret_value()
+        return _get_engine(url, is_async=True)
+
+    return get_engine_inventory_async()
@@ -1,5 +1,23 @@
-from typing import List, Tuple, Any
+import contextlib
+from typing import List, Tuple, Any, Optional, Iterator
+
+from sqlalchemy.engine.base import Connection, Engine
 
 
 def single_column_result_to_list(result_column: List[Tuple[Any]]) -> List[Any]:
-    return [x[0] for x in result_column]
\ No newline at end of file
+    return [x[0] for x in result_column]
+
+
+@contextlib.contextmanager
+def begin(engine: Engine,
+          conn: Optional[Connection] = None) -> Iterator[Connection]:
+    """Provide given connection to participate in its ongoing transaction or
+    begin a separate transaction on given engine.
+
+    """
+
+    if conn is not None:
+        yield conn
+    else:
+        with engine.begin() as conn:
+            yield conn
@@ -2,7 +2,7 @@ from typing import Optional
 
 from pybatchintory import config as cfg
 from sqlalchemy import Table, Column, Integer, String, DateTime, Enum, \
-    JSON, MetaData, func, BigInteger, Float
+    JSON, MetaData, func, BigInteger, Float, Index
 
 from pybatchintory.models import MetaTableColumns
 
@@ -36,10 +36,122 @@ def generate_inventory_table(name: str,
                default="running"),
         Column('logging', String),
         Column('config', JSON, nullable=False),
+        Column('lease_expires', DateTime),
+        Index(f"ix_{name}_meta_table_job_end",
+              'meta_table', 'job', 'batch_id_end'),
+        Index(f"ix_{name}_meta_table_job_status",
+              'meta_table', 'job', 'status'),
         schema=schema,
         sqlite_autoincrement=True
     )
 
+
+def generate_inventory_archive_table(name: str,
+                                     metadata: MetaData,
+                                     schema: Optional[str] = None) -> Table:
+    """Stores inventory rows which have been merged into the summary row
+    referenced by `compacted_into`.
+
+    """
+
+    return Table(
+        name,
+        metadata,
+        Column('id', BigInteger, primary_key=True, autoincrement=False),
+        Column('meta_table', String, nullable=False),
+        Column('job', String, nullable=False),
+        Column('job_identifier', String),
+        Column('job_result_item', JSON),
+        Column('processing_start', DateTime, nullable=False),
+        Column('processing_end', DateTime),
+        Column('batch_id_start', BigInteger, nullable=False),
+        Column('batch_id_end', BigInteger, nullable=False),
+        Column('batch_weight', Integer),
+        Column('batch_count', Integer, nullable=False),
+        Column('attempt', Integer, nullable=False),
+        Column('status', String, nullable=False),
+        Column('logging', String),
+        Column('config', JSON, nullable=False),
+        Column('lease_expires', DateTime),
+        Column('compacted_into', BigInteger, nullable=False),
+        Index(f"ix_{name}_compacted_into", 'compacted_into'),
+        schema=schema
+    )
+
+
+def generate_plan_table(name: str,
+                        metadata: MetaData,
+                        schema: Optional[str] = None) -> Table:
+    """Stores precomputed batch ranges of backfill plans. Pending ranges are
+    claimed in ascending order while `inventory_id` references the inventory
+    row of the claimed batch.
+
+    """
+
+    return Table(
+        name,
+        metadata,
+        Column('id',
+               BigInteger().with_variant(Integer, "sqlite"),
+               primary_key=True),
+        Column('meta_table', String, nullable=False),
+        Column('job', String, nullable=False),
+        Column('batch_id_start', BigInteger, nullable=False),
+        Column('batch_id_end', BigInteger, nullable=False),
+        Column('batch_weight', Float),
+        Column('batch_count', Integer, nullable=False),
+        Column('status', String, nullable=False, default="pending"),
+        Column('inventory_id', BigInteger),
+        Column('created', DateTime, nullable=False, default=TS),
+        Column('claimed', DateTime),
+        Index(f"ix_{name}_meta_table_job_start",
+              'meta_table', 'job', 'batch_id_start', unique=True),
+        Index(f"ix_{name}_meta_table_job_status_start",
+              'meta_table', 'job', 'status', 'batch_id_start'),
+        schema=schema,
+        sqlite_autoincrement=True
+    )
+
+
+def generate_watermark_table(name: str,
+                             metadata: MetaData,
+                             schema: Optional[str] = None) -> Table:
+    """Stores the highest processed meta id per meta table and job which is
+    advanced along with each acquired batch.
+
+    """
+
+    return Table(
+        name,
+        metadata,
+        Column('meta_table', String, primary_key=True),
+        Column('job', String, primary_key=True),
+        Column('batch_id_end', BigInteger, nullable=False),
+        Column('updated', DateTime, nullable=False, default=TS, onupdate=TS),
+        schema=schema
+    )
+
+
+def generate_cumulative_weight_table(name: str,
+                                     metadata: MetaData,
+                                     schema: Optional[str] = None) -> Table:
+    """Side table storing checkpoints of cumulative weight and count for every
+    `CUMULATIVE_WEIGHT_STRIDE` rows of a meta table.
+
+    """
+
+    return Table(
+        name,
+        metadata,
+        Column('meta_table', String, primary_key=True),
+        Column('uid', BigInteger, primary_key=True),
+        Column('cumulative_weight', Float, nullable=False),
+        Column('cumulative_count', BigInteger, nullable=False),
+        Index(f"ix_{name}_weight", 'meta_table', 'cumulative_weight'),
+        schema=schema
+    )
+
+
 def generate_meta_table(name: str,
                         metadata: MetaData,
                         schema: Optional[str] = None) -> Table:
@@ -0,0 +1,192 @@
+"""This module contains the partitioned meta data tables which are split into
+several physical tables or partitions, e.g. one table per month, while
+sharing one logical uid space. Partitions are given in ascending uid order.
+
+Queries only cover the partitions overlapping the requested uid bounds
+instead of a `UNION ALL` of all partitions. Partitions other than the last
+one are assumed to be complete such that their uid bounds are read once and
+cached.
+
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import Table, MetaData
+from sqlalchemy.engine.base import Connection
+from sqlalchemy.sql.selectable import FromClause
+
+from pybatchintory import sql
+from pybatchintory.logging import logger
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql import helper, reflection
+
+Bounds = Tuple[Optional[int], Optional[int]]
+
+_PARTITION_BOUNDS: Dict[Tuple[str, str], Tuple[Bounds, bool]] = {}
+_PARTITION_TABLES: Dict[Tuple, List[Table]] = {}
+_PARTITIONED_META_TABLES: Dict[Tuple, FromClause] = {}
+
+
+def _get_cache_key(meta_table: MetaTableSpec) -> Tuple:
+    col_types = tuple(sorted((meta_table.col_types or {}).items()))
+    names = tuple(partition.name for partition in meta_table.partitions)
+    return meta_table.name, names, col_types
+
+
+def _load_partition_tables(meta_table: MetaTableSpec,
+                           conn: Optional[Connection] = None) -> List[Table]:
+    """Provide tables of all partitions. Only the first partition is loaded
+    via `load_meta_table` while the remaining partitions are declared with
+    its columns without any catalog introspection.
+
+    """
+
+    key = _get_cache_key(meta_table)
+    if key in _PARTITION_TABLES:
+        return _PARTITION_TABLES[key]
+
+    first, *others = meta_table.partitions
+    template = reflection.load_meta_table(
+        meta_table.copy(update={"name": first.name, "partitions": []}),
+        conn=conn
+    )
+
+    tables = [template]
+    for partition in others:
+        schema, table_name = reflection._split_schema(partition.name)
+        columns = [sa.Column(column.name, column.type)
+                   for column in template.columns]
+        tables.append(Table(table_name, MetaData(), *columns, schema=schema))
+
+    _PARTITION_TABLES[key] = tables
+    return tables
+
+
+def read_partition_bounds(meta_table: MetaTableSpec,
+                          conn: Optional[Connection] = None) -> List[Bounds]:
+    """Provide the `(id_min, id_max)` uid bounds of all partitions. Declared
+    bounds take precedence. Unknown bounds are read via a single query of
+    `min(uid)` and `max(uid)` per partition which are resolved via the uid
+    index. Bounds of empty partitions are `None`.
+
+    Bounds are cached except for the upper bound of the last partition which
+    may still grow. The lower bound of the last partition is read once it
+    contains data.
+
+    """
+
+    engine = sql.db.get_engine_meta(meta_table)
+    url = str(engine.url)
+    tables = _load_partition_tables(meta_table, conn=conn)
+    last = len(meta_table.partitions) - 1
+
+    bounds = {}
+    missing = []
+    for idx, partition in enumerate(meta_table.partitions):
+        cached = _PARTITION_BOUNDS.get((url, partition.name))
+        declared = partition.id_min is not None and \
+            (partition.id_max is not None or idx == last)
+
+        if declared:
+            bounds[idx] = partition.id_min, partition.id_max
+        elif cached and (cached[1] or
+                         idx == last and cached[0][0] is not None):
+            bounds[idx] = cached[0]
+        else:
+            missing.append(idx)
+
+    if missing:
+        queries = []
+        for idx in missing:
+            c_id = tables[idx].c[meta_table.cols.uid]
+            queries.append(sa.select(sa.literal(idx),
+                                     sa.func.min(c_id),
+                                     sa.func.max(c_id)))
+
+        with helper.begin(engine, conn) as conn:
+            rows = conn.execute(sa.union_all(*queries)).fetchall()
+
+        for idx, id_min, id_max in rows:
+            partition = meta_table.partitions[idx]
+            complete = idx != last
+            _PARTITION_BOUNDS[(url, partition.name)] = \
+                (id_min, id_max), complete
+            bounds[idx] = id_min, id_max
+
+        logger.info(f"partition_bounds: {len(missing)}")
+
+    # declared bounds override read bounds
+    result = []
+    for idx, partition in enumerate(meta_table.partitions):
+        id_min, id_max = bounds[idx]
+        if partition.id_min is not None:
+            id_min = partition.id_min
+        if partition.id_max is not None:
+            id_max = partition.id_max
+        result.append((id_min, id_max))
+
+    return result
+
+
+def prune_partitions(bounds: List[Bounds],
+                     id_min: Optional[int] = None,
+                     id_max: Optional[int] = None) -> List[int]:
+    """Provide the indices of all partitions which overlap the uid range
+    between `id_min` and `id_max`. Empty partitions are pruned while the last
+    partition is kept unless it starts after `id_max` since it may still
+    grow.
+
+    """
+
+    last = len(bounds) - 1
+    selected = []
+    for idx, (partition_min, partition_max) in enumerate(bounds):
+        if idx == last:
+            partition_max = None
+        elif partition_min is None:
+            continue
+
+        if id_max is not None and partition_min is not None and \
+                partition_min > id_max:
+            continue
+        if id_min is not None and partition_max is not None and \
+                partition_max < id_min:
+            continue
+
+        selected.append(idx)
+
+    # keep a valid selectable if no partition overlaps
+    return selected or [last]
+
+
+def load_partitioned_meta_table(meta_table: MetaTableSpec,
+                                conn: Optional[Connection] = None,
+                                id_min: Optional[int] = None,
+                                id_max: Optional[int] = None
+                                ) -> FromClause:
+    """Provide the logical meta table consisting of all partitions which
+    overlap the uid range between `id_min` and `id_max`. A single partition
+    is provided as is while several partitions are combined via `UNION ALL`.
+
+    Selectables are memoized per set of partitions. Hence, repeated calls
+    with the same bounds provide the same selectable such that their columns
+    may be combined within the same query.
+
+    """
+
+    tables = _load_partition_tables(meta_table, conn=conn)
+    bounds = read_partition_bounds(meta_table, conn=conn)
+    selected = tuple(prune_partitions(bounds, id_min=id_min, id_max=id_max))
+
+    if len(selected) == 1:
+        return tables[selected[0]]
+
+    key = (*_get_cache_key(meta_table), selected)
+    if key not in _PARTITIONED_META_TABLES:
+        union = sa.union_all(*[sa.select(*tables[idx].columns)
+                               for idx in selected])
+        _, table_name = reflection._split_schema(meta_table.name)
+        _PARTITIONED_META_TABLES[key] = union.subquery(table_name)
+
+    return _PARTITIONED_META_TABLES[key]
@@ -1,20 +1,250 @@
 import functools
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
 
+import sqlalchemy as sa
 from sqlalchemy import Table, MetaData
+from sqlalchemy.engine.base import Connection
+from sqlalchemy.sql.selectable import FromClause
 
-from pybatchintory import sql
+from pybatchintory import sql, config as cfg
+from pybatchintory.logging import logger
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql import helper, partitions
 
+SCHEMA_CACHE_FORMAT = 2
+"""Version of the on-disk schema cache format which invalidates existing
+cache files if changed."""
 
-@functools.lru_cache(maxsize=128)
-def autoload_meta_table(name: str) -> Table:
-    """Loads schema for meta table from database.
+_META_TABLES: Dict[str, Table] = {}
 
-    """
 
+def _split_schema(name: str) -> Tuple[Optional[str], str]:
     if "." in name:
         schema, name = name.split(".")
+        return schema, name
+
+    return None, name
+
+
+def _get_schema_cache_path(name: str) -> Optional[str]:
+    """Provide the path of the on-disk schema cache file for given meta table.
+    The file name is derived from the meta connection string and the table
+    name. Returns `None` if `SCHEMA_CACHE_DIR` is not set.
+
+    """
+
+    cache_dir = cfg.settings.SCHEMA_CACHE_DIR
+    if not cache_dir:
+        return
+
+    url = sql.db.engine_meta.url.render_as_string(hide_password=True)
+    key = f"{SCHEMA_CACHE_FORMAT}|{url}|{name}"
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.json")
+
+
+def _get_type_name(column: sa.Column) -> str:
+    """Provide the name of the generic SqlAlchemy type of given column.
+    Dialect specific types without generic counterpart are `NullType`.
+
+    """
+
+    try:
+        col_type = column.type.as_generic()
+    except NotImplementedError:
+        return "NullType"
+
+    name = type(col_type).__name__
+    return name if isinstance(getattr(sa.types, name, None), type) \
+        else "NullType"
+
+
+def _read_schema_fingerprint(name: str,
+                             conn: Optional[Connection] = None) -> str:
+    """Provide a fingerprint of the meta table's current schema derived from
+    names and DBAPI type codes of its columns. These are read via a query
+    returning no rows without any catalog introspection.
+
+    """
+
+    schema, table_name = _split_schema(name)
+    stmt = (sa.select(sa.text("*"))
+            .select_from(sa.table(table_name, schema=schema))
+            .where(sa.false()))
+
+    with helper.begin(sql.db.engine_meta, conn) as conn:
+        description = conn.execute(stmt).cursor.description
+
+    columns = [f"{column[0]}:{column[1]}" for column in description]
+    return hashlib.sha256("|".join(columns).encode()).hexdigest()
+
+
+def _read_schema_cache(name: str,
+                       conn: Optional[Connection] = None) -> Optional[Table]:
+    """Load meta table from the on-disk schema cache. Returns `None` if it is
+    missing, expired, unreadable or if its fingerprint does not match the
+    current schema of the meta table.
+
+    """
+
+    path = _get_schema_cache_path(name)
+    if not path or not os.path.exists(path):
+        return
+
+    ttl = cfg.settings.SCHEMA_CACHE_TTL
+    if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+        logger.info(f"Schema cache for meta table '{name}' has expired.")
+        return
+
+    try:
+        with open(path, "r") as file:
+            cached = json.load(file)
+
+        columns = [sa.Column(column["name"],
+                             getattr(sa.types, column["type"]),
+                             primary_key=column["primary_key"])
+                   for column in cached["columns"]]
+    except Exception as e:
+        logger.warning(f"Schema cache for meta table '{name}' is not "
+                       f"readable: {e}")
+        return
+
+    if cached["fingerprint"] != _read_schema_fingerprint(name, conn=conn):
+        logger.info(f"Schema cache for meta table '{name}' is outdated.")
+        return
+
+    schema, table_name = _split_schema(name)
+    return Table(table_name, MetaData(), *columns, schema=schema)
+
+
+def _write_schema_cache(name: str,
+                        table: Table,
+                        conn: Optional[Connection] = None):
+    """Store column names and generic type names of the reflected meta table
+    along with its schema fingerprint as JSON in the on-disk schema cache.
+    The file is replaced atomically to support concurrent processes.
+
+    """
+
+    path = _get_schema_cache_path(name)
+    if not path:
+        return
+
+    cached = {"fingerprint": _read_schema_fingerprint(name, conn=conn),
+              "columns": [{"name": column.name,
+                           "type": _get_type_name(column),
+                           "primary_key": column.primary_key}
+                          for column in table.columns]}
+
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(cached, file)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def invalidate_schema_cache(name: Optional[str] = None):
+    """Remove the cached schema of given meta table from memory and disk, e.g.
+    after its schema has changed. Removes all cached schemas if `name` is not
+    given.
+
+    """
+
+    if name:
+        _META_TABLES.pop(name, None)
+    else:
+        _META_TABLES.clear()
+
+    cache_dir = cfg.settings.SCHEMA_CACHE_DIR
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return
+
+    if name:
+        paths = [_get_schema_cache_path(name)]
     else:
-        schema = None
+        paths = [os.path.join(cache_dir, file_name)
+                 for file_name in os.listdir(cache_dir)
+                 if file_name.endswith(".json")]
+
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def autoload_meta_table(name: str,
+                        conn: Optional[Connection] = None) -> Table:
+    """Loads schema for meta table from database. Reflected tables are cached
+    by name in memory and optionally on disk via `SCHEMA_CACHE_DIR` to avoid
+    catalog introspection in new processes. Cached schemas are verified via a
+    fingerprint of the current column names and types. Reflection uses the
+    given connection if provided, e.g. the synchronous facade of an async
+    connection.
+
+    """
+
+    if name in _META_TABLES:
+        return _META_TABLES[name]
+
+    table = _read_schema_cache(name, conn=conn)
+    if table is None:
+        schema, table_name = _split_schema(name)
+        bind = conn if conn is not None else sql.db.engine_meta
+        table = Table(table_name, MetaData(), schema=schema,
+                      autoload_with=bind)
+        _write_schema_cache(name, table, conn=conn)
+
+    _META_TABLES[name] = table
+    return table
+
+
+@functools.lru_cache(maxsize=128)
+def _declare_meta_table(name: str,
+                        col_types: Tuple[Tuple[str, str], ...]) -> Table:
+    """Build meta table from explicitly declared column types without any
+    catalog introspection.
+
+    """
+
+    schema, table_name = _split_schema(name)
+    columns = [sa.Column(col, getattr(sa.types, col_type))
+               for col, col_type in col_types]
+    return Table(table_name, MetaData(), *columns, schema=schema)
+
+
+def load_meta_table(meta_table: MetaTableSpec,
+                    conn: Optional[Connection] = None,
+                    id_min: Optional[int] = None,
+                    id_max: Optional[int] = None) -> FromClause:
+    """Provide meta table either from explicitly declared column types of the
+    given meta table specification or via reflection. Inventory sources are
+    provided by the inventory table itself. Partitioned meta tables only
+    cover the partitions overlapping the uid range between `id_min` and
+    `id_max`.
+
+    """
+
+    if meta_table.inventory_source:
+        return sql.db.table_inventory
+
+    if meta_table.partitions:
+        return partitions.load_partitioned_meta_table(meta_table,
+                                                      conn=conn,
+                                                      id_min=id_min,
+                                                      id_max=id_max)
+
+    if meta_table.col_types:
+        col_types = tuple(sorted(meta_table.col_types.items()))
+        return _declare_meta_table(meta_table.name, col_types)
 
-    engine = sql.db.engine_meta
-    return Table(name, MetaData(), schema=schema, autoload_with=engine)
+    return autoload_meta_table(meta_table.name, conn=conn)
@@ -4,7 +4,9 @@ from sqlalchemy.engine.base import Engine
 from sqlalchemy import Table, MetaData
 
 from pybatchintory.sql.models import generate_inventory_table, \
-    generate_meta_table
+    generate_meta_table, generate_cumulative_weight_table, \
+    generate_watermark_table, generate_inventory_archive_table, \
+    generate_plan_table
 
 
 def _recreate_table(func, engine, name, schema) -> Table:
@@ -46,3 +48,55 @@ def recreate_meta_table(engine: Engine,
                            engine=engine,
                            name=name,
                            schema=schema)
+
+
+def recreate_cumulative_weight_table(engine: Engine,
+                                     name: str,
+                                     schema: Optional[str]) -> Table:
+    """Removes existing table and creates new cumulative weight table.
+
+    """
+
+    return _recreate_table(func=generate_cumulative_weight_table,
+                           engine=engine,
+                           name=name,
+                           schema=schema)
+
+
+def recreate_inventory_archive_table(engine: Engine,
+                                     name: str,
+                                     schema: Optional[str]) -> Table:
+    """Removes existing table and creates new inventory archive table.
+
+    """
+
+    return _recreate_table(func=generate_inventory_archive_table,
+                           engine=engine,
+                           name=name,
+                           schema=schema)
+
+
+def recreate_plan_table(engine: Engine,
+                        name: str,
+                        schema: Optional[str]) -> Table:
+    """Removes existing table and creates new plan table.
+
+    """
+
+    return _recreate_table(func=generate_plan_table,
+                           engine=engine,
+                           name=name,
+                           schema=schema)
+
+
+def recreate_watermark_table(engine: Engine,
+                             name: str,
+                             schema: Optional[str]) -> Table:
+    """Removes existing table and creates new watermark table.
+
+    """
+
+    return _recreate_table(func=generate_watermark_table,
+                           engine=engine,
+                           name=name,
+                           schema=schema)
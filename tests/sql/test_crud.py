@@ -1,5 +1,18 @@
+import numpy as np
+import pytest
+import sqlalchemy as sa
+
+from pybatchintory import config as cfg, sql
+from pybatchintory.exceptions import ConcurrentChangeError
 from pybatchintory.models import MetaTableSpec
-from pybatchintory.sql.crud import read_meta_id_range_from_meta
+from pybatchintory.sql.crud import read_meta_id_range_from_meta, \
+    read_meta_id_ranges_from_meta, refresh_cumulative_weight_index, \
+    read_max_meta_id_from_inventory, update_watermark_in_inventory, \
+    read_next_batch_from_meta, read_items_via_id_range_from_meta, \
+    read_min_meta_id_from_meta, read_max_meta_id_from_meta, \
+    create_rows_in_plan, read_next_row_from_plan, claim_row_in_plan, \
+    create_rows_in_inventory, read_columns_via_id_range_from_meta
+from pybatchintory.sql.reflection import autoload_meta_table
 from ..conftest import META_TABLE_NAME_SCHEMA as META_TABLE
 
 
@@ -143,3 +156,379 @@ def test_get_meta_id_range_from_meta_weight_constraint_not_realizable(
     assert id_range.id_max == 5
     assert id_range.count == 1
     assert id_range.weight == 10
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1000])
+@pytest.mark.parametrize("weight, count, expected", [
+    (7, None, (0, 2, 3, 6)),
+    (12, None, (0, 3, 4, 12)),
+    (20, 2, (0, 1, 2, 2)),
+    (30, 10, (0, 5, 6, 30)),
+    (1000, None, (0, 9, 10, 90)),
+])
+def test_get_meta_id_range_from_meta_weight_constraint_chunk_sizes(
+        default_setup, meta_table, monkeypatch, chunk_size, weight, count,
+        expected):
+    monkeypatch.setattr(cfg.settings, "BOUNDARY_SEARCH_CHUNK_SIZE",
+                        chunk_size)
+
+    id_range = read_meta_id_range_from_meta(
+        meta_table=MetaTableSpec(name=meta_table),
+        id_min=0,
+        count=count,
+        weight=weight
+    )
+
+    assert (id_range.id_min,
+            id_range.id_max,
+            id_range.count,
+            id_range.weight) == expected
+
+
+def test_get_meta_id_range_from_meta_count_constraint_bounded_backfill(
+        default_setup, meta_table):
+    id_range = read_meta_id_range_from_meta(
+        meta_table=MetaTableSpec(name=meta_table),
+        id_min=3,
+        id_max=4,
+        count=5
+    )
+
+    assert id_range.id_min == 3
+    assert id_range.id_max == 4
+    assert id_range.count == 2
+    assert id_range.weight == 14
+
+
+@pytest.mark.parametrize("stride", [1, 2, 3, 20])
+def test_get_meta_id_range_from_meta_cumulative_weight_index(
+        default_setup, cumulative_weight_table, meta_table, monkeypatch,
+        stride):
+    monkeypatch.setattr(cfg.settings, "CUMULATIVE_WEIGHT_STRIDE", stride)
+    indexed = MetaTableSpec(name=meta_table, cumulative_weight_index=True)
+    refresh_cumulative_weight_index(meta_table=indexed)
+
+    for id_min in range(10):
+        for weight in (5, 7, 12, 30, 100):
+            for count in (None, 1, 3):
+                for id_max in (None, 6):
+                    kwargs = dict(id_min=id_min,
+                                  id_max=id_max,
+                                  weight=weight,
+                                  count=count)
+                    expected = read_meta_id_range_from_meta(
+                        meta_table=MetaTableSpec(name=meta_table), **kwargs)
+                    actual = read_meta_id_range_from_meta(
+                        meta_table=indexed, **kwargs)
+
+                    assert actual == expected, kwargs
+
+
+def test_refresh_cumulative_weight_index_incrementally(
+        default_setup, cumulative_weight_table, meta_table, monkeypatch,
+        engine_meta, engine_inventory):
+    monkeypatch.setattr(cfg.settings, "CUMULATIVE_WEIGHT_STRIDE", 4)
+    indexed = MetaTableSpec(name=meta_table, cumulative_weight_index=True)
+
+    def read_checkpoints():
+        stmt = (sa.select(cumulative_weight_table.c.uid,
+                          cumulative_weight_table.c.cumulative_weight,
+                          cumulative_weight_table.c.cumulative_count)
+                .order_by(cumulative_weight_table.c.uid))
+        with engine_inventory.begin() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    refresh_cumulative_weight_index(meta_table=indexed)
+    assert read_checkpoints() == [(3, 12, 4), (7, 56, 8)]
+
+    t_meta = autoload_meta_table(meta_table)
+    new_rows = [{"uid": uid, "item": f"f{uid}", "weight": 1}
+                for uid in range(10, 16)]
+    with engine_meta.begin() as conn:
+        conn.execute(sa.insert(t_meta), new_rows)
+
+    refresh_cumulative_weight_index(meta_table=indexed)
+    refresh_cumulative_weight_index(meta_table=indexed)
+    assert read_checkpoints() == [(3, 12, 4), (7, 56, 8), (11, 92, 12),
+                                  (15, 96, 16)]
+
+
+@pytest.mark.parametrize("weight, count", [
+    (None, None), (None, 3), (5, None), (25, None), (30, 2), (40, 4)
+])
+def test_get_meta_id_ranges_from_meta_equals_sequential_ranges(
+        default_setup, meta_table, weight, count):
+    spec = MetaTableSpec(name=meta_table)
+    ranges = read_meta_id_ranges_from_meta(meta_table=spec,
+                                           id_min=1,
+                                           iterations=100,
+                                           weight=weight,
+                                           count=count)
+
+    expected = []
+    id_min = 1
+    while id_min <= 9:
+        expected.append(read_meta_id_range_from_meta(meta_table=spec,
+                                                     id_min=id_min,
+                                                     weight=weight,
+                                                     count=count))
+        id_min = expected[-1].id_max + 1
+
+    assert ranges == expected
+
+
+def test_read_max_meta_id_from_inventory_watermark(default_setup, meta_table):
+    spec = MetaTableSpec(name=meta_table)
+
+    # fallback to inventory table without existing watermark
+    assert read_max_meta_id_from_inventory(meta_table=spec, job="j1") == 4
+    assert read_max_meta_id_from_inventory(meta_table=spec, job="j3") == 0
+
+    with sql.db.engine_inventory.begin() as conn:
+        update_watermark_in_inventory(meta_table=spec, job="j1",
+                                      id_expected=4, id_new=6, conn=conn)
+        update_watermark_in_inventory(meta_table=spec, job="j1",
+                                      id_expected=6, id_new=9, conn=conn)
+
+    assert read_max_meta_id_from_inventory(meta_table=spec, job="j1") == 9
+
+    with pytest.raises(ConcurrentChangeError):
+        with sql.db.engine_inventory.begin() as conn:
+            update_watermark_in_inventory(meta_table=spec, job="j1",
+                                          id_expected=4, id_new=7, conn=conn)
+
+    assert read_max_meta_id_from_inventory(meta_table=spec, job="j1") == 9
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1000])
+@pytest.mark.parametrize("weight, count, id_max", [
+    (None, None, None), (None, 3, None), (7, None, None), (25, 2, None),
+    (30, None, 7), (1000, None, None), (5, None, 8)
+])
+def test_read_next_batch_from_meta_equals_range_and_items(
+        default_setup, meta_table, monkeypatch, chunk_size, weight, count,
+        id_max):
+    monkeypatch.setattr(cfg.settings, "BOUNDARY_SEARCH_CHUNK_SIZE",
+                        chunk_size)
+    spec = MetaTableSpec(name=meta_table)
+
+    for id_inventory_max in range(9):
+        result = read_next_batch_from_meta(meta_table=spec,
+                                           job="j3",
+                                           id_max=id_max,
+                                           weight=weight,
+                                           count=count,
+                                           id_inventory_max=id_inventory_max)
+
+        expected = read_meta_id_range_from_meta(meta_table=spec,
+                                                id_min=id_inventory_max + 1,
+                                                id_max=id_max,
+                                                weight=weight,
+                                                count=count)
+
+        if id_max and id_inventory_max >= id_max:
+            assert result is None
+            assert expected is None
+            continue
+
+        items = read_items_via_id_range_from_meta(meta_table=spec,
+                                                  id_min=expected.id_min,
+                                                  id_max=expected.id_max)
+
+        assert result["id_range"] == expected
+        assert result["items"] == items
+        assert result["id_meta_max"] == 9
+        assert result["id_inventory_max"] == id_inventory_max
+
+
+def test_read_next_batch_from_meta_exhausted(default_setup, meta_table):
+    spec = MetaTableSpec(name=meta_table)
+    result = read_next_batch_from_meta(meta_table=spec,
+                                       job="j3",
+                                       id_inventory_max=9)
+
+    assert result is None
+
+
+def test_read_next_batch_from_meta_shared_database(shared_setup, meta_table):
+    spec = MetaTableSpec(name=meta_table)
+    result = read_next_batch_from_meta(meta_table=spec,
+                                       job="j1",
+                                       count=2,
+                                       with_items=False)
+
+    assert result["id_inventory_max"] == 4
+    assert result["id_range"].id_min == 5
+    assert result["id_range"].id_max == 6
+    assert result["items"] is None
+
+
+FILTERS = [("item", "not_in", ["f1", "f6", "f8"])]
+
+
+@pytest.mark.parametrize("weight, count, expected", [
+    (None, 3, (5, 9, 3, 42)),
+    (25, None, (5, 7, 2, 24)),
+    (25, 1, (5, 5, 1, 10)),
+])
+def test_meta_filters_are_pushed_into_meta_queries(default_setup, meta_table,
+                                                   weight, count, expected):
+    spec = MetaTableSpec(name=meta_table, filters=FILTERS)
+
+    id_range = read_meta_id_range_from_meta(meta_table=spec,
+                                            id_min=5,
+                                            weight=weight,
+                                            count=count)
+    result = read_next_batch_from_meta(meta_table=spec,
+                                       job="j1",
+                                       weight=weight,
+                                       count=count,
+                                       id_inventory_max=4)
+
+    values = (id_range.id_min, id_range.id_max, id_range.count,
+              id_range.weight)
+    assert values == expected
+    assert result["id_range"] == id_range
+
+    items = read_items_via_id_range_from_meta(meta_table=spec,
+                                              id_min=id_range.id_min,
+                                              id_max=id_range.id_max)
+    assert result["items"] == items
+    assert not set(items) & {"f1", "f6", "f8"}
+
+
+def test_read_columns_via_id_range_from_meta_dtypes(default_setup,
+                                                   meta_table):
+    spec = MetaTableSpec(name=meta_table)
+
+    columns = read_columns_via_id_range_from_meta(meta_table=spec,
+                                                  id_min=5,
+                                                  id_max=6,
+                                                  columns=["uid", "weight"])
+    assert columns["item"].dtype == object
+    assert columns["item"].tolist() == ["f5", "f6"]
+    assert columns["uid"].dtype == np.int64
+    assert columns["weight"].dtype == np.float64
+
+    # empty ranges provide typed arrays
+    columns = read_columns_via_id_range_from_meta(meta_table=spec,
+                                                  id_min=100,
+                                                  id_max=200,
+                                                  columns=["uid", "weight"])
+    assert [array.size for array in columns.values()] == [0, 0, 0]
+    assert [array.dtype for array in columns.values()] == \
+           [object, np.int64, np.float64]
+
+
+def test_meta_filters_min_max_and_single_item_fallback(default_setup,
+                                                       meta_table):
+    spec = MetaTableSpec(name=meta_table,
+                         filters=[("uid", "<", 8), ("weight", ">", 0)])
+
+    assert read_min_meta_id_from_meta(meta_table=spec) == 1
+    assert read_max_meta_id_from_meta(meta_table=spec) == 7
+
+    spec = MetaTableSpec(name=meta_table, filters=[("item", "!=", "f5")])
+    id_range = read_meta_id_range_from_meta(meta_table=spec,
+                                            id_min=5,
+                                            weight=5)
+
+    assert (id_range.id_min, id_range.id_max, id_range.count) == (6, 6, 1)
+
+
+def test_meta_filters_validation():
+    with pytest.raises(ValueError):
+        MetaTableSpec(name="meta", filters=[("item", "contains", "f")])
+
+    with pytest.raises(ValueError):
+        MetaTableSpec(name="meta",
+                      cumulative_weight_index=True,
+                      filters=[("item", "==", "f1")])
+
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_create_rows_in_inventory(default_setup, meta_table,
+                                  inventory_inspect, monkeypatch, returning):
+    engine = sql.db.engine_inventory
+    monkeypatch.setattr(
+        engine.dialect,
+        "insert_executemany_returning_sort_by_parameter_order",
+        returning
+    )
+
+    # same batch start of several jobs
+    values = [{"meta_table": meta_table,
+               "job": job,
+               "batch_id_start": 20,
+               "batch_id_end": end,
+               "batch_count": 1,
+               "config": {}}
+              for job, end in (("j8", 21), ("j9", 22), ("j8", 23))]
+
+    with engine.begin() as conn:
+        pks = create_rows_in_inventory(values=values, conn=conn)
+
+    assert len(set(pks)) == 3
+    assert [inventory_inspect(pk)["batch_id_end"] for pk in pks] == \
+           [21, 22, 23]
+
+
+def test_create_rows_in_plan_skips_concurrently_planned(default_setup,
+                                                        meta_table):
+    values = [{"meta_table": meta_table,
+               "job": "backfill",
+               "batch_id_start": start,
+               "batch_id_end": start + 1,
+               "batch_count": 2,
+               "batch_weight": 20}
+              for start in (1, 3, 5)]
+
+    assert create_rows_in_plan(values=values[1:2]) == 1
+    assert create_rows_in_plan(values=values) == 2
+    assert create_rows_in_plan(values=values) == 0
+
+    with pytest.raises(sa.exc.IntegrityError):
+        create_rows_in_plan(values=[{**values[0], "batch_id_start": 7,
+                                     "job": None}])
+
+
+def test_claim_row_in_plan_concurrently(default_setup, meta_table):
+    meta_table = MetaTableSpec(name=meta_table)
+    create_rows_in_plan(values=[{"meta_table": meta_table.name,
+                                 "job": "backfill",
+                                 "batch_id_start": 1,
+                                 "batch_id_end": 4,
+                                 "batch_count": 4,
+                                 "batch_weight": 20}])
+
+    with sql.db.engine_inventory.begin() as conn:
+        row = read_next_row_from_plan(meta_table=meta_table,
+                                      job="backfill",
+                                      conn=conn)
+        claim_row_in_plan(primary_key=row["id"], inventory_id=1, conn=conn)
+
+        with pytest.raises(ConcurrentChangeError):
+            claim_row_in_plan(primary_key=row["id"],
+                              inventory_id=2,
+                              conn=conn)
+
+        assert read_next_row_from_plan(meta_table=meta_table,
+                                       job="backfill",
+                                       conn=conn) is None
+
+
+def test_meta_id_range_fallback_respects_id_max(default_setup, meta_table):
+    spec = MetaTableSpec(name=meta_table)
+
+    # single item exceeding the weight within bounds
+    id_range = read_meta_id_range_from_meta(meta_table=spec, id_min=5,
+                                            id_max=6, weight=1)
+    assert (id_range.id_min, id_range.id_max) == (5, 5)
+
+    assert read_meta_id_range_from_meta(meta_table=spec, id_min=10,
+                                        weight=1) is None
+
+    filtered = MetaTableSpec(name=meta_table,
+                             filters=[("weight", ">", 14)])
+    assert read_meta_id_range_from_meta(meta_table=filtered, id_min=5,
+                                        id_max=7, weight=1) is None
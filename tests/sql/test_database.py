@@ -0,0 +1,122 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.pool import SingletonThreadPool
+
+from pybatchintory import configure, config as cfg, sql, acquire_batch
+from pybatchintory.sql import database
+from pybatchintory.sql.database import get_engine_inventory, get_engine_meta
+from pybatchintory.sql.testing import recreate_meta_table
+
+from .. import test_data
+
+BACKEND_TABLES = {"inventory", "inventory_watermark", "inventory_archive",
+                  "inventory_plan", "inventory_cumulative_weight"}
+
+
+@pytest.fixture
+def restore_configuration(monkeypatch):
+    """Configuring pybatchintory modifies global state which is restored
+    after the test.
+
+    """
+
+    monkeypatch.setattr(cfg, "settings", cfg.settings)
+    monkeypatch.setattr(sql, "db", sql.db)
+    yield
+    sql.dispose_engines()
+
+
+def test_engine_registry_shares_engine_for_identical_urls(
+        restore_configuration, conn_inventory):
+    configure(settings=dict(INVENTORY_CONN=conn_inventory,
+                            META_CONN=conn_inventory))
+
+    assert get_engine_inventory() is get_engine_meta()
+    assert sql.db.is_shared
+
+
+def test_engine_registry_separates_engines_for_different_urls(
+        restore_configuration, conn_inventory, conn_meta):
+    configure(settings=dict(INVENTORY_CONN=conn_inventory,
+                            META_CONN=conn_meta))
+
+    assert get_engine_inventory() is not get_engine_meta()
+    assert not sql.db.is_shared
+
+    with sql.db.begin_shared() as conn:
+        assert conn is None
+
+
+def test_engine_registry_pool_settings(restore_configuration, conn_inventory):
+    configure(settings=dict(INVENTORY_CONN=conn_inventory,
+                            POOL_SIZE=3,
+                            POOL_MAX_OVERFLOW=2,
+                            POOL_PRE_PING=True,
+                            POOL_RECYCLE=60))
+
+    pool = sql.db.engine_inventory.pool
+    assert pool.size() == 3
+    assert pool._max_overflow == 2
+    assert pool._pre_ping
+    assert pool._recycle == 60
+
+
+def test_engine_registry_new_engine_for_changed_pool_settings(
+        restore_configuration, conn_inventory):
+    configure(settings=dict(INVENTORY_CONN=conn_inventory, POOL_SIZE=3))
+    engine = get_engine_inventory()
+
+    configure(settings=dict(INVENTORY_CONN=conn_inventory, POOL_SIZE=4))
+    assert get_engine_inventory() is not engine
+    assert get_engine_inventory().pool.size() == 4
+
+
+def test_engine_registry_pool_sizing_for_singleton_pool(
+        restore_configuration):
+    configure(settings=dict(INVENTORY_CONN="sqlite://",
+                            POOL_SIZE=3,
+                            POOL_MAX_OVERFLOW=2,
+                            POOL_RECYCLE=60))
+
+    pool = get_engine_inventory().pool
+    assert isinstance(pool, SingletonThreadPool)
+    assert pool._recycle == 60
+
+
+def test_engine_registry_disposes_stale_engines(restore_configuration,
+                                                conn_inventory):
+    configure(settings=dict(INVENTORY_CONN=conn_inventory, POOL_SIZE=3))
+    engine = get_engine_inventory()
+    with engine.connect():
+        pass
+    assert engine.pool.checkedin() == 1
+
+    configure(settings=dict(INVENTORY_CONN=conn_inventory, POOL_SIZE=4))
+    assert engine not in database._ENGINES.values()
+    assert engine.pool.checkedin() == 0
+
+
+def test_lazy_initialization_creates_backend_tables(restore_configuration,
+                                                    conn_inventory):
+    configure(settings=dict(INVENTORY_CONN=conn_inventory))
+    engine = sql.db.engine_inventory
+    assert BACKEND_TABLES <= set(sa.inspect(engine).get_table_names())
+
+    table = recreate_meta_table(engine=engine, name="meta", schema=None)
+    with engine.begin() as conn:
+        conn.execute(sa.insert(table), test_data.META)
+
+    batch = acquire_batch(meta_table_name="meta", job="j1", batch_count=2)
+    batch.succeeded()
+
+    stmt = sa.select(sql.db.table_watermark.c.batch_id_end)
+    with engine.connect() as conn:
+        assert conn.execute(stmt).scalar() == batch.id_range.id_max
+
+
+def test_lazy_initialization_without_backend_tables(restore_configuration,
+                                                    conn_inventory):
+    configure(settings=dict(INVENTORY_CONN=conn_inventory,
+                            CREATE_BACKEND_TABLES=False))
+    engine = sql.db.engine_inventory
+    assert not BACKEND_TABLES & set(sa.inspect(engine).get_table_names())
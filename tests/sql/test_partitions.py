@@ -0,0 +1,47 @@
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql import partitions
+from pybatchintory.sql.partitions import prune_partitions, \
+    read_partition_bounds, load_partitioned_meta_table
+
+
+def test_prune_partitions():
+    bounds = [(0, 3), (None, None), (4, 6), (7, 9)]
+
+    assert prune_partitions(bounds) == [0, 2, 3]
+    assert prune_partitions(bounds, id_min=4) == [2, 3]
+    assert prune_partitions(bounds, id_min=2, id_max=4) == [0, 2]
+    assert prune_partitions(bounds, id_max=-1) == [3]
+
+    # last partition may still grow
+    assert prune_partitions(bounds, id_min=100) == [3]
+
+
+def test_read_partition_bounds(meta_partitions, engine_meta,
+                               statement_counter, monkeypatch):
+    monkeypatch.setattr(partitions, "_PARTITION_BOUNDS", {})
+    meta_table = MetaTableSpec(name="months", partitions=meta_partitions)
+
+    assert read_partition_bounds(meta_table) == [(0, 3), (4, 6), (7, 9)]
+
+    # bounds are cached
+    statements = statement_counter(engine_meta)
+    assert read_partition_bounds(meta_table) == [(0, 3), (4, 6), (7, 9)]
+    assert not statements
+
+    # declared bounds take precedence
+    declared = MetaTableSpec(name="months", partitions=[
+        {"name": meta_partitions[0], "id_min": 0, "id_max": 2},
+        *meta_partitions[1:]
+    ])
+    assert read_partition_bounds(declared)[0] == (0, 2)
+
+
+def test_load_partitioned_meta_table(meta_partitions):
+    meta_table = MetaTableSpec(name="months", partitions=meta_partitions)
+
+    single = load_partitioned_meta_table(meta_table, id_min=8)
+    assert single.name == meta_partitions[2].split(".")[-1]
+
+    union = load_partitioned_meta_table(meta_table, id_min=5)
+    assert union is load_partitioned_meta_table(meta_table, id_min=6)
+    assert list(union.c.keys()) == list(single.c.keys())
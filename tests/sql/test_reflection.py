@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+import sqlalchemy as sa
+
+from pybatchintory import config as cfg
+from pybatchintory.main import acquire_batch
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql import reflection
+from pybatchintory.sql.reflection import autoload_meta_table, \
+    invalidate_schema_cache, load_meta_table
+
+
+@pytest.fixture
+def schema_cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path.joinpath("schema_cache")
+    monkeypatch.setattr(cfg.settings, "SCHEMA_CACHE_DIR", str(cache_dir))
+    invalidate_schema_cache()
+    yield cache_dir
+    invalidate_schema_cache()
+
+
+def test_schema_cache_skips_reflection(default_setup, meta_table,
+                                       schema_cache_dir, engine_meta,
+                                       statement_counter):
+    table = autoload_meta_table(meta_table)
+    assert len(os.listdir(schema_cache_dir)) == 1
+
+    # simulate new process
+    reflection._META_TABLES.clear()
+    statements = statement_counter(engine_meta)
+    cached = autoload_meta_table(meta_table)
+
+    # only the schema fingerprint is read
+    assert len(statements) == 1
+    assert "PRAGMA" not in statements[0]
+    assert [col.name for col in cached.columns] == \
+           [col.name for col in table.columns]
+    assert [type(col.type) for col in cached.columns] == \
+           [type(col.type.as_generic()) for col in table.columns]
+
+
+def test_schema_cache_is_json(default_setup, meta_table, schema_cache_dir):
+    autoload_meta_table(meta_table)
+    path, = schema_cache_dir.iterdir()
+
+    cached = json.loads(path.read_text())
+    assert [col["name"] for col in cached["columns"]] == \
+           ["uid", "item", "weight"]
+
+
+def test_schema_cache_detects_schema_change(default_setup, meta_table,
+                                            schema_cache_dir, engine_meta):
+    autoload_meta_table(meta_table)
+
+    with engine_meta.begin() as conn:
+        conn.execute(sa.text(f"ALTER TABLE {meta_table} "
+                             f"ADD COLUMN size INTEGER"))
+
+    # simulate new process
+    reflection._META_TABLES.clear()
+    table = autoload_meta_table(meta_table)
+
+    assert "size" in table.c
+
+
+def test_schema_cache_expires(default_setup, meta_table, schema_cache_dir,
+                              engine_meta, statement_counter, monkeypatch):
+    autoload_meta_table(meta_table)
+    path, = schema_cache_dir.iterdir()
+    os.utime(path, (0, 0))
+
+    monkeypatch.setattr(cfg.settings, "SCHEMA_CACHE_TTL", 60)
+    reflection._META_TABLES.clear()
+    statements = statement_counter(engine_meta)
+    autoload_meta_table(meta_table)
+
+    assert statements
+
+
+def test_schema_cache_invalidate(default_setup, meta_table, schema_cache_dir):
+    autoload_meta_table(meta_table)
+    invalidate_schema_cache(meta_table)
+
+    assert list(schema_cache_dir.iterdir()) == []
+    assert meta_table not in reflection._META_TABLES
+
+
+def test_declared_col_types_skip_reflection(default_setup, meta_table,
+                                            monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("Meta table must not be reflected.")
+
+    monkeypatch.setattr(reflection, "autoload_meta_table", fail)
+
+    col_types = {"uid": "BigInteger", "item": "String", "weight": "Float"}
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=2,
+                          meta_table_col_types=col_types)
+
+    assert batch.items == ["f5", "f6"]
+
+    table = load_meta_table(MetaTableSpec(name=meta_table,
+                                          col_types=col_types))
+    assert set(table.c.keys()) == {"uid", "item", "weight"}
+
+
+def test_declared_col_types_validation():
+    with pytest.raises(ValueError):
+        MetaTableSpec(name="meta", col_types={"uid": "NoType"})
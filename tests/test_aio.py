@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+from pybatchintory import sql
+
+pytest.importorskip("greenlet")
+
+from pybatchintory.aio import acquire_batch_async
+
+
+@pytest.fixture
+def schema():
+    """Attached in-memory schemas of sqlite are bound to a single connection
+    and hence are invisible to async engines.
+
+    """
+
+    return None
+
+
+@pytest.fixture
+def async_setup(default_setup, conn_inventory, conn_meta):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    drivers = {"sqlite": "sqlite+aiosqlite",
+               "postgresql": "postgresql+asyncpg"}
+    pytest.importorskip("aiosqlite" if conn_inventory.startswith("sqlite")
+                        else "asyncpg")
+
+    def to_async(url: str) -> str:
+        scheme, rest = url.split("://", 1)
+        return f"{drivers[scheme.split('+')[0]]}://{rest}"
+
+    engine_inventory_async = create_async_engine(to_async(conn_inventory))
+    engine_meta_async = create_async_engine(to_async(conn_meta))
+
+    sql.db = sql.initialize(engine_inventory=sql.db.engine_inventory,
+                            engine_meta=sql.db.engine_meta,
+                            engine_inventory_async=engine_inventory_async,
+                            engine_meta_async=engine_meta_async)
+
+    yield
+
+    asyncio.run(engine_inventory_async.dispose())
+    asyncio.run(engine_meta_async.dispose())
+
+
+def test_acquire_batch_async(async_setup, inventory_inspect, meta_table):
+    async def run():
+        batch = await acquire_batch_async(meta_table_name=meta_table,
+                                          job="j1",
+                                          batch_count=3)
+        await batch.succeeded_async(result={"Foo": "Bar"})
+        return batch
+
+    batch = asyncio.run(run())
+
+    assert batch.id_range.id_min == 5
+    assert batch.id_range.id_max == 7
+    assert batch.items == ["f5", "f6", "f7"]
+
+    row = inventory_inspect(primary_key=batch.pk)
+    assert row["status"] == "succeeded"
+    assert row["job_result_item"] == {"Foo": "Bar"}
+
+
+def test_acquire_batch_async_lease_heartbeat(async_setup,
+                                             inventory_inspect,
+                                             meta_table):
+    async def run():
+        batch = await acquire_batch_async(meta_table_name=meta_table,
+                                          job="j1",
+                                          batch_count=3,
+                                          lease_ttl=0.3,
+                                          lazy=True)
+
+        expires = inventory_inspect(primary_key=batch.pk)["lease_expires"]
+        await asyncio.sleep(0.5)
+        extended = inventory_inspect(primary_key=batch.pk)["lease_expires"]
+
+        # lazily loaded items use the synchronous meta engine
+        assert batch.items == ["f5", "f6", "f7"]
+
+        await batch.succeeded_async()
+        return batch, expires, extended
+
+    batch, expires, extended = asyncio.run(run())
+
+    assert extended > expires
+    assert not batch._heartbeat.is_alive()
+    assert not batch._heartbeat.lost
+
+    row = inventory_inspect(primary_key=batch.pk)
+    assert row["status"] == "succeeded"
+    assert row["lease_expires"] is None
+
+
+def test_acquire_batch_async_concurrent_workers(async_setup, meta_table):
+    async def run():
+        return await asyncio.gather(*[
+            acquire_batch_async(meta_table_name=meta_table,
+                                job="j1",
+                                batch_count=2,
+                                lazy=True)
+            for _ in range(3)
+        ])
+
+    batches = asyncio.run(run())
+    ranges = sorted((batch.id_range.id_min, batch.id_range.id_max)
+                    for batch in batches)
+
+    assert ranges == [(5, 6), (7, 8), (9, 9)]
+
+
+def test_acquire_batch_async_without_async_engine(default_setup, meta_table):
+    with pytest.raises(ValueError):
+        asyncio.run(acquire_batch_async(meta_table_name=meta_table, job="j1"))
+
+
+def test_acquire_batch_async_fill_gaps(async_setup, meta_table):
+    async def run():
+        failed = await acquire_batch_async(meta_table_name=meta_table,
+                                           job="j1",
+                                           batch_count=2,
+                                           lazy=True)
+        await failed.failed_async()
+        await acquire_batch_async(meta_table_name=meta_table,
+                                  job="j1",
+                                  batch_count=1,
+                                  lazy=True)
+
+        return await asyncio.gather(*[
+            acquire_batch_async(meta_table_name=meta_table,
+                                job="j1",
+                                batch_count=1,
+                                fill_gaps=True)
+            for _ in range(3)
+        ])
+
+    batches = asyncio.run(run())
+    ranges = sorted((batch.id_range.id_min, batch.id_range.id_max)
+                    for batch in batches if batch)
+
+    assert ranges == [(5, 5), (6, 6)]
+    assert sorted(batch.items for batch in batches if batch) == \
+           [["f5"], ["f6"]]
@@ -0,0 +1,247 @@
+import time
+
+import pytest
+import sqlalchemy as sa
+
+from pybatchintory import config as cfg, sql
+from pybatchintory.batch import Batch
+from pybatchintory.exceptions import ConcurrentChangeError, LeaseLostError
+from pybatchintory.main import acquire_batch
+from pybatchintory.sql import crud
+
+
+@pytest.fixture
+def racing_worker(meta_table, monkeypatch):
+    """Simulate a concurrent worker of the same job which acquires a batch
+    right after the first range computation of the tested worker.
+
+    """
+
+    monkeypatch.setattr(cfg.settings, "CONCURRENT_RETRY_BACKOFF", 0)
+
+    original = crud.read_next_batch_from_meta
+    concurrent = []
+
+    def racing(**kwargs):
+        if not concurrent:
+            concurrent.append(None)
+            concurrent.append(acquire_batch(meta_table_name=meta_table,
+                                            job="j1",
+                                            batch_count=2))
+        return original(**kwargs)
+
+    monkeypatch.setattr(crud, "read_next_batch_from_meta", racing)
+    return concurrent
+
+
+def read_job_ranges(engine_inventory, job):
+    t_inventory = sql.db.table_inventory
+    stmt = (sa.select(t_inventory.c.batch_id_start,
+                      t_inventory.c.batch_id_end)
+            .where(t_inventory.c.job == job)
+            .order_by(t_inventory.c.batch_id_start))
+
+    with engine_inventory.begin() as conn:
+        return [tuple(row) for row in conn.execute(stmt)]
+
+
+def test_acquire_batch_retries_on_concurrent_change(default_setup,
+                                                    meta_table,
+                                                    racing_worker,
+                                                    engine_inventory):
+    batch = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+
+    assert racing_worker[1].id_range.id_min == 5
+    assert racing_worker[1].id_range.id_max == 6
+    assert batch.id_range.id_min == 7
+    assert batch.id_range.id_max == 8
+    assert read_job_ranges(engine_inventory, "j1") == [(0, 4), (5, 6), (7, 8)]
+
+
+def test_acquire_batch_with_stale_watermark_is_rolled_back(default_setup,
+                                                           meta_table,
+                                                           engine_inventory):
+    batch = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+    stale = Batch(batch_cfg=batch.batch_cfg, id_range=batch.id_range)
+
+    with pytest.raises(ConcurrentChangeError):
+        stale.acquire()
+
+    assert stale.pk is None
+    assert read_job_ranges(engine_inventory, "j1") == [(0, 4), (5, 6)]
+
+
+def test_acquire_batch_retries_exhausted(default_setup,
+                                         meta_table,
+                                         racing_worker,
+                                         monkeypatch):
+    monkeypatch.setattr(cfg.settings, "CONCURRENT_RETRIES", 0)
+
+    with pytest.raises(ConcurrentChangeError):
+        acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+
+
+def test_fill_gaps_rejects_overlapping_batches(default_setup,
+                                            meta_table,
+                                            engine_inventory,
+                                            monkeypatch):
+    monkeypatch.setattr(cfg.settings, "CONCURRENT_RETRY_BACKOFF", 0)
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2).failed()
+
+    original = crud.read_meta_id_range_from_meta
+    concurrent = []
+
+    def racing(**kwargs):
+        if not concurrent:
+            concurrent.append(None)
+            concurrent.append(acquire_batch(meta_table_name=meta_table,
+                                            job="j1",
+                                            fill_gaps=True))
+        return original(**kwargs)
+
+    monkeypatch.setattr(crud, "read_meta_id_range_from_meta", racing)
+
+    batch = acquire_batch(meta_table_name=meta_table, job="j1", fill_gaps=True)
+
+    assert batch is None
+    assert concurrent[1].pk == 4
+    assert read_job_ranges(engine_inventory, "j1") == [(0, 4), (5, 6), (5, 6)]
+
+
+def expire_lease(engine_inventory, primary_key):
+    t_inventory = sql.db.table_inventory
+    stmt = (sa.update(t_inventory)
+            .where(t_inventory.c.id == primary_key)
+            .values(lease_expires=crud.lease_expiry(-1)))
+
+    with engine_inventory.begin() as conn:
+        conn.execute(stmt)
+
+
+def test_acquire_batch_lease_heartbeat(default_setup,
+                                       meta_table,
+                                       inventory_inspect):
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          lease_ttl=0.3)
+
+    expires = inventory_inspect(primary_key=batch.pk)["lease_expires"]
+    assert expires > crud.lease_expiry(0)
+    assert batch._heartbeat.is_alive()
+
+    time.sleep(0.5)
+    assert inventory_inspect(primary_key=batch.pk)["lease_expires"] > expires
+
+    batch.succeeded()
+    assert not batch._heartbeat.is_alive()
+    assert inventory_inspect(primary_key=batch.pk)["status"] == "succeeded"
+
+
+def test_acquire_batch_reclaims_expired_lease(default_setup,
+                                              meta_table,
+                                              inventory_inspect,
+                                              engine_inventory):
+    crashed = acquire_batch(meta_table_name=meta_table,
+                            job="j1",
+                            batch_count=2,
+                            lease_ttl=60)
+
+    # simulate killed worker
+    crashed._heartbeat.stop()
+    expire_lease(engine_inventory, crashed.pk)
+
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=2,
+                          lease_ttl=60)
+
+    assert batch.pk == crashed.pk
+    assert batch.attempt == 2
+    assert batch.items == ["f5", "f6"]
+    assert inventory_inspect(primary_key=batch.pk)["attempt"] == 2
+
+    # former worker must not release the reclaimed batch
+    with pytest.raises(LeaseLostError):
+        crashed.succeeded()
+
+    batch.succeeded()
+    assert inventory_inspect(primary_key=batch.pk)["status"] == "succeeded"
+
+    # leases of other workers are not reclaimed
+    running = acquire_batch(meta_table_name=meta_table,
+                            job="j1",
+                            batch_count=2,
+                            lease_ttl=60)
+    assert running.pk != batch.pk
+    running.succeeded()
+
+
+def test_batch_process_single_shard(default_setup, meta_table,
+                                    inventory_inspect):
+    batch = acquire_batch(meta_table_name=meta_table, job="j1")
+    results = batch.process(lambda items, prefix: prefix + ",".join(items),
+                            args=("items:",))
+
+    assert results == ["items:f5,f6,f7,f8,f9"]
+
+    row = inventory_inspect(primary_key=batch.pk)
+    assert row["status"] == "succeeded"
+    assert row["job_result_item"] == {"results": results}
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_batch_process_weight_balanced_shards(default_setup, meta_table,
+                                              executor):
+    batch = acquire_batch(meta_table_name=meta_table, job="j1")
+    results = batch.process(sorted, shards=2, executor=executor)
+
+    assert results == [["f5", "f6", "f9"], ["f7", "f8"]]
+    assert batch.success is True
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_batch_process_shards_inventory_source(default_setup, meta_table,
+                                               lazy):
+    for value in range(2):
+        acquire_batch(meta_table_name=meta_table, job="j1", batch_count=1) \
+            .succeeded(result={"n": value})
+
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="s2",
+                          upstream_job="j1",
+                          lazy=lazy)
+    received = []
+    batch.process(received.extend, shards=2)
+
+    assert {"n": 0} in received
+    assert sorted(received, key=str) == sorted(batch.items, key=str)
+
+
+def test_batch_process_failed(default_setup, meta_table, inventory_inspect):
+    def fail(items):
+        raise ValueError("FooBar")
+
+    batch = acquire_batch(meta_table_name=meta_table, job="j1")
+    with pytest.raises(ValueError):
+        batch.process(fail, shards=3)
+
+    row = inventory_inspect(primary_key=batch.pk)
+    assert row["status"] == "failed"
+    assert row["logging"] == "FooBar"
+
+
+def test_inventory_table_without_lease_column(default_setup, meta_table,
+                                              engine_inventory):
+    name = sql.db.table_inventory.fullname
+    with engine_inventory.begin() as conn:
+        conn.execute(sa.text(f"ALTER TABLE {name} DROP COLUMN lease_expires"))
+
+    batch = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=1)
+    batch.failed()
+
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          max_attempts=2,
+                          lazy=True)
+    assert batch.attempt == 2
+    batch.succeeded()
@@ -0,0 +1,19 @@
+from benchmarks.acquisition import run
+from pybatchintory import config as cfg, sql
+
+
+def test_benchmarks_smoke(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "settings", cfg.settings)
+    monkeypatch.setattr(sql, "db", sql.db)
+
+    results = run(meta_rows=500,
+                  inventory_rows=20,
+                  batch_count=10,
+                  repeat=2,
+                  directory=str(tmp_path))
+
+    assert "acquire_batch[incremental,weight]" in results
+    for values in results.values():
+        assert values["queries"] >= 1
+        assert values["latency_median_ms"] > 0
+        assert values["peak_memory_kib"] > 0
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+
+import pytest
+
+from pybatchintory import configure, config as cfg, sql
+
+
+def test_import_is_side_effect_free():
+    code = ("import sys\n"
+            "import pybatchintory\n"
+            "from pybatchintory import config, sql\n"
+            "import pybatchintory.config._settings\n"
+            "assert 'settings' not in vars(config)\n"
+            "assert 'db' not in vars(sql)\n"
+            "assert 'numpy' not in sys.modules\n")
+
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_configure_initializes_engines_lazily(monkeypatch, conn_inventory):
+    monkeypatch.setattr(cfg, "settings", cfg.settings)
+    monkeypatch.setattr(sql, "db", sql.db)
+
+    configure(settings=dict(INVENTORY_CONN=conn_inventory))
+
+    assert "db" not in vars(sql)
+    assert sql.db.engine_inventory.url.render_as_string() == conn_inventory
+
+
+def test_configure_async_requires_sync_connections(monkeypatch,
+                                                   conn_inventory):
+    monkeypatch.setattr(cfg, "settings", cfg.settings)
+    monkeypatch.setattr(sql, "db", sql.db)
+
+    url_async = conn_inventory.replace("sqlite", "sqlite+aiosqlite")
+
+    with pytest.raises(ValueError, match="INVENTORY_CONN"):
+        configure(settings=dict(INVENTORY_ASYNC_CONN=url_async))
+
+    with pytest.raises(ValueError, match="META_CONN"):
+        configure(settings=dict(INVENTORY_CONN=conn_inventory,
+                                INVENTORY_ASYNC_CONN=url_async,
+                                META_ASYNC_CONN=url_async))
+
+    configure(settings=dict(INVENTORY_CONN=conn_inventory,
+                            INVENTORY_ASYNC_CONN=url_async))
+    assert sql.db.engine_inventory.url.render_as_string() == conn_inventory
+
+
+def test_former_settings_module_path():
+    code = ("from pybatchintory import config\n"
+            "from pybatchintory.config.settings import Settings\n"
+            "assert Settings is config.Settings\n"
+            "assert 'settings' not in vars(config)\n"
+            "assert isinstance(config.settings, Settings)\n")
+
+    subprocess.run([sys.executable, "-c", code], check=True)
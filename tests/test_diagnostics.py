@@ -0,0 +1,43 @@
+import sqlalchemy as sa
+
+from pybatchintory.diagnostics import explain_batch_queries, has_uid_index
+from pybatchintory.models import MetaTableSpec
+
+
+def test_explain_batch_queries(default_setup, meta_table):
+    diagnostics = explain_batch_queries(job="j1",
+                                        meta_table_name=meta_table,
+                                        batch_count=2)
+
+    assert set(diagnostics) == {"inventory_max", "next_batch", "items"}
+    for query in diagnostics.values():
+        assert query.plan
+        assert query.warnings == []
+
+    assert "LIMIT 2" in diagnostics["next_batch"].sql
+    assert "uid >= 5" in diagnostics["items"].sql
+
+
+def test_explain_batch_queries_missing_uid_index(default_setup, schema,
+                                                 engine_meta):
+    table = sa.Table("test_meta_unindexed",
+                     sa.MetaData(),
+                     sa.Column("uid", sa.Integer),
+                     sa.Column("item", sa.String),
+                     sa.Column("weight", sa.Float),
+                     schema=schema)
+    table.create(engine_meta)
+    with engine_meta.begin() as conn:
+        conn.execute(sa.insert(table),
+                     [{"uid": x, "item": f"f{x}", "weight": x}
+                      for x in range(10)])
+
+    name = f"{schema}.{table.name}" if schema else table.name
+    diagnostics = explain_batch_queries(job="j1", meta_table_name=name)
+
+    assert not has_uid_index(MetaTableSpec(name=name))
+    next_batch = diagnostics["next_batch"]
+    assert "no index on uid column" in next_batch.warnings[0]
+    assert "no index on uid column" in diagnostics["items"].warnings[0]
+    assert any("Sequential scan" in warning
+               for warning in next_batch.warnings)
@@ -0,0 +1,101 @@
+import pytest
+
+from pybatchintory import instrumentation
+from pybatchintory.instrumentation import MetricsRegistry, Measurement, \
+    OpenTelemetryEmitter
+from pybatchintory.main import acquire_batch
+
+
+@pytest.fixture
+def measurements():
+    recorded = []
+    instrumentation.metrics.reset()
+    instrumentation.metrics.register_callback(recorded.append)
+    yield recorded
+    instrumentation.metrics.unregister_callback(recorded.append)
+
+
+def test_crud_operations_are_measured(default_setup, meta_table,
+                                      measurements):
+    acquire_batch(meta_table_name=meta_table, job="j1")
+
+    by_name = {m.name: m for m in measurements}
+    fused = by_name["read_next_batch_from_meta"]
+    assert fused.queries >= 1
+    assert fused.rows == 5
+    assert fused.duration > 0
+    assert fused.error is None
+
+    stats = instrumentation.metrics.snapshot()
+    assert stats["read_next_batch_from_meta"].calls == 1
+    assert stats["read_next_batch_from_meta"].rows == 5
+
+
+def test_items_per_second_after_release(default_setup, meta_table,
+                                        measurements):
+    batch = acquire_batch(meta_table_name=meta_table, job="j1")
+    assert batch.items_per_second is None
+
+    batch.release(success=True)
+
+    measurement, = [m for m in measurements if m.name == "batch"]
+    assert measurement.rows == 5
+    assert measurement.attributes["success"] is True
+    assert batch.items_per_second == \
+           measurement.attributes["items_per_second"]
+    assert batch.items_per_second > 0
+
+
+def test_registry_records_errors_and_isolates_callbacks():
+    registry = MetricsRegistry()
+
+    def failing(measurement):
+        raise RuntimeError("broken")
+
+    registry.register_callback(failing)
+    registry.record(Measurement(name="op", start=0, duration=2, queries=1))
+    registry.record(Measurement(name="op", start=0, duration=1, error="e"))
+
+    stats = registry.snapshot()["op"]
+    assert stats.calls == 2
+    assert stats.errors == 1
+    assert stats.duration == 3
+    assert stats.duration_max == 2
+    assert stats.queries == 1
+
+
+def test_instrument_records_errors(measurements):
+    @instrumentation.instrument
+    def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        broken()
+
+    measurement, = measurements
+    assert measurement.name == "broken"
+    assert "boom" in measurement.error
+
+
+def test_open_telemetry_emitter(default_setup, meta_table):
+    sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+    export = pytest.importorskip("opentelemetry.sdk.trace.export")
+    in_memory = pytest.importorskip(
+        "opentelemetry.sdk.trace.export.in_memory_span_exporter")
+
+    exporter = in_memory.InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(export.SimpleSpanProcessor(exporter))
+
+    emitter = OpenTelemetryEmitter(tracer_provider=provider)
+    instrumentation.metrics.register_callback(emitter)
+    try:
+        acquire_batch(meta_table_name=meta_table, job="j1")
+    finally:
+        instrumentation.metrics.unregister_callback(emitter)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    span = spans["pybatchintory.read_next_batch_from_meta"]
+    assert span.attributes["pybatchintory.rows"] == 5
+    assert span.attributes["pybatchintory.queries"] >= 1
+    assert span.end_time >= span.start_time
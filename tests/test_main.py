@@ -1,4 +1,15 @@
-from pybatchintory.main import acquire_batch
+import datetime
+
+import pytest
+import sqlalchemy as sa
+
+from pybatchintory import sql, config as cfg
+from pybatchintory.models import MetaTableSpec
+from pybatchintory.sql import crud
+
+from pybatchintory.main import acquire_batch, acquire_batches, \
+    read_uncovered_ranges, compact_inventory, plan_backfill, \
+    acquire_planned_batch, read_plan_progress
 from .conftest import META_TABLE_NAME_SCHEMA as META_TABLE
 
 
@@ -74,3 +85,649 @@ def test_acquire_batch_failed(default_setup,
     assert row["processing_end"] is not None
     assert row["logging"] == "FooBar"
     assert row["job_result_item"] == {"Foo": "Bar"}
+
+
+def test_acquire_batch_cumulative_weight_index(default_setup,
+                                               cumulative_weight_table,
+                                               meta_table):
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_weight=25,
+                          use_cumulative_weight_index=True)
+
+    assert batch.id_range.id_min == 5
+    assert batch.id_range.id_max == 6
+    assert batch.id_range.count == 2
+    assert batch.id_range.weight == 22
+    assert batch.items == ["f5", "f6"]
+
+
+def test_acquire_batches(default_setup, inventory_inspect, meta_table):
+    batches = acquire_batches(meta_table_name=meta_table,
+                              job="j1",
+                              batch_weight=25,
+                              iterations=3)
+
+    ranges = [(batch.id_range.id_min, batch.id_range.id_max)
+              for batch in batches]
+    assert ranges == [(5, 6), (7, 7), (8, 8)]
+    assert [batch.pk for batch in batches] == [3, 4, 5]
+    assert [batch._items for batch in batches] == [None, None, None]
+    assert batches[1].items == ["f7"]
+
+    row = inventory_inspect(primary_key=5)
+    assert row["batch_id_start"] == 8
+    assert row["batch_id_end"] == 8
+    assert row["status"] == "running"
+    assert row["config"]["id_inventory_max"] == 7
+
+    batches[0].succeeded()
+    assert inventory_inspect(primary_key=3)["status"] == "succeeded"
+
+
+def test_acquire_batches_exhausted(default_setup, meta_table):
+    batches = acquire_batches(meta_table_name=meta_table,
+                              job="j1",
+                              batch_count=2,
+                              iterations=5)
+
+    ranges = [(batch.id_range.id_min, batch.id_range.id_max)
+              for batch in batches]
+    assert ranges == [(5, 6), (7, 8), (9, 9)]
+
+    assert acquire_batches(meta_table_name=meta_table,
+                           job="j1",
+                           batch_count=2,
+                           iterations=5) == []
+
+
+def test_acquire_batch_lazy_iter_items(default_setup, meta_table):
+    batch = acquire_batch(meta_table_name=meta_table, job="j1", lazy=True)
+
+    assert batch.pk == 3
+    assert batch._items is None
+    assert list(batch.iter_items(chunk_size=2)) == [f"f{x}"
+                                                    for x in range(5, 10)]
+    assert batch._items is None
+    assert batch.items == [f"f{x}" for x in range(5, 10)]
+    assert list(batch.iter_items()) == batch.items
+
+
+def test_acquire_batch_columns(default_setup, meta_table):
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=3,
+                          columns=["uid", "weight"])
+
+    assert list(batch.columns) == ["item", "uid", "weight"]
+    assert batch.columns["uid"].tolist() == [5, 6, 7]
+    assert batch.columns["weight"].tolist() == [10, 12, 14]
+    assert batch.items == ["f5", "f6", "f7"]
+
+
+def test_acquire_batch_to_arrow(default_setup, meta_table):
+    pa = pytest.importorskip("pyarrow")
+
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=2,
+                          columns=["weight"])
+
+    table = batch.to_arrow()
+    assert isinstance(table, pa.Table)
+    assert table.column_names == ["item", "weight"]
+    assert table.num_rows == 2
+
+
+def test_acquire_batch_reclaims_failed(default_setup, inventory_inspect,
+                                       meta_table):
+    batch = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+    batch.failed(error=ValueError("Foo"))
+
+    reclaimed = acquire_batch(meta_table_name=meta_table,
+                              job="j1",
+                              batch_count=2,
+                              max_attempts=2)
+
+    assert reclaimed.pk == batch.pk == 3
+    assert reclaimed.id_range == batch.id_range
+    assert reclaimed.items == ["f5", "f6"]
+
+    row = inventory_inspect(primary_key=3)
+    assert row["status"] == "running"
+    assert row["attempt"] == 2
+    assert row["processing_end"] is None
+
+    # attempts are exhausted, hence new data is acquired
+    reclaimed.failed()
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=2,
+                          max_attempts=2)
+
+    assert batch.pk == 4
+    assert batch.id_range.id_min == 7
+    assert inventory_inspect(primary_key=3)["status"] == "failed"
+
+
+def test_read_uncovered_ranges_and_fill_gaps(default_setup, meta_table):
+    failed = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+    failed.failed()
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2) \
+        .succeeded()
+
+    assert read_uncovered_ranges(job="j1", meta_table_name=meta_table) == \
+           [(5, 6), (9, 9)]
+    assert read_uncovered_ranges(job="j1",
+                                 meta_table_name=meta_table,
+                                 statuses=("succeeded", "failed")) == [(9, 9)]
+    assert read_uncovered_ranges(job="j3",
+                                 meta_table_name=meta_table,
+                                 batch_id_min=2,
+                                 batch_id_max=7) == [(2, 7)]
+
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=1,
+                          fill_gaps=True)
+    assert (batch.id_range.id_min, batch.id_range.id_max) == (5, 5)
+    assert batch.items == ["f5"]
+    assert read_uncovered_ranges(job="j1", meta_table_name=meta_table) == \
+           [(6, 6), (9, 9)]
+
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=5,
+                          fill_gaps=True)
+    assert (batch.id_range.id_min, batch.id_range.id_max) == (6, 6)
+
+    # ids above the watermark are not considered as gaps
+    assert acquire_batch(meta_table_name=meta_table,
+                         job="j1",
+                         fill_gaps=True) is None
+
+
+def test_read_uncovered_ranges_renamed_columns(default_setup, schema,
+                                               engine_meta):
+    table = sa.Table("test_meta_renamed",
+                     sa.MetaData(),
+                     sa.Column("id", sa.Integer, primary_key=True),
+                     sa.Column("file", sa.String),
+                     sa.Column("size", sa.Float),
+                     schema=schema)
+    table.drop(engine_meta, checkfirst=True)
+    table.create(engine_meta)
+    with engine_meta.begin() as conn:
+        conn.execute(sa.insert(table),
+                     [{"id": uid, "file": f"r{uid}", "size": uid}
+                      for uid in range(1, 7)])
+
+    name = f"{schema}.{table.name}" if schema else table.name
+    cols = {"uid": "id", "item": "file", "weight": "size"}
+
+    for success in (True, False, True):
+        acquire_batch(meta_table_name=name,
+                      meta_table_cols=cols,
+                      job="j1",
+                      batch_count=2).release(success=success)
+
+    assert read_uncovered_ranges(job="j1",
+                                 meta_table_name=name,
+                                 meta_table_cols=cols) == [(3, 4)]
+    assert read_uncovered_ranges(job="j1",
+                                 meta_table_name=name,
+                                 meta_table_cols=cols,
+                                 meta_table_filters=[("size", ">", 3)]) == \
+           [(4, 4)]
+
+
+def test_fill_gaps_without_meta_ids_in_gap(default_setup, meta_table):
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2) \
+        .failed()
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=1) \
+        .succeeded()
+
+    # filtered gap (5, 6) does not contain any meta ids
+    assert acquire_batch(meta_table_name=meta_table,
+                         job="j1",
+                         fill_gaps=True,
+                         meta_table_filters=[("weight", ">", 100)]) is None
+
+
+def test_acquire_batch_meta_filters(default_setup, meta_table):
+    filters = [("weight", ">=", 12), ("item", "!=", "f7")]
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="j1",
+                          batch_count=2,
+                          meta_table_filters=filters)
+
+    assert (batch.id_range.id_min, batch.id_range.id_max) == (6, 8)
+    assert batch.id_range.count == 2
+    assert batch.items == ["f6", "f8"]
+
+    batches = acquire_batches(meta_table_name=meta_table,
+                              job="j1",
+                              iterations=2,
+                              batch_count=1,
+                              meta_table_filters=filters)
+
+    assert [batch.items for batch in batches] == [["f9"]]
+
+
+def test_acquire_batch_upstream_job(default_setup, meta_table,
+                                    inventory_inspect):
+    first = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+    second = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+    first.succeeded(result={"file": 3})
+
+    # running upstream batch bounds downstream progress
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="s2",
+                          upstream_job="j1")
+
+    assert (batch.id_range.id_min, batch.id_range.id_max) == (1, 3)
+    assert batch.id_range.count == 2
+    assert batch.id_range.weight == 30
+    assert batch.items == ["{file: 1}", {"file": 3}]
+    assert inventory_inspect(batch.pk)["meta_table"] == f"{meta_table}/j1"
+    batch.succeeded(result={"stage": 2})
+
+    assert acquire_batch(meta_table_name=meta_table,
+                         job="s2",
+                         upstream_job="j1") is None
+
+    second.succeeded()
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="s2",
+                          upstream_job="j1")
+    assert (batch.id_range.id_min, batch.id_range.id_max) == (4, 4)
+
+    # chain further jobs on downstream jobs
+    chained = acquire_batch(meta_table_name=f"{meta_table}/j1",
+                            job="s3",
+                            upstream_job="s2",
+                            lazy=True)
+
+    assert chained.id_range.count == 1
+    assert chained.items == [{"stage": 2}]
+
+
+def test_acquire_batch_upstream_job_permanently_failed(default_setup,
+                                                       meta_table,
+                                                       monkeypatch):
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2) \
+        .failed()
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2) \
+        .succeeded()
+
+    # failed upstream batch may still succeed
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="s2",
+                          upstream_job="j1")
+    assert (batch.id_range.id_min, batch.id_range.id_max) == (1, 1)
+
+    monkeypatch.setattr(cfg.settings, "INVENTORY_SOURCE_MAX_ATTEMPTS", 1)
+    batch = acquire_batch(meta_table_name=meta_table,
+                          job="s2",
+                          upstream_job="j1")
+    assert (batch.id_range.id_min, batch.id_range.id_max) == (4, 4)
+
+
+def test_upstream_job_rejects_unordered_changes(default_setup, meta_table):
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2) \
+        .succeeded()
+    acquire_batch(meta_table_name=meta_table, job="s2", upstream_job="j1")
+
+    with pytest.raises(ValueError):
+        compact_inventory(job="j1", meta_table_name=meta_table)
+    with pytest.raises(ValueError):
+        acquire_batch(meta_table_name=meta_table, job="j1", fill_gaps=True)
+    with pytest.raises(ValueError):
+        plan_backfill(job="j1", meta_table_name=meta_table, batch_count=2)
+
+    # downstream jobs without chained jobs remain unrestricted
+    assert compact_inventory(job="s2", meta_table_name=meta_table) == 0
+
+
+EVENTS_START = datetime.datetime(2023, 3, 1)
+
+
+@pytest.fixture
+def events_meta_table(default_setup, schema, engine_meta):
+    """Meta table with three items per hour of `imported` timestamps.
+
+    """
+
+    table = sa.Table("test_meta_events",
+                     sa.MetaData(),
+                     sa.Column("uid", sa.Integer, primary_key=True),
+                     sa.Column("item", sa.String),
+                     sa.Column("weight", sa.Float),
+                     sa.Column("imported", sa.DateTime, index=True),
+                     schema=schema)
+    table.drop(engine_meta, checkfirst=True)
+    table.create(engine_meta)
+
+    rows = [{"uid": uid,
+             "item": f"e{uid}",
+             "weight": 1,
+             "imported": EVENTS_START + datetime.timedelta(minutes=20 * uid)}
+            for uid in range(1, 13)]
+    with engine_meta.begin() as conn:
+        conn.execute(sa.insert(table), rows)
+
+    return f"{schema}.{table.name}" if schema else table.name
+
+
+def _id_bounds(batch):
+    return batch.id_range.id_min, batch.id_range.id_max
+
+
+def test_acquire_batch_interval(events_meta_table, engine_meta, schema):
+    def acquire(**kwargs):
+        return acquire_batch(meta_table_name=events_meta_table,
+                             meta_table_cols={"timestamp": "imported"},
+                             job="hourly",
+                             batch_interval=datetime.timedelta(hours=1),
+                             **kwargs)
+
+    assert _id_bounds(acquire()) == (1, 2)
+    assert _id_bounds(acquire(batch_count=2)) == (3, 4)
+    assert _id_bounds(acquire(batch_count=2)) == (5, 5)
+    assert _id_bounds(acquire()) == (6, 8)
+    assert _id_bounds(acquire(batch_weight=10)) == (9, 11)
+
+    # interval is still filling
+    assert acquire() is None
+
+    table = sa.Table(events_meta_table.split(".")[-1],
+                     sa.MetaData(),
+                     autoload_with=engine_meta,
+                     schema=schema)
+    with engine_meta.begin() as conn:
+        conn.execute(sa.insert(table),
+                     {"uid": 15,
+                      "item": "e15",
+                      "weight": 1,
+                      "imported": EVENTS_START +
+                      datetime.timedelta(minutes=20 * 15)})
+
+    assert _id_bounds(acquire()) == (12, 12)
+    assert acquire() is None
+
+
+def test_acquire_batch_time_bounds(events_meta_table, engine_meta,
+                                   statement_counter):
+    def acquire():
+        return acquire_batch(
+            meta_table_name=events_meta_table,
+            meta_table_cols={"timestamp": "imported"},
+            job="march",
+            batch_time_min=EVENTS_START + datetime.timedelta(hours=1),
+            batch_time_max=EVENTS_START + datetime.timedelta(hours=2)
+        )
+
+    batch = acquire()
+    assert _id_bounds(batch) == (3, 5)
+    assert batch.items == ["e3", "e4", "e5"]
+
+    # resolved time bounds are cached
+    statements = statement_counter(engine_meta)
+    assert acquire() is None
+    assert not any("imported" in statement for statement in statements)
+
+
+def test_read_columns_match_items(events_meta_table, meta_table):
+    events = MetaTableSpec(name=events_meta_table,
+                           cols={"timestamp": "imported"})
+    columns = crud.read_columns_via_id_range_from_meta(meta_table=events,
+                                                       id_min=1,
+                                                       id_max=3,
+                                                       columns=["imported"])
+
+    assert columns["imported"].tolist() == \
+           [EVENTS_START + datetime.timedelta(minutes=20 * uid)
+            for uid in range(1, 4)]
+    assert columns["item"].tolist() == \
+           crud.read_items_via_id_range_from_meta(meta_table=events,
+                                                  id_min=1,
+                                                  id_max=3)
+
+    # JSON items of inventory sources
+    acquire_batch(meta_table_name=meta_table, job="j1").succeeded(
+        result={"n": 1}
+    )
+    source = MetaTableSpec.from_inventory(meta_table=meta_table, job="j1")
+    columns = crud.read_columns_via_id_range_from_meta(meta_table=source,
+                                                       id_min=0,
+                                                       id_max=100,
+                                                       columns=["id"])
+
+    items = crud.read_items_via_id_range_from_meta(meta_table=source,
+                                                   id_min=0,
+                                                   id_max=100)
+    assert columns["job_result_item"].tolist() == items
+    assert {"n": 1} in items
+
+
+def test_first_meta_ids_cache_is_bounded(events_meta_table, monkeypatch):
+    monkeypatch.setattr(crud, "FIRST_META_IDS_CACHE_SIZE", 1)
+    meta_table = MetaTableSpec(name=events_meta_table,
+                               cols={"timestamp": "imported"})
+
+    for hours in (1, 2):
+        crud.read_first_meta_id_since(
+            meta_table=meta_table,
+            timestamp=EVENTS_START + datetime.timedelta(hours=hours)
+        )
+
+    assert list(crud._FIRST_META_IDS.values()) == [6]
+
+    sql.reset()
+    assert not crud._FIRST_META_IDS
+
+
+def test_acquire_batch_time_bounds_require_timestamp(events_meta_table):
+    with pytest.raises(ValueError):
+        acquire_batch(meta_table_name=events_meta_table,
+                      job="march",
+                      batch_time_min=EVENTS_START)
+
+
+def test_compact_inventory(default_setup, meta_table, engine_inventory):
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2) \
+        .succeeded()
+    running = acquire_batch(meta_table_name=meta_table,
+                            job="j1",
+                            batch_count=2)
+    acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2) \
+        .succeeded()
+
+    # running batch separates contiguous ranges
+    assert compact_inventory(job="j1", meta_table_name=meta_table) == 2
+    assert read_uncovered_ranges(job="j1",
+                                 meta_table_name=meta_table,
+                                 statuses=("succeeded",)) == [(7, 8)]
+
+    running.succeeded()
+    assert compact_inventory(job="j1", meta_table_name=meta_table) == 3
+    assert compact_inventory(job="j1", meta_table_name=meta_table) == 0
+
+    t_inventory = sql.db.table_inventory
+    stmt = (sa.select(t_inventory.c.batch_id_start,
+                      t_inventory.c.batch_id_end,
+                      t_inventory.c.batch_count,
+                      t_inventory.c.status)
+            .where(t_inventory.c.job == "j1"))
+    with engine_inventory.connect() as conn:
+        rows = conn.execute(stmt).fetchall()
+        archived = conn.execute(
+            sa.select(sa.func.count())
+            .select_from(sql.db.table_inventory_archive)
+        ).scalar()
+
+    assert [tuple(row) for row in rows] == [(0, 9, 10, "succeeded")]
+    assert archived == 5
+
+    # watermark and fallback semantics are retained
+    assert read_uncovered_ranges(job="j1", meta_table_name=meta_table) == []
+    assert acquire_batch(meta_table_name=meta_table, job="j1") is None
+
+
+def test_compact_inventory_overlapping_duplicates(default_setup, meta_table,
+                                                  engine_inventory):
+    batch = acquire_batch(meta_table_name=meta_table, job="j5", batch_count=2)
+    batch.succeeded()
+    acquire_batch(meta_table_name=meta_table, job="j5", batch_count=2) \
+        .succeeded()
+
+    # duplicate of the first batch starts a separate contiguous range
+    t_inventory = sql.db.table_inventory
+    stmt = sa.insert(t_inventory).from_select(
+        [c.name for c in t_inventory.columns if c.name != "id"],
+        sa.select(*[c for c in t_inventory.columns if c.name != "id"])
+        .where(t_inventory.c.id == batch.pk)
+    )
+    with engine_inventory.begin() as conn:
+        conn.execute(stmt)
+
+    assert compact_inventory(job="j5", meta_table_name=meta_table) == 2
+
+    c_start = t_inventory.c.batch_id_start
+    c_end = t_inventory.c.batch_id_end
+    stmt = (sa.select(c_start, c_end)
+            .where(t_inventory.c.job == "j5")
+            .order_by(c_start, c_end))
+    with engine_inventory.connect() as conn:
+        rows = conn.execute(stmt).fetchall()
+
+    assert [tuple(row) for row in rows] == [(1, 2), (1, 4)]
+
+
+def test_acquire_batch_shared_database_round_trips(shared_setup,
+                                                   engine_inventory,
+                                                   statement_counter,
+                                                   meta_table):
+    # reflect meta table upfront
+    acquire_batch(meta_table_name=meta_table, job="j3", batch_count=1)
+
+    statements = statement_counter(engine_inventory)
+    batch = acquire_batch(meta_table_name=meta_table, job="j1", batch_count=2)
+
+    assert batch.id_range.id_min == 5
+    assert batch.id_range.id_max == 6
+    assert batch.items == ["f5", "f6"]
+
+    # fused meta query, inventory insert, watermark update and insert
+    assert len(statements) == 4
+
+
+def test_acquire_batch_partitions(meta_partitions, schema, engine_meta,
+                                  statement_counter):
+    meta_table = f"{schema}.test_meta_months" if schema \
+        else "test_meta_months"
+
+    def acquire(**kwargs):
+        batch = acquire_batch(meta_table_name=meta_table,
+                              meta_table_partitions=meta_partitions,
+                              job="months",
+                              **kwargs)
+        if batch:
+            batch.release(success=True)
+        return batch
+
+    assert acquire(batch_count=2).items == ["f1", "f2"]
+
+    # batch spans two partitions
+    batch = acquire(batch_count=2)
+    assert _id_bounds(batch) == (3, 4)
+    assert batch.items == ["f3", "f4"]
+
+    # completed first partition is pruned
+    statements = statement_counter(engine_meta)
+    batch = acquire(batch_weight=30)
+    assert _id_bounds(batch) == (5, 6)
+    assert batch.items == ["f5", "f6"]
+    assert not any(meta_partitions[0].split(".")[-1] in statement
+                   for statement in statements)
+
+    batch = acquire(lazy=True)
+    assert _id_bounds(batch) == (7, 9)
+    assert batch.items == ["f7", "f8", "f9"]
+    assert acquire() is None
+
+
+def test_plan_backfill(default_setup, meta_table, engine_meta,
+                       statement_counter):
+    planned = plan_backfill(meta_table_name=meta_table,
+                            job="backfill",
+                            batch_id_min=1,
+                            batch_id_max=9,
+                            batch_weight=20)
+    assert planned == 6
+
+    # planning continues after the highest planned meta id
+    assert plan_backfill(meta_table_name=meta_table,
+                         job="backfill",
+                         batch_id_min=1,
+                         batch_id_max=9,
+                         batch_weight=20) == 0
+
+    statements = statement_counter(engine_meta)
+
+    def acquire():
+        return acquire_planned_batch(meta_table_name=meta_table,
+                                     job="backfill",
+                                     lazy=True)
+
+    first = acquire()
+    assert _id_bounds(first) == (1, 4)
+    assert first.id_range.weight == 20
+    first.release(success=True)
+
+    second = acquire()
+    assert _id_bounds(second) == (5, 5)
+
+    # claims do not read the meta table
+    assert not statements
+    assert second.items == ["f5"]
+
+    progress = read_plan_progress(meta_table_name=meta_table, job="backfill")
+    assert progress["succeeded"] == {"batches": 1, "items": 4, "weight": 20}
+    assert progress["running"]["batches"] == 1
+    assert progress["pending"] == {"batches": 4, "items": 4, "weight": 60}
+
+    remaining = [_id_bounds(acquire()) for _ in range(4)]
+    assert remaining == [(6, 6), (7, 7), (8, 8), (9, 9)]
+    assert acquire() is None
+
+
+def test_plan_backfill_earlier_interval(default_setup, meta_table):
+    assert plan_backfill(meta_table_name=meta_table,
+                         job="backfill",
+                         batch_id_min=6,
+                         batch_id_max=9,
+                         batch_count=2) == 2
+
+    # later plans do not bound earlier intervals
+    assert plan_backfill(meta_table_name=meta_table,
+                         job="backfill",
+                         batch_id_min=1,
+                         batch_id_max=5,
+                         batch_count=2) == 3
+
+    # partially planned intervals continue after overlapping plans
+    assert plan_backfill(meta_table_name=meta_table,
+                         job="backfill",
+                         batch_id_min=4,
+                         batch_id_max=9,
+                         batch_count=2) == 0
+
+    progress = read_plan_progress(meta_table_name=meta_table, job="backfill")
+    assert progress["pending"]["batches"] == 5
+    assert progress["pending"]["items"] == 9
+
+
+def test_plan_backfill_requires_batch_bounds(default_setup, meta_table):
+    with pytest.raises(ValueError):
+        plan_backfill(meta_table_name=meta_table, job="backfill")